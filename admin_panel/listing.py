@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+
+from ciquest_model.exports import ExportError, parse_date_range
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class ListParamError(ValueError):
+    pass
+
+
+def _parse_positive_int(value, name, default, maximum=None):
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = 0
+    if number < 1:
+        raise ListParamError(f"{name} は1以上の整数で指定してください。")
+    return min(number, maximum) if maximum else number
+
+
+def estimated_row_count(model):
+    """テーブル全体の概算件数（PostgreSQL / MySQL の統計情報）。取得できなければ None。"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def count_rows(queryset):
+    """
+    件数と概算かどうか。ADMIN_LIST_EXACT_COUNT_LIMIT 件までは正確に数え（LIMIT 付きの COUNT）、
+    それを超えたら絞り込みのない一覧はテーブル統計の概算、絞り込みありは上限値を返す。
+    """
+    cap = getattr(settings, "ADMIN_LIST_EXACT_COUNT_LIMIT", 10000)
+    counted = queryset.order_by()[: cap + 1].count()
+    if counted <= cap:
+        return counted, False
+    estimate = None if queryset.query.where else estimated_row_count(queryset.model)
+    return max(estimate or 0, counted), True
+
+
+def list_response(request, queryset, serialize, sort_fields, default_sort, date_field="created_at"):
+    """
+    一覧 API の共通処理。?page=&limit=&sort=&from=&to= を解釈して1ページ分を返す。
+    sort_fields は並び替えを許可するキー -> ORM の列（"-" を付けると降順）。
+    from / to は date_field に対するローカル日付（両端を含む）。検索や状態の絞り込みは呼び出し側で済ませておく。
+    """
+    try:
+        page = _parse_positive_int(request.GET.get("page"), "page", 1)
+        limit = _parse_positive_int(request.GET.get("limit"), "limit", DEFAULT_LIMIT, MAX_LIMIT)
+        sort = request.GET.get("sort") or default_sort
+        if sort.lstrip("-") not in sort_fields:
+            raise ListParamError(f"sort には {', '.join(sorted(sort_fields))} のいずれかを指定してください。")
+        try:
+            start, end = parse_date_range(request.GET)
+        except ExportError as exc:
+            raise ListParamError(str(exc)) from exc
+    except ListParamError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    if start:
+        queryset = queryset.filter(**{f"{date_field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{date_field}__lt": end})
+    descending = "-" if sort.startswith("-") else ""
+    queryset = queryset.order_by(f"{descending}{sort_fields[sort.lstrip('-')]}", f"{descending}pk")
+
+    total, total_is_estimate = count_rows(queryset)
+    offset = (page - 1) * limit
+    # 1件多く読んで次ページの有無を判定する
+    rows = list(queryset[offset:offset + limit + 1])
+    return JsonResponse(
+        {
+            "results": [serialize(row) for row in rows[:limit]],
+            "page": page,
+            "limit": limit,
+            "sort": sort,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "has_next": len(rows) > limit,
+        }
+    )
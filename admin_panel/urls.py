@@ -75,6 +75,7 @@ urlpatterns = [
         name='admin_api_user_delete',
     ),
     path('api/owners/', views.api_owner_list, name='admin_api_owners'),
+    path('exports/<str:dataset>/', views.export_history, name='admin_export_history'),
     path(
         'api/owners/<int:owner_id>/delete/',
         views.api_owner_delete,
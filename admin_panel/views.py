@@ -2,8 +2,6 @@ import json
 import secrets
 from datetime import datetime, time
 
-from django.conf import settings
-from django.core.mail import send_mail
 from django.contrib.auth.hashers import make_password
 from django.db.models import Q
 from django.http import HttpResponse, JsonResponse
@@ -23,6 +21,11 @@ from ciquest_model.models import (
     StoreOwner,
     User,
 )
+from ciquest_model.email_outbox import enqueue_email
+from ciquest_model.exports import ExportError, export_response
+from ciquest_model.search import matching_object_ids
+
+from .listing import list_response
 from ciquest_model.markdown_utils import render_markdown
 
 
@@ -199,10 +202,20 @@ def api_admin_list_create(request):
             AdminAccount.objects.select_related("created_by", "approved_by")
             # 期限切れの削除済みアカウントは一覧から除外
             .exclude(is_deleted=True, restore_token_expires_at__isnull=False, restore_token_expires_at__lt=now)
-            .order_by("-created_at")
         )
-        data = [_serialize_admin(admin, current_admin) for admin in admins]
-        return JsonResponse(data, safe=False)
+        status_filter = request.GET.get("status")
+        if status_filter in {"pending", "approved", "rejected"}:
+            admins = admins.filter(approval_status=status_filter)
+        keyword = (request.GET.get("search") or "").strip()
+        if keyword:
+            admins = admins.filter(Q(name__icontains=keyword) | Q(email__icontains=keyword))
+        return list_response(
+            request,
+            admins,
+            lambda admin: _serialize_admin(admin, current_admin),
+            sort_fields={"created_at": "created_at", "name": "name", "email": "email"},
+            default_sort="-created_at",
+        )
 
     data = _json_body(request)
     name = (data.get("name") or "").strip()
@@ -300,14 +313,12 @@ def api_admin_delete(request, admin_id):
         f"{restore_url}\n\n"
         "心当たりがない場合は、他の運営に連絡しパスワード変更などの対応をしてください。"
     )
-    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None) or getattr(settings, "EMAIL_HOST_USER", None) or "no-reply@ciquest.local"
-
     try:
-        send_mail(subject, body, from_email, [target.email], fail_silently=False)
+        enqueue_email(subject, body, [target.email])
     except Exception as exc:
-        return JsonResponse({"detail": f"削除は完了しましたがメール送信に失敗しました: {exc}"}, status=500)
+        return JsonResponse({"detail": f"削除は完了しましたがメール送信の登録に失敗しました: {exc}"}, status=500)
 
-    return JsonResponse({"detail": "削除しました。復元リンクをメール送信しました。"})
+    return JsonResponse({"detail": "削除しました。復元リンクをメールで送信します。"})
 
 
 @require_http_methods(["GET"])
@@ -343,6 +354,17 @@ def admin_account_restore(request, admin_id, token):
     return HttpResponse(html, content_type="text/html; charset=utf-8")
 
 
+def _serialize_store(store):
+    return {
+        "store_id": store.store_id,
+        "name": store.name,
+        "address": store.address or "",
+        "created_at": store.created_at.isoformat(),
+        "owner_name": store.owner.name if store.owner else "",
+        "status": store.status,
+    }
+
+
 @require_http_methods(["GET"])
 def api_store_list(request):
     unauthorized = _require_admin_for_json(request)
@@ -350,22 +372,20 @@ def api_store_list(request):
         return unauthorized
 
     status_filter = request.GET.get("status")
-    queryset = Store.objects.select_related("owner").order_by("-created_at")
+    queryset = Store.objects.select_related("owner")
     if status_filter in {"pending", "approved", "rejected"}:
         queryset = queryset.filter(status=status_filter)
-
-    stores = [
-        {
-            "store_id": store.store_id,
-            "name": store.name,
-            "address": store.address or "",
-            "created_at": store.created_at.isoformat(),
-            "owner_name": store.owner.name if store.owner else "",
-            "status": store.status,
-        }
-        for store in queryset
-    ]
-    return JsonResponse(stores, safe=False)
+    keyword = (request.GET.get("search") or "").strip()
+    if keyword:
+        queryset = queryset.filter(store_id__in=matching_object_ids("store", keyword))
+
+    return list_response(
+        request,
+        queryset,
+        _serialize_store,
+        sort_fields={"created_at": "created_at", "name": "name", "store_id": "store_id"},
+        default_sort="-created_at",
+    )
 
 
 @require_http_methods(["POST"])
@@ -397,6 +417,17 @@ def api_store_delete(request, store_id):
     return JsonResponse({"detail": "削除しました。"})
 
 
+def _serialize_challenge(challenge):
+    return {
+        "challenge_id": challenge.challenge_id,
+        "title": challenge.title,
+        "store_name": challenge.store.name if challenge.store else "",
+        "reward_points": challenge.reward_points,
+        "is_banned": challenge.is_banned,
+        "created_at": challenge.created_at.isoformat(),
+    }
+
+
 @require_http_methods(["GET"])
 def api_challenge_list(request):
     unauthorized = _require_admin_for_json(request)
@@ -404,24 +435,20 @@ def api_challenge_list(request):
         return unauthorized
 
     keyword = (request.GET.get("search") or "").strip()
-    queryset = Challenge.objects.select_related("store").order_by("-created_at")
+    queryset = Challenge.objects.select_related("store")
     if keyword:
-        queryset = queryset.filter(
-            Q(title__icontains=keyword) | Q(store__name__icontains=keyword)
-        )
-
-    challenges = [
-        {
-            "challenge_id": challenge.challenge_id,
-            "title": challenge.title,
-            "store_name": challenge.store.name if challenge.store else "",
-            "reward_points": challenge.reward_points,
-            "is_banned": challenge.is_banned,
-            "created_at": challenge.created_at.isoformat(),
-        }
-        for challenge in queryset
-    ]
-    return JsonResponse(challenges, safe=False)
+        queryset = queryset.filter(challenge_id__in=matching_object_ids("challenge", keyword))
+    status_filter = request.GET.get("status")
+    if status_filter in {"active", "banned"}:
+        queryset = queryset.filter(is_banned=status_filter == "banned")
+
+    return list_response(
+        request,
+        queryset,
+        _serialize_challenge,
+        sort_fields={"created_at": "created_at", "title": "title", "reward_points": "reward_points"},
+        default_sort="-created_at",
+    )
 
 
 @require_http_methods(["POST"])
@@ -436,6 +463,19 @@ def api_challenge_ban(request, challenge_id):
     return JsonResponse({"detail": "BAN済みにしました。"})
 
 
+def _serialize_coupon(coupon):
+    return {
+        "coupon_id": coupon.coupon_id,
+        "title": coupon.title,
+        "description": coupon.description or "",
+        "required_points": coupon.required_points,
+        "expires_at": coupon.expires_at.isoformat() if coupon.expires_at else None,
+        "type": coupon.type,
+        "store_id": coupon.store_id,
+        "store_name": coupon.store.name if coupon.store else "",
+    }
+
+
 @require_http_methods(["GET", "POST"])
 def api_coupon_list_create(request):
     unauthorized = _require_admin_for_json(request)
@@ -444,27 +484,27 @@ def api_coupon_list_create(request):
 
     if request.method == "GET":
         coupon_type = request.GET.get("type")
-        queryset = (
-            Coupon.objects.select_related("store")
-            .order_by("-expires_at", "-coupon_id")
-        )
+        queryset = Coupon.objects.select_related("store")
         if coupon_type in {"common", "store_specific"}:
             queryset = queryset.filter(type=coupon_type)
-
-        coupons = [
-            {
-                "coupon_id": coupon.coupon_id,
-                "title": coupon.title,
-                "description": coupon.description or "",
-                "required_points": coupon.required_points,
-                "expires_at": coupon.expires_at.isoformat() if coupon.expires_at else None,
-                "type": coupon.type,
-                "store_id": coupon.store_id,
-                "store_name": coupon.store.name if coupon.store else "",
-            }
-            for coupon in queryset
-        ]
-        return JsonResponse(coupons, safe=False)
+        keyword = (request.GET.get("search") or "").strip()
+        if keyword:
+            queryset = queryset.filter(Q(title__icontains=keyword) | Q(store__name__icontains=keyword))
+
+        # 期間（from / to）は有効期限で絞り込む
+        return list_response(
+            request,
+            queryset,
+            _serialize_coupon,
+            sort_fields={
+                "expires_at": "expires_at",
+                "required_points": "required_points",
+                "title": "title",
+                "coupon_id": "coupon_id",
+            },
+            default_sort="-expires_at",
+            date_field="expires_at",
+        )
 
     data = _json_body(request)
     title = (data.get("title") or "").strip()
@@ -530,6 +570,18 @@ def api_coupon_delete(request, coupon_id):
     return JsonResponse({"detail": "削除しました。"})
 
 
+def _serialize_inquiry(inquiry):
+    return {
+        "inquiry_id": inquiry.inquiry_id,
+        "category": inquiry.category,
+        "message": inquiry.message,
+        "status": inquiry.status,
+        "created_at": inquiry.created_at.isoformat(),
+        "store_name": inquiry.store.name if inquiry.store else "",
+        "related_challenge_id": inquiry.related_challenge_id,
+    }
+
+
 @require_http_methods(["GET"])
 def api_inquiry_list(request):
     unauthorized = _require_admin_for_json(request)
@@ -537,23 +589,17 @@ def api_inquiry_list(request):
         return unauthorized
 
     status_filter = request.GET.get("status")
-    queryset = AdminInquiry.objects.select_related("store", "related_challenge").order_by("-created_at")
+    queryset = AdminInquiry.objects.select_related("store")
     if status_filter in {"unread", "in_progress", "resolved"}:
         queryset = queryset.filter(status=status_filter)
 
-    inquiries = [
-        {
-            "inquiry_id": inquiry.inquiry_id,
-            "category": inquiry.category,
-            "message": inquiry.message,
-            "status": inquiry.status,
-            "created_at": inquiry.created_at.isoformat(),
-            "store_name": inquiry.store.name if inquiry.store else "",
-            "related_challenge_id": inquiry.related_challenge_id,
-        }
-        for inquiry in queryset
-    ]
-    return JsonResponse(inquiries, safe=False)
+    return list_response(
+        request,
+        queryset,
+        _serialize_inquiry,
+        sort_fields={"created_at": "created_at", "category": "category"},
+        default_sort="-created_at",
+    )
 
 
 @require_http_methods(["POST"])
@@ -580,13 +626,16 @@ def api_user_list(request):
         return unauthorized
 
     keyword = (request.GET.get("search") or "").strip()
-    queryset = User.objects.select_related("rank").order_by("-created_at")
+    queryset = User.objects.select_related("rank")
     if keyword:
-        queryset = queryset.filter(
-            Q(username__icontains=keyword) | Q(email__icontains=keyword)
-        )
-    users = [_serialize_user(user) for user in queryset]
-    return JsonResponse(users, safe=False)
+        queryset = queryset.filter(user_id__in=matching_object_ids("user", keyword))
+    return list_response(
+        request,
+        queryset,
+        _serialize_user,
+        sort_fields={"created_at": "created_at", "username": "username", "points": "points", "user_id": "user_id"},
+        default_sort="-created_at",
+    )
 
 
 @require_http_methods(["DELETE"])
@@ -713,15 +762,23 @@ def api_owner_list(request):
         return unauthorized
 
     keyword = (request.GET.get("search") or "").strip()
-    queryset = StoreOwner.objects.order_by("-created_at")
+    queryset = StoreOwner.objects.all()
     if keyword:
         queryset = queryset.filter(
             Q(name__icontains=keyword)
             | Q(email__icontains=keyword)
             | Q(business_name__icontains=keyword)
         )
-    owners = [_serialize_owner(owner) for owner in queryset]
-    return JsonResponse(owners, safe=False)
+    status_filter = request.GET.get("status")
+    if status_filter in {"approved", "unapproved"}:
+        queryset = queryset.filter(approved=status_filter == "approved")
+    return list_response(
+        request,
+        queryset,
+        _serialize_owner,
+        sort_fields={"created_at": "created_at", "name": "name", "email": "email"},
+        default_sort="-created_at",
+    )
 
 
 @require_http_methods(["DELETE"])
@@ -733,3 +790,31 @@ def api_owner_delete(request, owner_id):
     owner = get_object_or_404(StoreOwner, pk=owner_id)
     owner.delete()
     return JsonResponse({"detail": "削除しました。"})
+
+
+@require_http_methods(["GET"])
+def export_history(request, dataset):
+    """
+    履歴の CSV / JSONL 出力（coupon-usage / stamps / challenges）。全店舗または ?store_id= の1店舗。
+    ?format=csv|jsonl&from=YYYY-MM-DD&to=YYYY-MM-DD。行は送信しながら読み出す。
+    """
+    unauthorized = _require_admin_for_json(request)
+    if unauthorized:
+        return unauthorized
+
+    store_ids = None
+    store_id = request.GET.get("store_id")
+    if store_id:
+        if not store_id.isdigit():
+            return JsonResponse({"detail": "store_id は数値で指定してください。"}, status=400)
+        store_ids = [int(store_id)]
+    try:
+        return export_response(
+            dataset,
+            request.GET.get("format") or "csv",
+            store_ids=store_ids,
+            params=request.GET,
+            filename_prefix=f"store{store_id}" if store_id else "all",
+        )
+    except ExportError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
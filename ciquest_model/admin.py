@@ -4,9 +4,13 @@ from django.contrib import admin
 from .models import (
     AdminAccount,
     AdminInquiry,
+    BackgroundTask,
     Challenge,
     Coupon,
+    CouponUsageHistory,
+    EmailOutbox,
     Notice,
+    PointsLedger,
     Rank,
     Store,
     StoreOwner,
@@ -18,8 +22,6 @@ from .models import (
     User,
     UserChallenge,
     UserCoupon,
-    UserCouponUsageHistory,
-    StoreCouponUsageHistory,
 )
 
 
@@ -34,6 +36,8 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ("username", "email", "rank", "points", "created_at")
     search_fields = ("username", "email")
     list_filter = ("rank",)
+    # 残高は PointsLedger 経由でのみ変更する
+    readonly_fields = ("points",)
 
 
 @admin.register(StoreOwner)
@@ -86,20 +90,13 @@ class UserCouponAdmin(admin.ModelAdmin):
     list_filter = ("is_used",)
 
 
-@admin.register(UserCouponUsageHistory)
-class UserCouponUsageHistoryAdmin(admin.ModelAdmin):
+@admin.register(CouponUsageHistory)
+class CouponUsageHistoryAdmin(admin.ModelAdmin):
     list_display = ("user", "coupon", "store", "coupon_type", "used_at")
     search_fields = ("user__username", "coupon__title", "store__name")
     list_filter = ("coupon_type",)
 
 
-@admin.register(StoreCouponUsageHistory)
-class StoreCouponUsageHistoryAdmin(admin.ModelAdmin):
-    list_display = ("store", "user", "coupon", "coupon_type", "used_at")
-    search_fields = ("store__name", "user__username", "coupon__title")
-    list_filter = ("coupon_type",)
-
-
 @admin.register(StoreStampSetting)
 class StoreStampSettingAdmin(admin.ModelAdmin):
     list_display = ("store", "max_stamps", "created_at", "updated_at")
@@ -152,3 +149,24 @@ class NoticeAdmin(admin.ModelAdmin):
     list_display = ("title", "target", "is_published", "start_at", "end_at", "created_at")
     search_fields = ("title", "body_md")
     list_filter = ("target", "is_published")
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "attempts", "next_attempt_at", "sent_at", "created_at")
+    search_fields = ("subject", "last_error")
+    list_filter = ("status",)
+
+
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_after", "duration_ms", "finished_at", "created_at")
+    search_fields = ("name", "last_error")
+    list_filter = ("status", "name")
+
+
+@admin.register(PointsLedger)
+class PointsLedgerAdmin(admin.ModelAdmin):
+    list_display = ("user", "kind", "amount", "challenge", "coupon", "created_at")
+    search_fields = ("user__username", "user__email", "note")
+    list_filter = ("kind",)
@@ -0,0 +1,149 @@
+import datetime
+from array import array
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from ciquest_model.bulk import upsert
+from ciquest_model.models import Store, StoreAnalytics, StoreStampHistory
+
+_DAY = 86400
+# 1970-01-01 は木曜日。経過日数に 3 を足すと月曜=0 の曜日・月曜始まりの週番号になる
+_MONDAY_SHIFT = 3
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+def export_visits(store_ids):
+    """来店履歴（StoreStampHistory）を店舗順に並べた配列 (store_id, user_id, epoch 秒) として書き出す。"""
+    stores, users, stamped = array("q"), array("q"), array("q")
+    rows = (
+        StoreStampHistory.objects.filter(store_id__in=store_ids)
+        .order_by("store_id")
+        .values_list("store_id", "user_id", "stamped_at")
+    )
+    for store_id, user_id, stamped_at in rows.iterator(chunk_size=5000):
+        stores.append(store_id)
+        users.append(user_id)
+        stamped.append(int(stamped_at.timestamp()))
+    return (
+        np.array(stores, dtype=np.int64),
+        np.array(users, dtype=np.int64),
+        np.array(stamped, dtype=np.int64),
+    )
+
+
+def to_local_seconds(epoch, tz=None):
+    """epoch 秒をローカル時間の通算秒へ。UTC オフセットは日ごとに1回だけ求める。"""
+    if not epoch.size:
+        return epoch
+    tz = tz or timezone.get_current_timezone()
+    days, index = np.unique(epoch // _DAY, return_inverse=True)
+    offsets = np.array(
+        [
+            int(datetime.datetime.fromtimestamp(int(day) * _DAY + _DAY // 2, tz).utcoffset().total_seconds())
+            for day in days
+        ],
+        dtype=np.int64,
+    )
+    return epoch + offsets[index.ravel()]
+
+
+def _week_number(local):
+    return (local // _DAY + _MONDAY_SHIFT) // 7
+
+
+def _week_start(week):
+    return _EPOCH + datetime.timedelta(days=int(week) * 7 - _MONDAY_SHIFT)
+
+
+def hour_of_week_heatmap(local):
+    """曜日（月曜=0）× 時 の 7×24 の来店数。"""
+    slots = ((local // _DAY + _MONDAY_SHIFT) % 7) * 24 + (local % _DAY) // 3600
+    return np.bincount(slots, minlength=7 * 24).reshape(7, 24)
+
+
+def weekly_cohorts(users, local, current_week, weeks):
+    """
+    初回来店週ごとの再来店。直近 weeks 週に初回来店した利用者を週ごとにまとめ、
+    n 週後にも来店した人数を数える（同じ週の複数回の来店は1人として数える）。
+    """
+    if not users.size:
+        return []
+    week = _week_number(local)
+    user_ids, index = np.unique(users, return_inverse=True)
+    index = index.ravel()
+    first = np.full(user_ids.size, week.max(), dtype=np.int64)
+    np.minimum.at(first, index, week)
+
+    start = current_week - weeks + 1
+    age = week - first[index]
+    keep = (first[index] >= start) & (age < weeks)
+    pairs = np.unique(index[keep] * weeks + age[keep])
+    cohort = first[pairs // weeks] - start
+    grid = np.bincount(cohort * weeks + pairs % weeks, minlength=weeks * weeks).reshape(weeks, weeks)
+
+    cohorts = []
+    for offset, row in enumerate(grid):
+        if not row[0]:
+            continue
+        elapsed = min(current_week - (start + offset) + 1, weeks)
+        cohorts.append(
+            {
+                "week": _week_start(start + offset).isoformat(),
+                "size": int(row[0]),
+                "retained": row[1:elapsed].tolist(),
+            }
+        )
+    return cohorts
+
+
+def _analyze_store(store_id, users, local, current_week, weeks, now):
+    if not users.size:
+        return StoreAnalytics(store_id=store_id, computed_at=now)
+    return StoreAnalytics(
+        store_id=store_id,
+        heatmap=hour_of_week_heatmap(local).tolist(),
+        cohorts=weekly_cohorts(users, local, current_week, weeks),
+        visits=int(users.size),
+        visitors=int(np.unique(users).size),
+        computed_at=now,
+    )
+
+
+def build_store_analytics(store_ids=None, batch_size=200, now=None):
+    """
+    店舗ごとのヒートマップと週次リテンションを作り直して StoreAnalytics に保存する。
+    来店履歴は店舗 batch_size 件ずつ配列に書き出し、集計は NumPy でまとめて行う。戻り値は店舗数。
+    """
+    now = now or timezone.now()
+    weeks = getattr(settings, "ANALYTICS_COHORT_WEEKS", 12)
+    current_week = int(_week_number(to_local_seconds(np.array([int(now.timestamp())], dtype=np.int64)))[0])
+
+    targets = Store.objects.order_by("store_id").values_list("store_id", flat=True)
+    if store_ids:
+        targets = targets.filter(store_id__in=store_ids)
+    targets = list(targets)
+
+    built = 0
+    for begin in range(0, len(targets), batch_size):
+        batch = targets[begin:begin + batch_size]
+        stores, users, stamped = export_visits(batch)
+        local = to_local_seconds(stamped)
+        boundaries = np.flatnonzero(np.diff(stores)) + 1
+        groups = {}
+        if stores.size:
+            for store_id, store_users, store_local in zip(
+                stores[np.r_[0, boundaries]],
+                np.split(users, boundaries),
+                np.split(local, boundaries),
+            ):
+                groups[int(store_id)] = (store_users, store_local)
+        empty = np.array([], dtype=np.int64)
+        rows = [
+            _analyze_store(store_id, *groups.get(store_id, (empty, empty)), current_week, weeks, now)
+            for store_id in batch
+        ]
+        upsert(StoreAnalytics, rows, ["store"], ["heatmap", "cohorts", "visits", "visitors", "computed_at"])
+        built += len(rows)
+    return built
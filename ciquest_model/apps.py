@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CiquestModelConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ciquest_model"
+
+    def ready(self):
+        # 公開APIキャッシュの無効化（ciquest_model/signals.py）
+        from ciquest_model import signals  # noqa: F401
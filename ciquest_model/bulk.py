@@ -0,0 +1,40 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+
+def upsert(model, rows, unique_fields, update_fields, batch_size=500):
+    """
+    unique_fields の値が同じ行があれば update_fields を上書きし、なければ追加する。
+    bulk_create(update_conflicts=True, unique_fields=...) は MySQL では使えないため、
+    既存行は bulk_update、残りは bulk_create(ignore_conflicts=True) で書く（どの DB でも動く）。
+    同時に追加された行とぶつかった分は先に書いた方が残る。
+    auto_now の列は bulk_update では更新されないため、update_fields に含めるなら値を入れておくこと。
+    """
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+
+    def key_of(values):
+        return tuple(values[attname] for attname in attnames)
+
+    for begin in range(0, len(rows), batch_size):
+        batch = rows[begin:begin + batch_size]
+        lookup = reduce(or_, [Q(**{attname: getattr(row, attname) for attname in attnames}) for row in batch])
+        with transaction.atomic():
+            existing = {
+                key_of(values): values["pk"]
+                for values in model.objects.filter(lookup).values("pk", *attnames)
+            }
+            updates, inserts = [], []
+            for row in batch:
+                pk = existing.get(tuple(getattr(row, attname) for attname in attnames))
+                if pk is None:
+                    inserts.append(row)
+                else:
+                    row.pk = pk
+                    updates.append(row)
+            if updates:
+                model.objects.bulk_update(updates, update_fields)
+            if inserts:
+                model.objects.bulk_create(inserts, ignore_conflicts=True)
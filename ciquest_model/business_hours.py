@@ -0,0 +1,131 @@
+import datetime
+from bisect import bisect_right
+
+from django.utils import timezone
+
+from ciquest_model.local_index import LocalIndex
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# 曜日のキー（月曜=0）。英語の略称・全称・漢字を受け付ける
+WEEKDAY_KEYS = {
+    **{key: day for day, key in enumerate(["mon", "tue", "wed", "thu", "fri", "sat", "sun"])},
+    **{key: day for day, key in enumerate(["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"])},
+    **{key: day for day, key in enumerate("月火水木金土日")},
+}
+HOURS_INDEX_VERSION_CACHE_KEY = "hours_index:version"
+
+
+def _parse_clock(value):
+    """"HH:MM" を0時からの分にする（"24:00" や "26:00" のような翌日表記も可）。"""
+    hours, _, minutes = str(value).strip().partition(":")
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours <= 48 and 0 <= minutes < 60):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+
+def _day_ranges(value):
+    """1日分の値を [(開店, 閉店), ...] にする。["11:00", "20:00"] / [["11:00", "14:00"], ...] / {"open", "close"} に対応。"""
+    if not value or isinstance(value, str):
+        # "closed" / "定休日" などの文字列は休み
+        return []
+    if isinstance(value, dict):
+        value = [value.get("open"), value.get("close")]
+    if isinstance(value[0], (list, tuple, dict)):
+        return [pair for item in value for pair in _day_ranges(item)]
+    opens, closes = _parse_clock(value[0]), _parse_clock(value[1])
+    # 閉店が開店以前なら日をまたぐ（"00:00"〜"00:00" は24時間営業）
+    if closes <= opens:
+        closes += MINUTES_PER_DAY
+    return [(opens, closes)]
+
+
+def compile_business_hours(hours_json):
+    """
+    business_hours_json を週の分（月曜0時=0）の半開区間 [開始, 終了) のリストにする。
+    区間は開始順に並べて重なりをまとめ、週末をまたぐ区間は日曜の終わりと月曜の頭に分ける。
+    読めない曜日は休みとして扱う。
+    """
+    if not isinstance(hours_json, dict):
+        return []
+    ranges = []
+    for key, value in hours_json.items():
+        day = WEEKDAY_KEYS.get(str(key).strip().lower())
+        if day is None:
+            continue
+        try:
+            pairs = _day_ranges(value)
+        except (TypeError, ValueError, IndexError, AttributeError):
+            continue
+        for opens, closes in pairs:
+            start, end = day * MINUTES_PER_DAY + opens, day * MINUTES_PER_DAY + closes
+            if end > MINUTES_PER_WEEK:
+                ranges.append([0, end - MINUTES_PER_WEEK])
+                end = MINUTES_PER_WEEK
+            ranges.append([start, end])
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def minute_of_week(moment=None):
+    """ローカル時間での週の分（月曜0時=0）。"""
+    local = timezone.localtime(moment or timezone.now())
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+class HoursIndex:
+    """
+    公開中の全店舗の営業区間を開始順に並べた配列。ある時刻に開いている店舗は、
+    開始が (時刻 - 最長の区間長, 時刻] にある区間だけを二分探索で切り出して終了を確かめれば求まる。
+    """
+
+    def __init__(self, entries):
+        entries.sort()
+        self.starts = [start for start, _, _ in entries]
+        self.ends = [end for _, end, _ in entries]
+        self.store_ids = [store_id for _, _, store_id in entries]
+        self.max_length = max((end - start for start, end, _ in entries), default=0)
+
+    @classmethod
+    def build(cls):
+        from ciquest_model.models import Store
+
+        entries = []
+        for store_id, intervals in Store.objects.filter(status="approved").values_list("store_id", "business_hours_intervals"):
+            entries.extend((start, end, store_id) for start, end in intervals or [])
+        return cls(entries)
+
+    def open_store_ids(self, minute):
+        low = bisect_right(self.starts, minute - self.max_length)
+        high = bisect_right(self.starts, minute)
+        return {self.store_ids[i] for i in range(low, high) if self.ends[i] > minute}
+
+
+_hours_index = LocalIndex(HOURS_INDEX_VERSION_CACHE_KEY, HoursIndex.build)
+
+
+def get_hours_index():
+    return _hours_index.get()
+
+
+def invalidate_hours_index():
+    _hours_index.invalidate()
+
+
+def parse_open_at(value):
+    """?open_at=now / ISO 8601 の日時を週の分にする。読めなければ None。"""
+    if value == "now":
+        return minute_of_week()
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return minute_of_week(moment)
@@ -0,0 +1,49 @@
+from django.db import transaction
+
+from ciquest_model.models import ChangeLog, Challenge, Coupon, Store
+
+
+def record_changes(entity, object_ids, deleted=False):
+    """
+    対象の既存行を消して挿入し直す（1対象1行・新しい change_id を採番）。
+    deleted=True は削除・非公開化（tombstone）として記録する。
+    """
+    object_ids = sorted({object_id for object_id in object_ids if object_id})
+    if not object_ids:
+        return
+    with transaction.atomic():
+        ChangeLog.objects.filter(entity=entity, object_id__in=object_ids).delete()
+        ChangeLog.objects.bulk_create(
+            [ChangeLog(entity=entity, object_id=object_id, is_deleted=deleted) for object_id in object_ids]
+        )
+
+
+def store_is_public(store):
+    return store.status == "approved"
+
+
+def challenge_is_public(challenge, store_status=None):
+    if challenge.is_banned or not challenge.store_id:
+        return False
+    if store_status is None:
+        store_status = Store.objects.filter(store_id=challenge.store_id).values_list("status", flat=True).first()
+    return store_status == "approved"
+
+
+def coupon_is_public(coupon, store_status=None):
+    if not coupon.publish_to_shop:
+        return False
+    if not coupon.store_id:
+        return True
+    if store_status is None:
+        store_status = Store.objects.filter(store_id=coupon.store_id).values_list("status", flat=True).first()
+    return store_status == "approved"
+
+
+def record_store_children(store):
+    """店舗の公開状態が変わったとき、配下のクエスト・クーポンも同期対象にする。"""
+    visible = store_is_public(store)
+    for challenge in Challenge.objects.filter(store_id=store.store_id).only("challenge_id", "is_banned"):
+        record_changes("challenge", [challenge.challenge_id], deleted=challenge.is_banned or not visible)
+    for coupon in Coupon.objects.filter(store_id=store.store_id).only("coupon_id", "publish_to_shop"):
+        record_changes("coupon", [coupon.coupon_id], deleted=not coupon.publish_to_shop or not visible)
@@ -0,0 +1,140 @@
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ciquest_model.models import EmailOutbox
+
+
+def _default_from_email():
+    return (
+        getattr(settings, "DEFAULT_FROM_EMAIL", None)
+        or getattr(settings, "EMAIL_HOST_USER", None)
+        or "no-reply@ciquest.local"
+    )
+
+
+def _retry_delay(attempts):
+    """指数バックオフ（base * 2^(n-1) 秒、上限あり）"""
+    base = getattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+    limit = getattr(settings, "EMAIL_OUTBOX_RETRY_MAX_SECONDS", 60 * 60)
+    return datetime.timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), limit))
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """送信キューに積むだけで、SMTP には接続しない。"""
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or _default_from_email(),
+        recipients=list(recipients),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def claim_batch(batch_size=50, now=None):
+    """
+    送信対象を batch_size 件まで確保して sending にする。
+    SKIP LOCKED により複数ワーカーが同じ行を取り合わない。
+    一定時間 sending のまま残った行（ワーカー異常終了）も再取得する。
+    """
+    now = now or timezone.now()
+    stale_before = now - datetime.timedelta(
+        seconds=getattr(settings, "EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS", 10 * 60)
+    )
+    with transaction.atomic():
+        rows = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status="pending", next_attempt_at__lte=now)
+                | Q(status="sending", claimed_at__lt=stale_before)
+            )
+            .order_by("next_attempt_at", "email_id")[:batch_size]
+        )
+        if rows:
+            EmailOutbox.objects.filter(email_id__in=[row.email_id for row in rows]).update(
+                status="sending",
+                claimed_at=now,
+            )
+    return rows
+
+
+def _mark_failed_attempt(row, error, now):
+    max_attempts = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    row.attempts += 1
+    row.last_error = str(error)[:2000]
+    row.claimed_at = None
+    if row.attempts >= max_attempts:
+        row.status = "failed"
+    else:
+        row.status = "pending"
+        row.next_attempt_at = now + _retry_delay(row.attempts)
+    row.save(update_fields=["attempts", "last_error", "claimed_at", "status", "next_attempt_at"])
+
+
+def deliver_batch(batch_size=50, timeout=10):
+    """
+    1バッチ分を確保し、SMTP 接続を1本だけ開いて順に送信する。
+    戻り値は (送信成功件数, 失敗件数)。
+    """
+    rows = claim_batch(batch_size)
+    if not rows:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(timeout=timeout)
+    try:
+        connection.open()
+    except Exception as exc:
+        now = timezone.now()
+        for row in rows:
+            _mark_failed_attempt(row, exc, now)
+        return 0, len(rows)
+
+    try:
+        for row in rows:
+            message = EmailMessage(
+                row.subject,
+                row.body,
+                row.from_email or _default_from_email(),
+                row.recipients,
+                connection=connection,
+            )
+            try:
+                message.send(fail_silently=False)
+            except Exception as exc:
+                _mark_failed_attempt(row, exc, timezone.now())
+                failed += 1
+                continue
+            row.status = "sent"
+            row.attempts += 1
+            row.sent_at = timezone.now()
+            row.claimed_at = None
+            row.last_error = ""
+            row.save(update_fields=["status", "attempts", "sent_at", "claimed_at", "last_error"])
+            sent += 1
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return sent, failed
+
+
+def drain(batch_size=50, timeout=10, max_batches=None):
+    """送信可能な行がなくなるまで deliver_batch を繰り返す。"""
+    total_sent = total_failed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        sent, failed = deliver_batch(batch_size=batch_size, timeout=timeout)
+        if not sent and not failed:
+            break
+        total_sent += sent
+        total_failed += failed
+        batches += 1
+    return total_sent, total_failed
@@ -0,0 +1,319 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from ciquest_model.models import UserEvent
+
+# 購読者のキューがあふれたときに入れる印。接続を閉じ、端末には Last-Event-ID で再開させる
+_OVERFLOW = object()
+
+
+def user_channel(user_id):
+    return ("user", user_id)
+
+
+def store_channel(store_id):
+    return ("store", store_id)
+
+
+def publish(kind, payload, user_id=None, store_id=None):
+    """
+    イベント行を現在のトランザクション内で作成し、コミット後にトランスポートへ通知する。
+    store_id を指定すると店舗オーナー向け、user_id だけなら本人向け、どちらも省略すると全利用者向けになる。
+    """
+    event = UserEvent.objects.create(user_id=user_id, store_id=store_id, kind=kind, payload=payload)
+    transaction.on_commit(lambda: get_transport().notify(event))
+    return event
+
+
+def publish_many(events):
+    """
+    [(kind, payload, user_id, store_id), ...] を1回の bulk_create で作成し、コミット後にまとめて通知する。
+    作成した行の ID を返さない DB（MySQL）ではコミット直後の通知は行わず、DatabaseTransport のポーリングで配信される。
+    """
+    rows = UserEvent.objects.bulk_create(
+        [
+            UserEvent(user_id=user_id, store_id=store_id, kind=kind, payload=payload)
+            for kind, payload, user_id, store_id in events
+        ]
+    )
+    created = [row for row in rows if row.event_id is not None]
+
+    def notify():
+        transport = get_transport()
+        for row in created:
+            transport.notify(row)
+
+    if created:
+        transaction.on_commit(notify)
+    return rows
+
+
+def serialize_event(event):
+    return {
+        "id": event.event_id,
+        "user_id": event.user_id,
+        "store_id": event.store_id,
+        "kind": event.kind,
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat() if event.created_at else None,
+    }
+
+
+def format_sse(event):
+    data = json.dumps(
+        {"kind": event["kind"], "created_at": event["created_at"], **event["payload"]},
+        ensure_ascii=False,
+    )
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {data}\n\n"
+
+
+def _event_channel(event):
+    """イベントの配信先。None は全利用者向け（店舗チャンネルには流さない）。"""
+    if event["store_id"] is not None:
+        return store_channel(event["store_id"])
+    if event["user_id"] is not None:
+        return user_channel(event["user_id"])
+    return None
+
+
+def events_after(channels, last_event_id, limit=200):
+    """再接続時の再送分。購読中のチャンネル宛て（利用者なら全員宛ても）のイベントを event_id 順に返す。"""
+    condition = Q()
+    for kind, object_id in channels:
+        if kind == "store":
+            condition |= Q(store_id=object_id)
+        else:
+            condition |= Q(user_id=object_id, store__isnull=True) | Q(user__isnull=True, store__isnull=True)
+    if not condition:
+        return []
+    rows = UserEvent.objects.filter(condition, event_id__gt=last_event_id).order_by("event_id")[:limit]
+    return [serialize_event(row) for row in rows]
+
+
+def _prepare_stream(channels, last_event_id):
+    """
+    再送分を読み、この接続のスレッドが持つ DB 接続を閉じる。
+    ASGI では接続ごとに専用スレッドが割り当てられるため、待機中の接続が DB 接続を抱え続けないようにする。
+    """
+    try:
+        return events_after(channels, last_event_id) if last_event_id is not None else []
+    finally:
+        connections.close_all()
+
+
+class EventHub:
+    """
+    プロセス内の購読者管理。接続ごとに asyncio.Queue を1つ持ち、
+    届いたイベントを宛先チャンネル（("user", id) / ("store", id)）のキューへ配る。
+    宛先のないイベントは全利用者チャンネルへ配る。
+    購読・配信はすべてイベントループ上で行い、他スレッドからは dispatch_threadsafe を使う。
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._subscribers = {}
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # ループが作り直された場合（テストやコマンドの asyncio.run）は購読者も引き継がない
+            self.loop = loop
+            self._subscribers = {}
+            get_transport().start()
+
+    def subscribe(self, channels):
+        self._bind()
+        queue = asyncio.Queue(maxsize=getattr(settings, "EVENT_QUEUE_SIZE", 100))
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, channels, queue):
+        for channel in channels:
+            queues = self._subscribers.get(channel)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[channel]
+
+    def connection_count(self):
+        return len({queue for queues in self._subscribers.values() for queue in queues})
+
+    def dispatch(self, event):
+        channel = _event_channel(event)
+        if channel is None:
+            targets = {
+                queue
+                for (kind, _), queues in self._subscribers.items()
+                if kind == "user"
+                for queue in queues
+            }
+        else:
+            targets = list(self._subscribers.get(channel, ()))
+        for queue in targets:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_OVERFLOW)
+
+    def dispatch_threadsafe(self, event, callback=None):
+        """他スレッド（同期ビューやコミット時のフック）からループ上で配信する。"""
+        callback = callback or self.dispatch
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            callback(event)
+        else:
+            loop.call_soon_threadsafe(callback, event)
+
+
+class LocalTransport:
+    """同一プロセス内だけで配信する（開発用・ASGI ワーカー1つの構成向け）。"""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def notify(self, event):
+        self.hub.dispatch_threadsafe(serialize_event(event))
+
+
+class DatabaseTransport:
+    """
+    UserEvent テーブルを短い間隔でポーリングして配信する。
+    run_worker など別プロセスで作られたイベントも届き、クエリは購読者数によらず1プロセス1本。
+    同じプロセス内で作られたイベントはコミット直後に配り、ポーリング側では重複を除く。
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.cursor = None
+        self._delivered = set()
+        self._task = None
+        # ポーリング専用のスレッド（DB 接続もプロセスにつき1本）
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-poller")
+
+    def start(self):
+        self.cursor = None
+        self._delivered = set()
+        self._task = self.hub.loop.create_task(self._run())
+
+    def notify(self, event):
+        self.hub.dispatch_threadsafe(serialize_event(event), callback=self._deliver)
+
+    def _deliver(self, event):
+        if event["id"] in self._delivered or (self.cursor is not None and event["id"] <= self.cursor):
+            return
+        self._delivered.add(event["id"])
+        self.hub.dispatch(event)
+
+    def _fetch(self, cursor):
+        close_old_connections()
+        if cursor is None:
+            return UserEvent.objects.aggregate(last=Max("event_id"))["last"] or 0, []
+        rows = list(UserEvent.objects.filter(event_id__gt=cursor).order_by("event_id")[:500])
+        return cursor, rows
+
+    def _advance(self, rows):
+        """
+        連続した event_id までカーソルを進める。欠番（未コミットの行）の先は
+        EVENT_SETTLE_SECONDS を過ぎるまで待ち、ロールバックによる恒久的な欠番はそこで飛ばす。
+        """
+        settled_before = timezone.now().timestamp() - getattr(settings, "EVENT_SETTLE_SECONDS", 5)
+        cursor = self.cursor
+        for row in rows:
+            if row.event_id == cursor + 1 or row.created_at.timestamp() < settled_before:
+                cursor = row.event_id
+            else:
+                break
+        self.cursor = cursor
+        self._delivered = {event_id for event_id in self._delivered if event_id > cursor}
+
+    async def _run(self):
+        interval = getattr(settings, "EVENT_POLL_SECONDS", 1.0)
+        while True:
+            if not self.hub.connection_count():
+                # 購読者がいない間は読まず、次の購読開始時点から配信する
+                self.cursor = None
+                await asyncio.sleep(interval)
+                continue
+            try:
+                cursor, rows = await self.hub.loop.run_in_executor(self._executor, self._fetch, self.cursor)
+            except Exception:
+                await asyncio.sleep(interval)
+                continue
+            if self.cursor is None:
+                self.cursor = cursor
+            for row in rows:
+                self._deliver(serialize_event(row))
+            if rows:
+                self._advance(rows)
+            await asyncio.sleep(interval)
+
+
+_TRANSPORTS = {"db": DatabaseTransport, "local": LocalTransport}
+_hub = EventHub()
+_transport = None
+
+
+def get_hub():
+    return _hub
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        name = getattr(settings, "EVENT_TRANSPORT", "db")
+        _transport = _TRANSPORTS[name](_hub)
+    return _transport
+
+
+async def stream(channels, last_event_id=None):
+    """
+    1接続分の SSE 本文を返す非同期ジェネレータ。channels は購読するチャンネルの一覧。
+    先に購読してから再送分を読むことで、その間に発生したイベントも取りこぼさない。
+    """
+    hub = get_hub()
+    queue = hub.subscribe(channels)
+    heartbeat = getattr(settings, "EVENT_HEARTBEAT_SECONDS", 15)
+    deadline = asyncio.get_running_loop().time() + getattr(settings, "EVENT_STREAM_MAX_SECONDS", 600)
+    replayed = set()
+    try:
+        yield f"retry: {getattr(settings, 'EVENT_RETRY_MS', 3000)}\n\n"
+        for event in await sync_to_async(_prepare_stream)(channels, last_event_id):
+            replayed.add(event["id"])
+            yield format_sse(event)
+        while True:
+            # アクセストークンの期限を超えて張り続けないよう、一定時間で閉じて再接続させる
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is _OVERFLOW:
+                return
+            if event["id"] in replayed:
+                continue
+            yield format_sse(event)
+    finally:
+        hub.unsubscribe(channels, queue)
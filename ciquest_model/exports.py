@@ -0,0 +1,184 @@
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ciquest_model.models import CouponUsageHistory, StoreStampHistory, UserChallenge
+
+# データセット名 -> (モデル, 日付で絞り込む列, 店舗で絞り込む列, [(見出し, values_list の列), ...])
+EXPORTS = {
+    "coupon-usage": (
+        CouponUsageHistory,
+        "used_at",
+        "store_id",
+        [
+            ("used_at", "used_at"),
+            ("store_id", "store_id"),
+            ("store_name", "store__name"),
+            ("coupon_id", "coupon_id"),
+            ("coupon_title", "coupon__title"),
+            ("coupon_type", "coupon_type"),
+            ("user_id", "user_id"),
+            ("username", "user__username"),
+        ],
+    ),
+    "stamps": (
+        StoreStampHistory,
+        "stamped_at",
+        "store_id",
+        [
+            ("stamped_at", "stamped_at"),
+            ("stamp_date", "stamp_date"),
+            ("store_id", "store_id"),
+            ("store_name", "store__name"),
+            ("user_id", "user_id"),
+            ("username", "user__username"),
+        ],
+    ),
+    "challenges": (
+        UserChallenge,
+        "cleared_at",
+        "challenge__store_id",
+        [
+            ("cleared_at", "cleared_at"),
+            ("status", "status"),
+            ("store_id", "challenge__store_id"),
+            ("challenge_id", "challenge_id"),
+            ("challenge_title", "challenge__title"),
+            ("user_id", "user_id"),
+            ("username", "user__username"),
+            ("approved_by_store", "approved_by_store"),
+        ],
+    ),
+}
+FORMATS = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson; charset=utf-8"}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_date_range(params):
+    """?from=YYYY-MM-DD&to=YYYY-MM-DD（両端を含むローカル日付）を (開始, 終了の翌日0時) の aware datetime にする。"""
+    bounds = []
+    for name in ("from", "to"):
+        raw = (params.get(name) or "").strip()
+        if not raw:
+            bounds.append(None)
+            continue
+        try:
+            value = parse_date(raw)
+        except ValueError:
+            value = None
+        if value is None:
+            raise ExportError(f"{name} は YYYY-MM-DD 形式で指定してください。")
+        bounds.append(value)
+    start, end = bounds
+    if start and end and start > end:
+        raise ExportError("from には to 以前の日付を指定してください。")
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.datetime.combine(start, datetime.time.min, tzinfo=tz) if start else None,
+        datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz) if end else None,
+    )
+
+
+def _after(order, values):
+    """order の列の値の組が values より後ろ（辞書順）の行の条件。"""
+    condition = Q(**{f"{order[-1]}__gt": values[-1]})
+    for field, value in zip(reversed(order[:-1]), reversed(values[:-1])):
+        condition = Q(**{f"{field}__gt": value}) | (Q(**{field: value}) & condition)
+    return condition
+
+
+def _keyset_rows(rows, fields, order, chunk_size):
+    """
+    order（末尾に pk を足す）の順に、前のページの最後の行より後ろを LIMIT chunk_size で読み直して1行ずつ返す。
+    ページごとに別のクエリになるため、DB がサーバーサイドカーソルを持たなくても結果を丸ごと抱えない。
+    """
+    order = [*order, "pk"]
+    rows = rows.order_by(*order).values_list(*fields, *order)
+    after = None
+    while True:
+        page = list((rows.filter(_after(order, after)) if after else rows)[:chunk_size])
+        for row in page:
+            yield row[:len(fields)]
+        if len(page) < chunk_size:
+            return
+        after = page[-1][len(fields):]
+
+
+def export_rows(dataset, store_ids=None, start=None, end=None):
+    """
+    1行ずつ返すイテレータ。values_list で必要な列だけを読み、(日付, pk) のキーセットで EXPORT_CHUNK_SIZE 行ずつ
+    LIMIT 付きのクエリを繰り返して取り出す（MySQL でも件数によらずメモリ使用量は一定）。
+    日付が NULL の行（日付の範囲を指定しないときだけ含まれる）は NULL の並び順が DB ごとに違うため、先に pk 順で返す。
+    store_ids が None なら全店舗。日付範囲は [start, end)。
+    """
+    model, date_field, store_field, columns = EXPORTS[dataset]
+    rows = model.objects.all()
+    if store_ids is not None:
+        rows = rows.filter(**{f"{store_field}__in": store_ids})
+    if start:
+        rows = rows.filter(**{f"{date_field}__gte": start})
+    if end:
+        rows = rows.filter(**{f"{date_field}__lt": end})
+    fields = [field for _, field in columns]
+    chunk_size = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    if not (start or end):
+        yield from _keyset_rows(rows.filter(**{f"{date_field}__isnull": True}), fields, [], chunk_size)
+    yield from _keyset_rows(rows.filter(**{f"{date_field}__isnull": False}), fields, [date_field], chunk_size)
+
+
+def _format_value(value):
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """csv.writer の書き込み先。書いた1行をそのまま返す。"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    # Excel で開いても文字化けしないよう BOM を付ける
+    yield "\ufeff" + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(["" if value is None else _format_value(value) for value in row])
+
+
+def stream_jsonl(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, map(_format_value, row))), ensure_ascii=False) + "\n"
+
+
+def export_response(dataset, fmt, store_ids=None, params=None, filename_prefix="ciquest"):
+    """
+    StreamingHttpResponse を返す。dataset / fmt / 日付範囲が不正なら ExportError。
+    行はレスポンスの送信中に読み出されるため、ビューの処理中に全件を読み込むことはない。
+    """
+    if dataset not in EXPORTS:
+        raise ExportError("出力できないデータです。")
+    if fmt not in FORMATS:
+        raise ExportError("format は csv または jsonl を指定してください。")
+    start, end = parse_date_range(params or {})
+    headers = [header for header, _ in EXPORTS[dataset][3]]
+    rows = export_rows(dataset, store_ids=store_ids, start=start, end=end)
+    body = stream_csv(headers, rows) if fmt == "csv" else stream_jsonl(headers, rows)
+    response = StreamingHttpResponse(body, content_type=FORMATS[fmt])
+    stamp = timezone.localtime().strftime("%Y%m%d")
+    response["Content-Disposition"] = f'attachment; filename="{filename_prefix}-{dataset}-{stamp}.{fmt}"'
+    response["Cache-Control"] = "no-store"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,243 @@
+import datetime
+
+from django.utils import timezone
+
+from ciquest_model.events import publish as publish_event
+from ciquest_model.models import Badge, Rank, StoreStamp, StoreStampHistory, UserBadge, UserChallenge
+
+
+RANK_DEFINITIONS = [
+    {"name": "ブロンズ", "threshold": 0, "multiplier": 1.0},
+    {"name": "シルバー", "threshold": 25, "multiplier": 1.1},
+    {"name": "ゴールド", "threshold": 50, "multiplier": 1.2},
+    {"name": "レジェンド", "threshold": 100, "multiplier": 1.3},
+    {"name": "エリート", "threshold": 200, "multiplier": 1.4},
+]
+RANK_ORDER = [definition["name"] for definition in RANK_DEFINITIONS]
+
+
+def rank_period_start(now=None):
+    current = timezone.localtime(now or timezone.now())
+    start_month = current.month if current.month % 2 == 1 else current.month - 1
+    start_year = current.year
+    start_date = datetime.datetime(start_year, start_month, 1)
+    return timezone.make_aware(start_date, timezone.get_current_timezone())
+
+
+def ensure_rank_catalog():
+    ranks = {}
+    for definition in RANK_DEFINITIONS:
+        rank, created = Rank.objects.get_or_create(
+            name=definition["name"],
+            defaults={"required_points": definition["threshold"]},
+        )
+        if not created and rank.required_points != definition["threshold"]:
+            rank.required_points = definition["threshold"]
+            rank.save(update_fields=["required_points"])
+        ranks[definition["name"]] = rank
+    return ranks
+
+
+def rank_index(rank):
+    if not rank:
+        return 0
+    try:
+        return RANK_ORDER.index(rank.name)
+    except ValueError:
+        return 0
+
+
+def rank_multiplier(rank):
+    if not rank:
+        return 1.0
+    for definition in RANK_DEFINITIONS:
+        if definition["name"] == rank.name:
+            return definition["multiplier"]
+    return 1.0
+
+
+def _rank_from_clears(clears, ranks):
+    for definition in reversed(RANK_DEFINITIONS):
+        if clears >= definition["threshold"]:
+            return ranks[definition["name"]]
+    return ranks[RANK_ORDER[0]]
+
+
+def ensure_user_rank(user):
+    ranks = ensure_rank_catalog()
+    fields_to_update = []
+    previous_rank_id = user.rank_id
+
+    if not user.rank_id:
+        user.rank = ranks[RANK_ORDER[0]]
+        fields_to_update.append("rank")
+    current_rank = user.rank or ranks[RANK_ORDER[0]]
+
+    period_start = rank_period_start()
+    if user.last_rank_reset_at is None or user.last_rank_reset_at < period_start:
+        new_index = max(rank_index(current_rank) - 1, 0)
+        new_rank = ranks[RANK_ORDER[new_index]]
+        if current_rank.rank_id != new_rank.rank_id:
+            user.rank = new_rank
+            fields_to_update.append("rank")
+            current_rank = new_rank
+        user.last_rank_reset_at = period_start
+        fields_to_update.append("last_rank_reset_at")
+
+    clears = UserChallenge.objects.filter(
+        user=user,
+        status="cleared",
+        cleared_at__gte=period_start,
+    ).count()
+    target_rank = _rank_from_clears(clears, ranks)
+    if rank_index(target_rank) > rank_index(current_rank):
+        user.rank = target_rank
+        fields_to_update.append("rank")
+        current_rank = target_rank
+
+    if fields_to_update:
+        user.save(update_fields=sorted(set(fields_to_update)))
+    if previous_rank_id and previous_rank_id != current_rank.rank_id:
+        previous_rank = next((rank for rank in ranks.values() if rank.rank_id == previous_rank_id), None)
+        publish_event(
+            "rank_changed",
+            {
+                "rank": current_rank.name,
+                "rank_id": current_rank.rank_id,
+                "rank_multiplier": rank_multiplier(current_rank),
+                "previous_rank": previous_rank.name if previous_rank else None,
+                "rank_up": rank_index(current_rank) > rank_index(previous_rank),
+            },
+            user_id=user.user_id,
+        )
+    return current_rank, clears
+
+
+BADGE_DEFINITIONS = [
+    {"code": "quest_1", "name": "はじめの一歩", "description": "クエストを1回クリア", "category": "quest", "hidden": False},
+    {"code": "quest_10", "name": "冒険者", "description": "クエストを10回クリア", "category": "quest", "hidden": False},
+    {"code": "quest_50", "name": "熟練者", "description": "クエストを50回クリア", "category": "quest", "hidden": False},
+    {"code": "quest_200", "name": "伝説", "description": "クエストを200回クリア", "category": "quest", "hidden": False},
+    {"code": "stamp_5", "name": "コレクター", "description": "スタンプを5回獲得", "category": "stamp", "hidden": False},
+    {"code": "stamp_20", "name": "マニア", "description": "スタンプを20回獲得", "category": "stamp", "hidden": False},
+    {"code": "stamp_100", "name": "マスター", "description": "スタンプを100回獲得", "category": "stamp", "hidden": False},
+    {"code": "store_3", "name": "探索者", "description": "3店舗でクエストをクリア", "category": "store", "hidden": False},
+    {"code": "store_10", "name": "放浪者", "description": "10店舗でクエストをクリア", "category": "store", "hidden": False},
+    {"code": "store_30", "name": "世界見聞", "description": "30店舗でクエストをクリア", "category": "store", "hidden": False},
+    {"code": "night_owl", "name": "夜更かし冒険者", "description": "深夜にクエストをクリア", "category": "hidden", "hidden": True},
+    {"code": "streak_7", "name": "連続挑戦者", "description": "7日連続でクエストをクリア", "category": "hidden", "hidden": True},
+    {"code": "stamp_artisan", "name": "スタンプ職人", "description": "同じ店舗でスタンプを10回獲得", "category": "hidden", "hidden": True},
+]
+
+
+def ensure_badge_catalog():
+    badges = {}
+    for definition in BADGE_DEFINITIONS:
+        badge, created = Badge.objects.get_or_create(
+            code=definition["code"],
+            defaults={
+                "name": definition["name"],
+                "description": definition["description"],
+                "category": definition["category"],
+                "is_hidden": definition["hidden"],
+            },
+        )
+        if not created:
+            updates = []
+            if badge.name != definition["name"]:
+                badge.name = definition["name"]
+                updates.append("name")
+            if badge.description != definition["description"]:
+                badge.description = definition["description"]
+                updates.append("description")
+            if badge.category != definition["category"]:
+                badge.category = definition["category"]
+                updates.append("category")
+            if badge.is_hidden != definition["hidden"]:
+                badge.is_hidden = definition["hidden"]
+                updates.append("is_hidden")
+            if updates:
+                badge.save(update_fields=updates)
+        badges[definition["code"]] = badge
+    return badges
+
+
+def serialize_badge(badge, awarded_at=None):
+    return {
+        "id": badge.badge_id,
+        "code": badge.code,
+        "name": badge.name,
+        "description": badge.description or "",
+        "category": badge.category,
+        "awarded_at": awarded_at.isoformat() if awarded_at else None,
+    }
+
+
+def _grant_badge(user, badge):
+    user_badge, created = UserBadge.objects.get_or_create(user=user, badge=badge)
+    if not created:
+        return None
+    payload = serialize_badge(badge, awarded_at=user_badge.awarded_at)
+    publish_event("badge_unlocked", payload, user_id=user.user_id)
+    return payload
+
+
+def _has_streak(user, days):
+    cleared_dates = set(
+        UserChallenge.objects.filter(user=user, status="cleared")
+        .values_list("cleared_at__date", flat=True)
+        .distinct()
+    )
+    if not cleared_dates:
+        return False
+    current = timezone.localdate()
+    for _ in range(days):
+        if current not in cleared_dates:
+            return False
+        current -= datetime.timedelta(days=1)
+    return True
+
+
+def award_badges_for_user(user, cleared_at=None, store_id=None):
+    badges = ensure_badge_catalog()
+    new_badges = []
+
+    def maybe_award(code, condition):
+        if not condition:
+            return
+        payload = _grant_badge(user, badges[code])
+        if payload:
+            new_badges.append(payload)
+
+    total_clears = UserChallenge.objects.filter(user=user, status="cleared").count()
+    maybe_award("quest_1", total_clears >= 1)
+    maybe_award("quest_10", total_clears >= 10)
+    maybe_award("quest_50", total_clears >= 50)
+    maybe_award("quest_200", total_clears >= 200)
+
+    total_stamps = StoreStampHistory.objects.filter(user=user).count()
+    maybe_award("stamp_5", total_stamps >= 5)
+    maybe_award("stamp_20", total_stamps >= 20)
+    maybe_award("stamp_100", total_stamps >= 100)
+
+    unique_stores = (
+        UserChallenge.objects.filter(user=user, status="cleared")
+        .values("challenge__store_id")
+        .distinct()
+        .count()
+    )
+    maybe_award("store_3", unique_stores >= 3)
+    maybe_award("store_10", unique_stores >= 10)
+    maybe_award("store_30", unique_stores >= 30)
+
+    if cleared_at:
+        local_time = timezone.localtime(cleared_at)
+        maybe_award("night_owl", 0 <= local_time.hour < 5)
+        maybe_award("streak_7", _has_streak(user, 7))
+
+    if store_id:
+        user_stamp = StoreStamp.objects.filter(user=user, store_id=store_id).first()
+        if user_stamp and user_stamp.stamps_count >= 10:
+            maybe_award("stamp_artisan", True)
+
+    return new_badges
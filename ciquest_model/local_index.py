@@ -0,0 +1,47 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class LocalIndex:
+    """
+    プロセスごとにメモリ上に持つ読み取り用の索引。
+    キャッシュ上の版（version_key）が手元の版と違えば（初回も）build() で作り直す。
+    元データを変えた側は invalidate() で版を新しくし、全プロセスに作り直しを知らせる。
+    既定のキャッシュはプロセス内メモリで版が共有されないため、LOCAL_INDEX_MAX_AGE_SECONDS を過ぎた索引も作り直す。
+    """
+
+    def __init__(self, version_key, build):
+        self.version_key = version_key
+        self.build = build
+        self._lock = threading.Lock()
+        # (版, 作った時刻, 索引) の組で差し替える
+        self._current = (None, 0.0, None)
+
+    def _version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _is_fresh(self, version):
+        current_version, built_at, index = self._current
+        max_age = getattr(settings, "LOCAL_INDEX_MAX_AGE_SECONDS", 60)
+        return index is not None and current_version == version and time.monotonic() - built_at < max_age
+
+    def get(self):
+        version = self._version()
+        if not self._is_fresh(version):
+            with self._lock:
+                if not self._is_fresh(version):
+                    self._current = (version, time.monotonic(), self.build())
+        return self._current[2]
+
+    def invalidate(self):
+        # 確定前に版を変えると、他のプロセスが変更前の内容で作り直して新しい版として持ってしまう
+        transaction.on_commit(lambda: cache.set(self.version_key, uuid.uuid4().hex, None))
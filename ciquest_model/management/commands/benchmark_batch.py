@@ -0,0 +1,92 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from ciquest_model.models import User
+
+DEFAULT_PATHS = [
+    "/api/me/",
+    "/api/user-badges/",
+    "/api/coupons/",
+    "/api/user-coupons/history/",
+    "/api/notices/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "個別GETの連続呼び出しと /api/batch/ の1回呼び出しを比較します。"
+        "往復遅延（RTT）は --rtt-ms で模擬します（既定 150ms）。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user-id", type=int, help="トークンを発行する利用者（省略時は先頭の利用者）")
+        parser.add_argument("--rtt-ms", type=float, default=150.0, help="1往復あたりの模擬遅延（ミリ秒）")
+        parser.add_argument("--repeat", type=int, default=5, help="計測回数（中央値を表示）")
+        parser.add_argument("--sleep", action="store_true", help="遅延を加算ではなく実際に待機して計測する")
+        parser.add_argument("--path", action="append", dest="paths", help="計測するパス（複数指定可）")
+
+    def handle(self, *args, **options):
+        from ciquest_server.views import _create_access_token
+
+        users = User.objects.order_by("user_id")
+        user = users.filter(user_id=options["user_id"]).first() if options["user_id"] else users.first()
+        if not user:
+            raise CommandError("利用者が見つかりません。")
+
+        paths = options["paths"] or DEFAULT_PATHS
+        rtt = options["rtt_ms"] / 1000.0
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h and h != "*"), "localhost")
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {_create_access_token(user)}"}
+        if getattr(settings, "PHONE_API_KEY", ""):
+            headers["HTTP_PHONE_API_KEY"] = settings.PHONE_API_KEY
+        client = Client(HTTP_HOST=host, **headers)
+
+        def round_trip(call):
+            started = time.perf_counter()
+            if options["sleep"]:
+                time.sleep(rtt)
+            response = call()
+            elapsed = time.perf_counter() - started
+            if not options["sleep"]:
+                elapsed += rtt
+            return response, elapsed
+
+        sequential, batched = [], []
+        sequential_queries = batched_queries = 0
+        payload = json.dumps({"requests": [{"id": path, "path": path} for path in paths]})
+        for _ in range(max(options["repeat"], 1)):
+            total = 0.0
+            with CaptureQueriesContext(connection) as queries:
+                for path in paths:
+                    response, elapsed = round_trip(lambda: client.get(path))
+                    if response.status_code >= 400:
+                        raise CommandError(f"{path}: HTTP {response.status_code}")
+                    total += elapsed
+            sequential.append(total)
+            sequential_queries = len(queries)
+
+            with CaptureQueriesContext(connection) as queries:
+                response, elapsed = round_trip(
+                    lambda: client.post("/api/batch/", payload, content_type="application/json")
+                )
+            if response.status_code >= 400:
+                raise CommandError(f"/api/batch/: HTTP {response.status_code}")
+            failed = [item for item in response.json()["responses"] if item["status"] >= 400]
+            if failed:
+                raise CommandError(f"/api/batch/ のサブリクエストが失敗しました: {failed}")
+            batched.append(elapsed)
+            batched_queries = len(queries)
+
+        seq_ms = statistics.median(sequential) * 1000
+        batch_ms = statistics.median(batched) * 1000
+        self.stdout.write(f"paths={len(paths)} rtt={options['rtt_ms']:.0f}ms repeat={len(sequential)}")
+        self.stdout.write(f"個別GET : {seq_ms:8.1f} ms  queries={sequential_queries}")
+        self.stdout.write(f"batch   : {batch_ms:8.1f} ms  queries={batched_queries}")
+        self.stdout.write(self.style.SUCCESS(f"短縮: {seq_ms - batch_ms:.1f} ms ({seq_ms / batch_ms:.1f}x)"))
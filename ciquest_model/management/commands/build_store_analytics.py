@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ciquest_model.analytics import build_store_analytics
+
+
+class Command(BaseCommand):
+    help = "店舗の来店分析（曜日×時間帯ヒートマップ・週次リテンション）を作り直します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store-id", type=int, action="append", dest="store_ids", help="対象店舗（複数指定可）")
+        parser.add_argument("--batch-size", type=int, default=200, help="1回に読み込む店舗数")
+
+    def handle(self, *args, **options):
+        built = build_store_analytics(options["store_ids"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"分析を更新しました: {built} 店舗"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ciquest_model.recommendations import build_store_recommendations
+
+
+class Command(BaseCommand):
+    help = "おすすめ店舗の近傍（来店・クリアの共起）を作り直します。"
+
+    def handle(self, *args, **options):
+        built = build_store_recommendations()
+        self.stdout.write(self.style.SUCCESS(f"おすすめを更新しました: {built} 店舗"))
@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from ciquest_model.models import UserRefreshToken
+
+
+class Command(BaseCommand):
+    help = "期限切れ・失効済みのリフレッシュトークンをバッチ単位で削除します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1回の DELETE で削除する最大件数")
+        parser.add_argument(
+            "--revoked-grace-hours",
+            type=int,
+            default=24,
+            help="失効後この時間を過ぎた行を削除する（デフォルト24時間）",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        revoked_before = now - datetime.timedelta(hours=options["revoked_grace_hours"])
+        condition = Q(expires_at__lte=now) | Q(revoked_at__lte=revoked_before)
+
+        deleted_total = 0
+        while True:
+            ids = list(
+                UserRefreshToken.objects.filter(condition)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted, _ = UserRefreshToken.objects.filter(id__in=ids).delete()
+            deleted_total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f"削除完了: {deleted_total} 件のリフレッシュトークンを削除しました。"))
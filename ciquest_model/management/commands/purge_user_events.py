@@ -0,0 +1,38 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ciquest_model.models import UserEvent
+
+
+class Command(BaseCommand):
+    help = "保持期間を過ぎた SSE 配信イベント（UserEvent）をバッチ単位で削除します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1回の DELETE で削除する最大件数")
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=None,
+            help="この時間より古い行を削除する（省略時は EVENT_RETENTION_HOURS）",
+        )
+
+    def handle(self, *args, **options):
+        hours = options["hours"] or getattr(settings, "EVENT_RETENTION_HOURS", 72)
+        created_before = timezone.now() - datetime.timedelta(hours=hours)
+
+        deleted_total = 0
+        while True:
+            ids = list(
+                UserEvent.objects.filter(created_at__lt=created_before)
+                .order_by("event_id")
+                .values_list("event_id", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            deleted, _ = UserEvent.objects.filter(event_id__in=ids).delete()
+            deleted_total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f"削除完了: {deleted_total} 件のイベントを削除しました。"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ciquest_model.search import SOURCES, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "検索索引（店舗・クエスト・タグ・利用者）を作り直します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=sorted(SOURCES), action="append", dest="kinds", help="対象の種類（複数指定可）")
+        parser.add_argument("--batch-size", type=int, default=500, help="1回に読み込む件数")
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index(options["kinds"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"検索索引を更新しました: {total} 件"))
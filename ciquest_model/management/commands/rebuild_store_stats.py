@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ciquest_model.store_stats import rebuild_store_stats, schedule_nightly_rebuild
+
+
+class Command(BaseCommand):
+    help = "店舗の日別集計（StoreDailyStats）を元データから再集計します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store-id", type=int, action="append", dest="store_ids", help="対象店舗（複数指定可）")
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="再集計はせず、夜間の再集計タスクが登録されていなければ登録する",
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            created = schedule_nightly_rebuild()
+            self.stdout.write(self.style.SUCCESS("登録しました。" if created else "登録済みです。"))
+            return
+        stores, rows = rebuild_store_stats(options["store_ids"])
+        self.stdout.write(self.style.SUCCESS(f"再集計完了: {stores} 店舗 / {rows} 行"))
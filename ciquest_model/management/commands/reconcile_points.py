@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ciquest_model.points import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "ポイント台帳（PointsLedger）の合計からユーザーのポイント残高を再計算します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="1回で処理するユーザー数")
+        parser.add_argument("--dry-run", action="store_true", help="ずれている件数だけを表示し、更新しない")
+
+    def handle(self, *args, **options):
+        checked, fixed = reconcile_balances(batch_size=options["batch_size"], dry_run=options["dry_run"])
+        label = "ずれ検出" if options["dry_run"] else "修正"
+        self.stdout.write(self.style.SUCCESS(f"確認: {checked} 件 / {label}: {fixed} 件"))
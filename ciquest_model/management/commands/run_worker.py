@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from ciquest_model.tasks import claim_tasks, run_task
+
+
+class Command(BaseCommand):
+    help = "バックグラウンドタスク（BackgroundTask）を処理します。--loop で常駐ワーカーとして動作します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="同時に実行するスレッド数")
+        parser.add_argument("--batch-size", type=int, default=20, help="1回のポーリングで確保する最大件数")
+        parser.add_argument("--loop", action="store_true", help="キューを監視し続ける")
+        parser.add_argument("--interval", type=float, default=1.0, help="キューが空のときの待機秒数")
+
+    def handle(self, *args, **options):
+        threads = max(options["threads"], 1)
+        batch_size = max(options["batch_size"], 1)
+        totals = {"done": 0, "pending": 0, "failed": 0}
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ciquest-task") as pool:
+            while True:
+                rows = claim_tasks(limit=batch_size)
+                if rows:
+                    for status in pool.map(run_task, rows):
+                        totals[status] = totals.get(status, 0) + 1
+                    self.stdout.write(
+                        f"processed={len(rows)} done={totals['done']} "
+                        f"retry={totals['pending']} failed={totals['failed']}"
+                    )
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"完了: {totals['done']} 件 / 再試行待ち: {totals['pending']} 件 / 失敗: {totals['failed']} 件"
+            )
+        )
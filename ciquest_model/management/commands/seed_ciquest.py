@@ -22,6 +22,7 @@ from ciquest_model.models import (
     UserChallenge,
     UserCoupon,
 )
+from ciquest_model.points import adjust_points
 
 
 class Command(BaseCommand):
@@ -44,7 +45,7 @@ class Command(BaseCommand):
         def upsert_user(email, username, raw_password, rank, points):
             obj, created = User.objects.get_or_create(
                 email=email,
-                defaults={"username": username, "password": raw_password, "rank": rank, "points": points},
+                defaults={"username": username, "password": raw_password, "rank": rank},
             )
             if not created:
                 # update safe fields only (do NOT reset password on re-run)
@@ -55,11 +56,11 @@ class Command(BaseCommand):
                 if obj.rank_id != (rank.rank_id if rank else None):
                     obj.rank = rank
                     changed = True
-                if obj.points != points:
-                    obj.points = points
-                    changed = True
                 if changed:
-                    obj.save(update_fields=["username", "rank", "points"])
+                    obj.save(update_fields=["username", "rank"])
+            # points are only changed through the ledger
+            if obj.points != points:
+                adjust_points(obj, points - obj.points, note="seed")
             return obj
 
         def upsert_owner(email, raw_password, **fields):
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ciquest_model.email_outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "メール送信キュー（EmailOutbox）を処理します。--loop で常駐ワーカーとして動作します。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="1バッチで送信する最大件数")
+        parser.add_argument("--timeout", type=int, default=10, help="SMTP 接続タイムアウト秒数")
+        parser.add_argument("--loop", action="store_true", help="キューを監視し続ける")
+        parser.add_argument("--interval", type=float, default=5.0, help="キューが空のときの待機秒数")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        timeout = options["timeout"]
+        total_sent = total_failed = 0
+
+        while True:
+            sent, failed = deliver_batch(batch_size=batch_size, timeout=timeout)
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"sent={sent} failed={failed}")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"送信完了: {total_sent} 件 / 失敗: {total_failed} 件"))
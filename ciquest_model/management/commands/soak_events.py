@@ -0,0 +1,186 @@
+import asyncio
+import json
+import resource
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from ciquest_model import events
+from ciquest_model.models import User, UserEvent
+
+
+class _Connection:
+    """ASGI アプリへ直接つなぐ SSE クライアント1本分。受信したイベントとハートビートを数える。"""
+
+    def __init__(self, scope, stop):
+        self.scope = scope
+        self.stop = stop
+        self.status = None
+        self.heartbeats = 0
+        self.latencies = []
+        self._requested = False
+
+    async def receive(self):
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.stop.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            return
+        if message["type"] != "http.response.body":
+            return
+        received_at = time.time()
+        for block in message.get("body", b"").decode().split("\n\n"):
+            if block.startswith(": ping"):
+                self.heartbeats += 1
+            for line in block.splitlines():
+                if line.startswith("data: "):
+                    sent_at = json.loads(line[6:]).get("soak_sent_at")
+                    if sent_at:
+                        self.latencies.append(received_at - sent_at)
+
+
+class Command(BaseCommand):
+    help = (
+        "SSE /api/events/ に多数の待機接続を張り、ハートビート・配信遅延・メモリ使用量を計測します。"
+        "ASGI アプリをプロセス内で直接呼び出すため、サーバーの起動は不要です。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=2000, help="同時接続数")
+        parser.add_argument("--users", type=int, default=50, help="接続に使う利用者数（先頭から順に割り当て）")
+        parser.add_argument("--duration", type=float, default=30.0, help="全接続が張れてから維持する秒数")
+        parser.add_argument("--ramp-timeout", type=float, default=120.0, help="接続を張り終えるまでの待ち時間の上限")
+        parser.add_argument("--heartbeat", type=int, default=5, help="ハートビート間隔（秒）")
+        parser.add_argument("--events", type=int, default=10, help="計測中に発行する全員宛てイベントの数")
+        parser.add_argument("--transport", choices=["db", "local"], default="db", help="配信経路")
+
+    def handle(self, *args, **options):
+        from ciquest_server.views import _create_access_token
+
+        users = list(User.objects.order_by("user_id")[: max(options["users"], 1)])
+        if not users:
+            raise CommandError("利用者が見つかりません。")
+        host = next((h.lstrip(".") for h in settings.ALLOWED_HOSTS if h and h != "*"), "localhost")
+        tokens = [_create_access_token(user) for user in users]
+        first_event_id = (UserEvent.objects.order_by("-event_id").values_list("event_id", flat=True).first() or 0) + 1
+
+        overrides = {
+            "EVENT_TRANSPORT": options["transport"],
+            "EVENT_HEARTBEAT_SECONDS": options["heartbeat"],
+            "EVENT_STREAM_MAX_SECONDS": int(options["duration"] + options["ramp_timeout"]) + 60,
+            "EVENT_POLL_SECONDS": 0.5,
+        }
+        try:
+            with override_settings(**overrides):
+                events._transport = None
+                report = asyncio.run(self._soak(options, host, tokens))
+        finally:
+            events._transport = None
+            UserEvent.objects.filter(event_id__gte=first_event_id, payload__title="soak").delete()
+
+        opened, failed, heartbeats, latencies, expected, open_at_peak, ramp_seconds, rss = report
+        self.stdout.write(
+            f"connections={options['connections']} opened={opened} failed={failed} "
+            f"open_at_peak={open_at_peak} ramp={ramp_seconds:.1f}s transport={options['transport']}"
+        )
+        if heartbeats:
+            self.stdout.write(f"heartbeats/conn: min={min(heartbeats)} median={statistics.median(heartbeats):.0f}")
+        self.stdout.write(f"events delivered: {len(latencies)} / {expected}")
+        if latencies:
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+            self.stdout.write(
+                f"latency ms: p50={statistics.median(latencies) * 1000:.1f} "
+                f"p95={p95 * 1000:.1f} max={latencies[-1] * 1000:.1f}"
+            )
+        rss_before, rss_after = rss
+        self.stdout.write(
+            f"maxrss: {rss_before / 1024:.0f} MB -> {rss_after / 1024:.0f} MB "
+            f"({(rss_after - rss_before) / max(open_at_peak, 1):.1f} KB/conn)"
+        )
+        if failed or len(latencies) < expected:
+            raise CommandError("取りこぼしまたは接続失敗がありました。")
+        self.stdout.write(self.style.SUCCESS("OK"))
+
+    async def _soak(self, options, host, tokens):
+        from ciquest_server.asgi import application
+
+        stop = asyncio.Event()
+        connections = []
+        for index in range(options["connections"]):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": "/api/events/",
+                "raw_path": b"/api/events/",
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", host.encode()),
+                    (b"accept", b"text/event-stream"),
+                    (b"authorization", f"Bearer {tokens[index % len(tokens)]}".encode()),
+                ],
+                "client": ("127.0.0.1", 10000 + index),
+                "server": (host, 80),
+            }
+            connections.append(_Connection(scope, stop))
+        tasks = [
+            asyncio.create_task(application(conn.scope, conn.receive, conn.send)) for conn in connections
+        ]
+
+        hub = events.get_hub()
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.monotonic()
+        while hub.connection_count() < len(connections) and time.monotonic() < started + options["ramp_timeout"]:
+            if all(task.done() for task in tasks):
+                break
+            await asyncio.sleep(0.1)
+        ramp_seconds = time.monotonic() - started
+        open_at_peak = hub.connection_count()
+        deadline = time.monotonic() + options["duration"]
+
+        published = 0
+        interval = options["duration"] / (options["events"] + 1)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            if published < options["events"] and time.monotonic() < deadline - 2:
+                await sync_to_async(self._publish)(options["transport"])
+                published += 1
+
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stop.set()
+        await asyncio.wait(tasks, timeout=10)
+        opened = sum(1 for conn in connections if conn.status == 200)
+        failed = len(connections) - opened
+        heartbeats = [conn.heartbeats for conn in connections if conn.status == 200]
+        latencies = [latency for conn in connections for latency in conn.latencies]
+        return (
+            opened,
+            failed,
+            heartbeats,
+            latencies,
+            published * opened,
+            open_at_peak,
+            ramp_seconds,
+            (rss_before, rss_after),
+        )
+
+    def _publish(self, transport):
+        payload = {"notice_id": None, "title": "soak", "soak_sent_at": time.time()}
+        if transport == "db":
+            # 別プロセス（ワーカー）からの発行を模擬し、ポーリング経由で届くことを確かめる
+            UserEvent.objects.create(kind="notice_published", payload=payload)
+        else:
+            events.publish("notice_published", payload)
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import secrets
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def compact_refresh_tokens(apps, schema_editor):
+    """失効・期限切れを削除し、ユーザーごとに最新の有効トークン1件だけを残す。"""
+    UserRefreshToken = apps.get_model("ciquest_model", "UserRefreshToken")
+    now = timezone.now()
+    UserRefreshToken.objects.filter(models.Q(revoked_at__isnull=False) | models.Q(expires_at__lte=now)).delete()
+
+    seen_users = set()
+    stale_ids = []
+    for token in UserRefreshToken.objects.order_by("user_id", "-issued_at", "-id").iterator():
+        if token.user_id in seen_users:
+            stale_ids.append(token.id)
+            continue
+        seen_users.add(token.user_id)
+        token.family_id = secrets.token_hex(16)
+        token.save(update_fields=["family_id"])
+    for start in range(0, len(stale_ids), 500):
+        UserRefreshToken.objects.filter(id__in=stale_ids[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0022_email_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userrefreshtoken",
+            name="device_id",
+            field=models.CharField(default="default", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="userrefreshtoken",
+            name="family_id",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="userrefreshtoken",
+            name="jti",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="userrefreshtoken",
+            name="rotated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(compact_refresh_tokens, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="userrefreshtoken",
+            constraint=models.UniqueConstraint(fields=("user", "device_id"), name="uq_refresh_token_user_device"),
+        ),
+        migrations.AddIndex(
+            model_name="userrefreshtoken",
+            index=models.Index(fields=["expires_at"], name="idx_refresh_token_expires"),
+        ),
+    ]
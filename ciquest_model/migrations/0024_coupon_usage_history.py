@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_usage_history(apps, schema_editor):
+    """旧2テーブルの内容を1つの利用履歴にまとめる（両方に同じ行がある場合は1件にする）。"""
+    CouponUsageHistory = apps.get_model("ciquest_model", "CouponUsageHistory")
+    UserCouponUsageHistory = apps.get_model("ciquest_model", "UserCouponUsageHistory")
+    StoreCouponUsageHistory = apps.get_model("ciquest_model", "StoreCouponUsageHistory")
+
+    seen = set()
+    batch = []
+
+    def collect(queryset):
+        for row in queryset.order_by("used_at").iterator(chunk_size=2000):
+            key = (row.user_id, row.coupon_id, row.store_id, row.used_at)
+            if key in seen:
+                continue
+            seen.add(key)
+            batch.append(
+                CouponUsageHistory(
+                    user_id=row.user_id,
+                    coupon_id=row.coupon_id,
+                    store_id=row.store_id,
+                    coupon_type=row.coupon_type,
+                    used_at=row.used_at,
+                )
+            )
+            if len(batch) >= 2000:
+                CouponUsageHistory.objects.bulk_create(batch)
+                batch.clear()
+
+    collect(UserCouponUsageHistory.objects.all())
+    collect(StoreCouponUsageHistory.objects.all())
+    if batch:
+        CouponUsageHistory.objects.bulk_create(batch)
+
+
+def split_usage_history(apps, schema_editor):
+    CouponUsageHistory = apps.get_model("ciquest_model", "CouponUsageHistory")
+    UserCouponUsageHistory = apps.get_model("ciquest_model", "UserCouponUsageHistory")
+    StoreCouponUsageHistory = apps.get_model("ciquest_model", "StoreCouponUsageHistory")
+    user_rows = []
+    store_rows = []
+    for row in CouponUsageHistory.objects.order_by("used_at").iterator(chunk_size=2000):
+        fields = {
+            "user_id": row.user_id,
+            "coupon_id": row.coupon_id,
+            "store_id": row.store_id,
+            "coupon_type": row.coupon_type,
+            "used_at": row.used_at,
+        }
+        user_rows.append(UserCouponUsageHistory(**fields))
+        store_rows.append(StoreCouponUsageHistory(**fields))
+    UserCouponUsageHistory.objects.bulk_create(user_rows, batch_size=2000)
+    StoreCouponUsageHistory.objects.bulk_create(store_rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0023_refresh_token_families"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CouponUsageHistory",
+            fields=[
+                ("coupon_usage_history_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "coupon_type",
+                    models.CharField(choices=[("common", "共通"), ("store_specific", "店舗独自")], max_length=20),
+                ),
+                ("used_at", models.DateTimeField()),
+                ("coupon", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="ciquest_model.coupon")),
+                ("store", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="ciquest_model.store")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="ciquest_model.user")),
+            ],
+            options={
+                "ordering": ["-used_at"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="couponusagehistory",
+            index=models.Index(fields=["user", "-used_at"], name="idx_coupon_usage_user"),
+        ),
+        migrations.AddIndex(
+            model_name="couponusagehistory",
+            index=models.Index(fields=["store", "-used_at"], name="idx_coupon_usage_store"),
+        ),
+        migrations.RunPython(copy_usage_history, split_usage_history),
+        migrations.DeleteModel(name="UserCouponUsageHistory"),
+        migrations.DeleteModel(name="StoreCouponUsageHistory"),
+    ]
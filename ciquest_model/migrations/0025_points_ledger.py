@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_balances(apps, schema_editor):
+    """既存の残高を「調整」エントリとして台帳に記録する。"""
+    User = apps.get_model("ciquest_model", "User")
+    PointsLedger = apps.get_model("ciquest_model", "PointsLedger")
+    batch = []
+    for user_id, points in User.objects.exclude(points=0).values_list("user_id", "points").iterator(chunk_size=2000):
+        batch.append(PointsLedger(user_id=user_id, kind="adjust", amount=points, note="opening balance"))
+        if len(batch) >= 2000:
+            PointsLedger.objects.bulk_create(batch)
+            batch.clear()
+    if batch:
+        PointsLedger.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0024_coupon_usage_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PointsLedger",
+            fields=[
+                ("entry_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(choices=[("earn", "獲得"), ("spend", "利用"), ("adjust", "調整")], max_length=20),
+                ),
+                ("amount", models.IntegerField()),
+                ("note", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "challenge",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="ciquest_model.challenge",
+                    ),
+                ),
+                (
+                    "coupon",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="ciquest_model.coupon",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="points_entries",
+                        to="ciquest_model.user",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="pointsledger",
+            index=models.Index(fields=["user", "entry_id"], name="idx_points_ledger_user"),
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_badges_notified(apps, schema_editor):
+    # 既存の獲得バッジは通知済みとして扱い、未通知一覧に再表示しない
+    UserBadge = apps.get_model("ciquest_model", "UserBadge")
+    UserBadge.objects.filter(notified_at__isnull=True).update(notified_at=F("awarded_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0025_points_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BackgroundTask",
+            fields=[
+                ("task_id", models.AutoField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=100)),
+                ("payload", models.JSONField(default=dict)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "実行待ち"),
+                            ("running", "実行中"),
+                            ("done", "完了"),
+                            ("failed", "失敗"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("max_attempts", models.PositiveSmallIntegerField(default=5)),
+                ("run_after", models.DateTimeField()),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("duration_ms", models.PositiveIntegerField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="backgroundtask",
+            index=models.Index(fields=["status", "run_after"], name="idx_background_task_due"),
+        ),
+        migrations.AddField(
+            model_name="userbadge",
+            name="notified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="userbadge",
+            index=models.Index(fields=["user", "notified_at"], name="idx_user_badge_notified"),
+        ),
+        migrations.RunPython(mark_existing_badges_notified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+
+
+def backfill_change_log(apps, schema_editor):
+    # 既存データを初回同期（since=0）で返せるよう、全対象を1行ずつ記録する
+    ChangeLog = apps.get_model("ciquest_model", "ChangeLog")
+    Store = apps.get_model("ciquest_model", "Store")
+    Challenge = apps.get_model("ciquest_model", "Challenge")
+    Coupon = apps.get_model("ciquest_model", "Coupon")
+
+    store_status = dict(Store.objects.values_list("store_id", "status"))
+    rows = [
+        ChangeLog(entity="store", object_id=store_id, is_deleted=status != "approved")
+        for store_id, status in sorted(store_status.items())
+    ]
+    for challenge_id, store_id, is_banned in Challenge.objects.order_by("challenge_id").values_list(
+        "challenge_id", "store_id", "is_banned"
+    ):
+        hidden = is_banned or store_status.get(store_id) != "approved"
+        rows.append(ChangeLog(entity="challenge", object_id=challenge_id, is_deleted=hidden))
+    for coupon_id, store_id, publish_to_shop in Coupon.objects.order_by("coupon_id").values_list(
+        "coupon_id", "store_id", "publish_to_shop"
+    ):
+        hidden = not publish_to_shop or (store_id is not None and store_status.get(store_id) != "approved")
+        rows.append(ChangeLog(entity="coupon", object_id=coupon_id, is_deleted=hidden))
+    ChangeLog.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0026_background_tasks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLog",
+            fields=[
+                ("change_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "entity",
+                    models.CharField(
+                        choices=[("store", "店舗"), ("challenge", "クエスト"), ("coupon", "クーポン")],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.IntegerField()),
+                ("is_deleted", models.BooleanField(default=False)),
+                ("changed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="changelog",
+            constraint=models.UniqueConstraint(fields=("entity", "object_id"), name="uq_change_log_entity_object"),
+        ),
+        migrations.RunPython(backfill_change_log, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0027_change_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserEvent",
+            fields=[
+                ("event_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("badge_unlocked", "バッジ獲得"),
+                            ("rank_changed", "ランク変更"),
+                            ("coupon_granted", "クーポン付与"),
+                            ("notice_published", "お知らせ公開"),
+                        ],
+                        max_length=30,
+                    ),
+                ),
+                ("payload", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ciquest_model.user",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["user", "event_id"], name="idx_user_event_user"),
+                    models.Index(fields=["created_at"], name="idx_user_event_created"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0028_user_events"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userevent",
+            name="store",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="ciquest_model.store",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="userevent",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("badge_unlocked", "バッジ獲得"),
+                    ("rank_changed", "ランク変更"),
+                    ("coupon_granted", "クーポン付与"),
+                    ("notice_published", "お知らせ公開"),
+                    ("stamp_scanned", "スタンプ付与"),
+                    ("challenge_cleared", "クエストクリア"),
+                    ("coupon_redeemed", "クーポン利用"),
+                ],
+                max_length=30,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userevent",
+            index=models.Index(fields=["store", "event_id"], name="idx_user_event_store"),
+        ),
+    ]
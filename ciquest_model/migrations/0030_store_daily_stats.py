@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_initial_rebuild(apps, schema_editor):
+    # 既存データの集計はワーカーの rebuild_store_stats タスクで行う（以後は毎晩自動で再登録される）
+    BackgroundTask = apps.get_model("ciquest_model", "BackgroundTask")
+    BackgroundTask.objects.create(name="rebuild_store_stats", payload={}, run_after=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0029_user_event_store"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoreDailyStats",
+            fields=[
+                ("stats_id", models.AutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("stamps", models.PositiveIntegerField(default=0)),
+                ("clears", models.PositiveIntegerField(default=0)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("cleared", models.PositiveIntegerField(default=0)),
+                ("new_participants", models.PositiveIntegerField(default=0)),
+                ("unique_users", models.PositiveIntegerField(default=0)),
+                ("redemptions", models.PositiveIntegerField(default=0)),
+                ("challenge_clears", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "store",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="ciquest_model.store"),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="storedailystats",
+            constraint=models.UniqueConstraint(fields=("store", "date"), name="uq_store_daily_stats"),
+        ),
+        migrations.RunPython(schedule_initial_rebuild, migrations.RunPython.noop),
+    ]
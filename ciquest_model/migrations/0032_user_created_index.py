@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0031_store_analytics"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["-created_at"], name="idx_user_created"),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+from django.utils import timezone
+
+TABLE = "ciquest_model_searchdocument"
+FTS_TABLE = "search_document_fts"
+FULLTEXT_INDEX = "ftx_search_document_text"
+
+# SQLite: text を外部コンテンツとする FTS5（trigram）表をトリガーで同期する。
+# ※ SQLite で searchdocument 表を作り直すマイグレーションを足すときはトリガーも作り直すこと
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(text, content='{TABLE}', content_rowid='doc_id', tokenize='trigram')",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.doc_id, new.text);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.doc_id, old.text);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.doc_id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.doc_id, new.text);
+    END""",
+]
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+# PostgreSQL: pg_trgm の GIN 索引（LIKE '%語%' を索引で引く）
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX {FULLTEXT_INDEX} ON {TABLE} USING gin (text gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = [f"DROP INDEX IF EXISTS {FULLTEXT_INDEX}"]
+# MySQL: ngram パーサーの FULLTEXT 索引（日本語を2文字単位で引く）
+MYSQL_FORWARD = [f"ALTER TABLE {TABLE} ADD FULLTEXT INDEX {FULLTEXT_INDEX} (text) WITH PARSER ngram"]
+MYSQL_BACKWARD = [f"ALTER TABLE {TABLE} DROP INDEX {FULLTEXT_INDEX}"]
+
+STATEMENTS = {
+    "sqlite": (SQLITE_FORWARD, SQLITE_BACKWARD),
+    "postgresql": (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    "mysql": (MYSQL_FORWARD, MYSQL_BACKWARD),
+}
+
+
+def _run(schema_editor, statements):
+    # 作れない環境（trigram のない SQLite、pg_trgm を入れる権限がない等）では
+    # 索引なしのまま進め、検索は SearchGram の転置索引で行う
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for statement in statements:
+                schema_editor.execute(statement)
+    except DatabaseError:
+        pass
+
+
+def create_native_index(apps, schema_editor):
+    forward, _ = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    _run(schema_editor, forward)
+
+
+def drop_native_index(apps, schema_editor):
+    _, backward = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    _run(schema_editor, backward)
+
+
+def schedule_initial_build(apps, schema_editor):
+    # 既存データの索引づくりはワーカーの rebuild_search_index タスクで行う（以後は signals で更新される）
+    BackgroundTask = apps.get_model("ciquest_model", "BackgroundTask")
+    BackgroundTask.objects.create(name="rebuild_search_index", payload={}, run_after=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0032_user_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                ("doc_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("store", "店舗"), ("challenge", "クエスト"), ("tag", "タグ"), ("user", "利用者")],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.IntegerField()),
+                ("title", models.CharField(max_length=255)),
+                ("key", models.CharField(max_length=255)),
+                ("text", models.TextField()),
+                ("is_public", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "store",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ciquest_model.store",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("kind", "object_id"), name="uq_search_document_object"),
+                ],
+                "indexes": [
+                    models.Index(fields=["kind", "is_public"], name="idx_search_document_kind"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="SearchGram",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("gram", models.CharField(max_length=2)),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="grams",
+                        to="ciquest_model.searchdocument",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["gram", "document"], name="idx_search_gram"),
+                ],
+            },
+        ),
+        migrations.RunPython(create_native_index, drop_native_index),
+        migrations.RunPython(schedule_initial_build, migrations.RunPython.noop),
+    ]
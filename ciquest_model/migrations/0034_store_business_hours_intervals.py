@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+
+from ciquest_model.business_hours import compile_business_hours
+
+
+def compile_existing_hours(apps, schema_editor):
+    Store = apps.get_model("ciquest_model", "Store")
+    stores = list(Store.objects.exclude(business_hours_json=None).only("store_id", "business_hours_json"))
+    for store in stores:
+        store.business_hours_intervals = compile_business_hours(store.business_hours_json)
+    Store.objects.bulk_update(stores, ["business_hours_intervals"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0033_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="store",
+            name="business_hours_intervals",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(compile_existing_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_initial_build(apps, schema_editor):
+    # 既存データの近傍はワーカーの build_store_recommendations タスクで作る（以後は夜間の再集計の後に続けて実行される）
+    BackgroundTask = apps.get_model("ciquest_model", "BackgroundTask")
+    BackgroundTask.objects.create(name="build_store_recommendations", payload={}, run_after=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0034_store_business_hours_intervals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoreRecommendation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("neighbors", models.JSONField(default=list)),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "store",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommendation",
+                        to="ciquest_model.store",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(schedule_initial_build, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_initial_build(apps, schema_editor):
+    # 既存の店舗の並びはワーカーの refresh_store_feeds タスクで作る（以後は店舗の変更時と夜間の再集計の後に更新される）
+    BackgroundTask = apps.get_model("ciquest_model", "BackgroundTask")
+    BackgroundTask.objects.create(name="refresh_store_feeds", payload={}, run_after=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0035_store_recommendation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoreFeed",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("cell_x", models.IntegerField()),
+                ("cell_y", models.IntegerField()),
+                ("store_ids", models.JSONField(default=list)),
+                ("computed_at", models.DateTimeField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("cell_x", "cell_y"), name="uq_store_feed_cell"),
+                ],
+            },
+        ),
+        migrations.RunPython(schedule_initial_build, migrations.RunPython.noop),
+    ]
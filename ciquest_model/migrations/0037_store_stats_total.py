@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COUNTER_FIELDS = ["stamps", "clears", "attempts", "cleared", "new_participants", "unique_users", "redemptions"]
+
+
+def fill_totals(apps, schema_editor):
+    # 既存の店舗の合計は日別の行から作る（以後は日別の行と一緒に加算され、夜間の再集計で補正される）
+    StoreDailyStats = apps.get_model("ciquest_model", "StoreDailyStats")
+    StoreStatsTotal = apps.get_model("ciquest_model", "StoreStatsTotal")
+    totals = {}
+    for row in StoreDailyStats.objects.order_by("store_id").iterator(chunk_size=2000):
+        total = totals.setdefault(row.store_id, StoreStatsTotal(store_id=row.store_id))
+        for field in COUNTER_FIELDS:
+            setattr(total, field, getattr(total, field) + getattr(row, field))
+        for challenge_id, count in row.challenge_clears.items():
+            total.challenge_clears[challenge_id] = total.challenge_clears.get(challenge_id, 0) + count
+    StoreStatsTotal.objects.bulk_create(totals.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ciquest_model", "0036_store_feed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoreStatsTotal",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("stamps", models.PositiveIntegerField(default=0)),
+                ("clears", models.PositiveIntegerField(default=0)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("cleared", models.PositiveIntegerField(default=0)),
+                ("new_participants", models.PositiveIntegerField(default=0)),
+                ("unique_users", models.PositiveIntegerField(default=0)),
+                ("redemptions", models.PositiveIntegerField(default=0)),
+                ("challenge_clears", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "store",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats_total",
+                        to="ciquest_model.store",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
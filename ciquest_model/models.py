@@ -2,6 +2,8 @@
 from django.contrib.auth.hashers import identify_hasher, make_password
 from django.db import models
 
+from ciquest_model.business_hours import compile_business_hours
+
 
 def _hash_password_if_needed(value):
     """既にDjangoハッシュならそのまま、平文ならハッシュ化して返す"""
@@ -46,11 +48,16 @@ class UserBadge(models.Model):
     user = models.ForeignKey("User", on_delete=models.CASCADE)
     badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
     awarded_at = models.DateTimeField(auto_now_add=True)
+    # 端末へ獲得通知を返した日時（未通知は NULL）
+    notified_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["user", "badge"], name="uq_user_badge"),
         ]
+        indexes = [
+            models.Index(fields=["user", "notified_at"], name="idx_user_badge_notified"),
+        ]
 
     def __str__(self):
         return f"UserBadge(user_id={self.user_id}, badge={self.badge_id})"
@@ -65,6 +72,12 @@ class User(models.Model):
     last_rank_reset_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # 運営画面のユーザー一覧（新しい順のページング）
+            models.Index(fields=["-created_at"], name="idx_user_created"),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -74,15 +87,54 @@ class User(models.Model):
         super().save(*args, **kwargs)
 
 
+# リフレッシュトークン（ユーザー×端末ごとに1行。ローテーション時は token_hash を差し替える）
 class UserRefreshToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="refresh_tokens")
+    device_id = models.CharField(max_length=64, default="default")
+    family_id = models.CharField(max_length=32, blank=True)
+    jti = models.CharField(max_length=32, blank=True)
     token_hash = models.CharField(max_length=64, unique=True)
     issued_at = models.DateTimeField(auto_now_add=True)
+    rotated_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField()
     revoked_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "device_id"], name="uq_refresh_token_user_device"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idx_refresh_token_expires"),
+        ]
+
     def __str__(self):
-        return f"UserRefreshToken(user_id={self.user_id})"
+        return f"UserRefreshToken(user_id={self.user_id}, device={self.device_id})"
+
+
+# ポイント台帳（追記のみ。User.points はこの台帳の合計を実体化した残高）
+class PointsLedger(models.Model):
+    KIND_CHOICES = [
+        ("earn", "獲得"),
+        ("spend", "利用"),
+        ("adjust", "調整"),
+    ]
+
+    entry_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="points_entries")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    amount = models.IntegerField()  # 獲得は正、利用は負
+    challenge = models.ForeignKey("Challenge", on_delete=models.SET_NULL, null=True, blank=True)
+    coupon = models.ForeignKey("Coupon", on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "entry_id"], name="idx_points_ledger_user"),
+        ]
+
+    def __str__(self):
+        return f"PointsLedger(user_id={self.user_id}, {self.kind} {self.amount:+d})"
 
 
 # 店舗オーナー
@@ -124,6 +176,8 @@ class Store(models.Model):
     longitude = models.DecimalField(max_digits=20, decimal_places=15)
     business_hours = models.CharField(max_length=100, blank=True, null=True)
     business_hours_json = models.JSONField(blank=True, null=True)
+    # business_hours_json を保存時に変換した週の分（月曜0時=0）の営業区間 [[開始, 終了], ...]（開始順）
+    business_hours_intervals = models.JSONField(default=list, blank=True)
     store_description = models.TextField(blank=True, null=True)
     phone = models.CharField(max_length=30, blank=True, null=True)
     website = models.URLField(blank=True, null=True)
@@ -139,6 +193,13 @@ class Store(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.business_hours_intervals = compile_business_hours(self.business_hours_json)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "business_hours_json" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "business_hours_intervals"}
+        super().save(*args, **kwargs)
+
 
 # クーポン
 class Coupon(models.Model):
@@ -251,8 +312,9 @@ class UserCoupon(models.Model):
         return f"{self.user.username} - {self.coupon.title}"
 
 
-class UserCouponUsageHistory(models.Model):
-    user_coupon_usage_history_id = models.AutoField(primary_key=True)
+# クーポン利用履歴（ユーザー別・店舗別の参照は各インデックスで引く）
+class CouponUsageHistory(models.Model):
+    coupon_usage_history_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE)
     store = models.ForeignKey(Store, on_delete=models.CASCADE)
@@ -261,24 +323,13 @@ class UserCouponUsageHistory(models.Model):
 
     class Meta:
         ordering = ["-used_at"]
+        indexes = [
+            models.Index(fields=["user", "-used_at"], name="idx_coupon_usage_user"),
+            models.Index(fields=["store", "-used_at"], name="idx_coupon_usage_store"),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.coupon.title} ({self.used_at})"
-
-
-class StoreCouponUsageHistory(models.Model):
-    store_coupon_usage_history_id = models.AutoField(primary_key=True)
-    store = models.ForeignKey(Store, on_delete=models.CASCADE)
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE)
-    coupon_type = models.CharField(max_length=20, choices=Coupon.TYPE_CHOICES)
-    used_at = models.DateTimeField()
-
-    class Meta:
-        ordering = ["-used_at"]
-
-    def __str__(self):
-        return f"{self.store.name} - {self.coupon.title} ({self.used_at})"
+        return f"{self.user.username} - {self.coupon.title} @ {self.store.name} ({self.used_at})"
 
 
 # スタンプカード
@@ -349,6 +400,8 @@ class Tag(models.Model):
     category = models.CharField(max_length=50, null=True, blank=True)
     display_order = models.IntegerField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # カタログの版（/api/bootstrap/ の versions.tags）に使う。名前の変更や無効化でも変わる
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -457,3 +510,287 @@ class Notice(models.Model):
 
     def __str__(self):
         return self.title
+
+
+# メール送信キュー（送信はワーカーコマンドで非同期に行う）
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "送信待ち"),
+        ("sending", "送信中"),
+        ("sent", "送信済み"),
+        ("failed", "送信失敗"),
+    ]
+
+    email_id = models.AutoField(primary_key=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="idx_email_outbox_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.get_status_display()})"
+
+
+class BackgroundTask(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "実行待ち"),
+        ("running", "実行中"),
+        ("done", "完了"),
+        ("failed", "失敗"),
+    ]
+
+    task_id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="idx_background_task_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class ChangeLog(models.Model):
+    """
+    差分同期用の変更記録。対象（entity, object_id）ごとに最新の1行だけを持ち、
+    変更のたびに削除して挿入し直すことで change_id を単調増加の同期位置として使う。
+    """
+
+    ENTITY_CHOICES = [
+        ("store", "店舗"),
+        ("challenge", "クエスト"),
+        ("coupon", "クーポン"),
+    ]
+
+    change_id = models.AutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.IntegerField()
+    is_deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["entity", "object_id"], name="uq_change_log_entity_object"),
+        ]
+
+    def __str__(self):
+        return f"{self.entity}:{self.object_id} #{self.change_id}"
+
+
+class StoreDailyStats(models.Model):
+    """
+    店舗ごと・日ごとの集計（オーナー統計画面用）。書き込み時に加算し、夜間の再集計で補正する。
+    attempts / cleared / new_participants はクリア日に計上し、全期間の合計がそのまま統計値になる。
+    """
+
+    stats_id = models.AutoField(primary_key=True)
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    date = models.DateField()
+    stamps = models.PositiveIntegerField(default=0)
+    # その日のクリア回数（同じクエストの再クリアも数える）
+    clears = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    cleared = models.PositiveIntegerField(default=0)
+    new_participants = models.PositiveIntegerField(default=0)
+    # スタンプまたはクリアのあった利用者数
+    unique_users = models.PositiveIntegerField(default=0)
+    redemptions = models.PositiveIntegerField(default=0)
+    # challenge_id ごとの cleared（人気ランキング用）
+    challenge_clears = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["store", "date"], name="uq_store_daily_stats"),
+        ]
+
+    def __str__(self):
+        return f"{self.store_id} {self.date}"
+
+
+class StoreStatsTotal(models.Model):
+    """
+    店舗ごとの全期間の合計（オーナー統計画面用）。StoreDailyStats と同じ列を持ち、日別の行と一緒に加算し、
+    夜間の再集計で日別の行の合計に置き換える。統計画面は日別の行を全件読まずにこの1行を読む。
+    unique_users は日ごとの人数の合計（延べ人数）。
+    """
+
+    store = models.OneToOneField(Store, on_delete=models.CASCADE, related_name="stats_total")
+    stamps = models.PositiveIntegerField(default=0)
+    clears = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    cleared = models.PositiveIntegerField(default=0)
+    new_participants = models.PositiveIntegerField(default=0)
+    unique_users = models.PositiveIntegerField(default=0)
+    redemptions = models.PositiveIntegerField(default=0)
+    challenge_clears = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.store_id} (total)"
+
+
+class StoreAnalytics(models.Model):
+    """
+    店舗ごとの来店分析（オーナー分析画面用）。夜間のバッチ（ciquest_model.analytics）で丸ごと作り直す。
+    heatmap は曜日（月曜=0）× 時（ローカル時間）の 7×24 の来店数。
+    cohorts は初回来店週ごとの {"week": 週の開始日, "size": 人数, "retained": [1週後, 2週後, ...にも来店した人数]}。
+    """
+
+    store = models.OneToOneField(Store, on_delete=models.CASCADE, related_name="analytics")
+    heatmap = models.JSONField(default=list)
+    cohorts = models.JSONField(default=list)
+    visits = models.PositiveIntegerField(default=0)
+    visitors = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.store_id} ({self.computed_at})"
+
+
+class StoreRecommendation(models.Model):
+    """
+    店舗ごとの「この店舗に来た人はこんな店舗にも」の近傍（/api/recommendations/ 用）。
+    夜間のバッチ（ciquest_model.recommendations）で来店・クリアの共起から丸ごと作り直す。
+    neighbors は似ている順の [[store_id, スコア], ...]（上位 RECOMMENDATION_NEIGHBORS 件）。
+    """
+
+    store = models.OneToOneField(Store, on_delete=models.CASCADE, related_name="recommendation")
+    neighbors = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.store_id} ({self.computed_at})"
+
+
+class StoreFeed(models.Model):
+    """
+    地域のマス（Web メルカトルのズーム 12 のタイル）ごとのホームのおすすめ順（/api/stores/feed/ 用）。
+    store_ids はスコア順の店舗 ID。店舗の変更時は関係するマスだけ、活動量は夜間に全体を作り直す（ciquest_model.store_feed）。
+    """
+
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    store_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cell_x", "cell_y"], name="uq_store_feed_cell"),
+        ]
+
+    def __str__(self):
+        return f"{self.cell_x}/{self.cell_y} ({self.computed_at})"
+
+
+class SearchDocument(models.Model):
+    """
+    検索用の文書（店舗・クエスト・タグ・利用者ごとに1行）。signals で元データの保存・削除に合わせて更新する。
+    key / text は正規化済み（NFKC・小文字・カタカナ→ひらがな）で、key は見出し、text は見出し＋本文。
+    検索は ciquest_model.search を通して行う（DB ごとの全文検索索引はマイグレーションで作る）。
+    """
+
+    KIND_CHOICES = [
+        ("store", "店舗"),
+        ("challenge", "クエスト"),
+        ("tag", "タグ"),
+        ("user", "利用者"),
+    ]
+
+    doc_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    # 店舗・クエストは所属店舗（一覧で店舗へ移動するため）
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, null=True, blank=True)
+    title = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    text = models.TextField()
+    is_public = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="uq_search_document_object"),
+        ]
+        indexes = [
+            models.Index(fields=["kind", "is_public"], name="idx_search_document_kind"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title}"
+
+
+class SearchGram(models.Model):
+    """
+    SearchDocument.text の2文字ずつの転置索引。全文検索索引のない DB と、短い語の検索で使う。
+    MySQL の照合順序では「は」と「ば」が同じ値になるため、一意制約ではなく通常の索引にしている。
+    """
+
+    gram = models.CharField(max_length=2)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name="grams")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["gram", "document"], name="idx_search_gram"),
+        ]
+
+    def __str__(self):
+        return f"{self.gram} -> {self.document_id}"
+
+
+class UserEvent(models.Model):
+    """
+    SSE で配信するイベント。store がある行は店舗オーナー向け（/owner/stats/events/）、
+    user だけの行は本人向け、どちらも空の行は全利用者向け（お知らせ）。
+    event_id をそのまま SSE の id にし、Last-Event-ID による再開に使う。
+    """
+
+    KIND_CHOICES = [
+        ("badge_unlocked", "バッジ獲得"),
+        ("rank_changed", "ランク変更"),
+        ("coupon_granted", "クーポン付与"),
+        ("notice_published", "お知らせ公開"),
+        ("stamp_scanned", "スタンプ付与"),
+        ("challenge_cleared", "クエストクリア"),
+        ("coupon_redeemed", "クーポン利用"),
+    ]
+
+    event_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey("User", on_delete=models.CASCADE, null=True, blank=True)
+    store = models.ForeignKey("Store", on_delete=models.CASCADE, null=True, blank=True)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "event_id"], name="idx_user_event_user"),
+            models.Index(fields=["store", "event_id"], name="idx_user_event_store"),
+            models.Index(fields=["created_at"], name="idx_user_event_created"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.event_id}"
@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from ciquest_model.models import PointsLedger, User
+
+
+class InsufficientPoints(Exception):
+    pass
+
+
+def _apply(user, kind, amount, challenge=None, coupon=None, note=""):
+    PointsLedger.objects.create(
+        user=user,
+        kind=kind,
+        amount=amount,
+        challenge=challenge,
+        coupon=coupon,
+        note=note,
+    )
+    User.objects.filter(pk=user.pk).update(points=F("points") + amount)
+    user.refresh_from_db(fields=["points"])
+    return user.points
+
+
+def earn_points(user, amount, challenge=None, note=""):
+    """台帳に獲得エントリを追記し、同じトランザクションで残高を加算する。"""
+    if amount <= 0:
+        return user.points
+    with transaction.atomic():
+        return _apply(user, "earn", amount, challenge=challenge, note=note)
+
+
+def earn_points_bulk(user, entries, note=""):
+    """
+    (amount, challenge) の組をまとめて台帳に追記し、残高は1回の UPDATE で加算する。
+    オフライン一括送信など、複数件の獲得を同時に確定するときに使う。
+    """
+    entries = [(amount, challenge) for amount, challenge in entries if amount > 0]
+    if not entries:
+        return user.points
+    with transaction.atomic():
+        PointsLedger.objects.bulk_create(
+            [
+                PointsLedger(user=user, kind="earn", amount=amount, challenge=challenge, note=note)
+                for amount, challenge in entries
+            ]
+        )
+        User.objects.filter(pk=user.pk).update(points=F("points") + sum(amount for amount, _ in entries))
+    user.refresh_from_db(fields=["points"])
+    return user.points
+
+
+def adjust_points(user, amount, note=""):
+    if not amount:
+        return user.points
+    with transaction.atomic():
+        return _apply(user, "adjust", amount, note=note)
+
+
+def spend_points(user, amount, coupon=None, note=""):
+    """
+    残高が足りる場合だけ減算する（points >= amount を条件にした1回の UPDATE）。
+    足りなければ InsufficientPoints を送出し、台帳には何も書かない。
+    """
+    if amount <= 0:
+        return user.points
+    with transaction.atomic():
+        debited = User.objects.filter(pk=user.pk, points__gte=amount).update(points=F("points") - amount)
+        if not debited:
+            raise InsufficientPoints()
+        PointsLedger.objects.create(user=user, kind="spend", amount=-amount, coupon=coupon, note=note)
+    user.refresh_from_db(fields=["points"])
+    return user.points
+
+
+def _ledger_balance():
+    return Coalesce(
+        Subquery(
+            PointsLedger.objects.filter(user=OuterRef("pk"))
+            .order_by()
+            .values("user")
+            .annotate(total=Sum("amount"))
+            .values("total")[:1]
+        ),
+        Value(0),
+    )
+
+
+def reconcile_balances(batch_size=1000, dry_run=False):
+    """
+    台帳の合計から残高を再計算する。ユーザーIDの範囲ごとに
+    「ずれている行だけを UPDATE ... SET points = (SELECT SUM(...))」する。
+    戻り値は (確認したユーザー数, 修正したユーザー数)。
+    """
+    checked = fixed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            User.objects.filter(user_id__gt=last_id)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        checked += len(ids)
+        drifted = (
+            User.objects.filter(user_id__in=ids)
+            .annotate(ledger_points=_ledger_balance())
+            .exclude(points=F("ledger_points"))
+        )
+        if dry_run:
+            fixed += drifted.count()
+            continue
+        drifted_ids = list(drifted.values_list("user_id", flat=True))
+        if drifted_ids:
+            fixed += User.objects.filter(user_id__in=drifted_ids).update(points=_ledger_balance())
+    return checked, fixed
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from ciquest_model.store_map import store_tiles
+
+# 公開APIの共通キャッシュのキー。更新時は signals.py から無効化する。
+BOOTSTRAP_STORES_CACHE_KEY = "bootstrap:stores"
+BOOTSTRAP_NOTICES_CACHE_KEY = "bootstrap:notices"
+BOOTSTRAP_VERSIONS_CACHE_KEY = "bootstrap:versions"
+
+
+def store_detail_key(store_id):
+    return f"store_detail:{store_id}"
+
+
+def store_detail_cache_seconds():
+    return getattr(settings, "STORE_DETAIL_CACHE_SECONDS", 60)
+
+
+def stamp_program_key(store_id):
+    return f"stamp_program:{store_id}"
+
+
+def stamp_program_cache_seconds():
+    return getattr(settings, "STAMP_PROGRAM_CACHE_SECONDS", 60)
+
+
+def invalidate_store_detail(*store_ids):
+    """店舗詳細と、詳細に含まれるスタンプカードの要約を捨てる"""
+    keys = [key(store_id) for store_id in store_ids if store_id for key in (store_detail_key, stamp_program_key)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def store_summary_key(store_id):
+    return f"store_summary:{store_id}"
+
+
+def invalidate_store_catalog(*store_ids):
+    """店舗そのものやタグが変わったとき（一覧・版・詳細・要約をまとめて捨てる）"""
+    cache.delete_many(
+        [BOOTSTRAP_STORES_CACHE_KEY, BOOTSTRAP_VERSIONS_CACHE_KEY]
+        + [store_summary_key(store_id) for store_id in store_ids if store_id]
+    )
+    invalidate_store_detail(*store_ids)
+
+
+def invalidate_notices():
+    cache.delete_many([BOOTSTRAP_NOTICES_CACHE_KEY, BOOTSTRAP_VERSIONS_CACHE_KEY])
+
+
+def store_tile_key(zoom, x, y):
+    return f"store_tile:{zoom}:{x}:{y}"
+
+
+def store_tile_cache_seconds():
+    # タイルは店舗の更新時に消すため長く持ってよい
+    return getattr(settings, "STORE_TILE_CACHE_SECONDS", 24 * 60 * 60)
+
+
+def invalidate_store_tiles(*positions):
+    """(緯度, 経度) を含む全ズームのタイルを捨てる。移動した店舗は移動前と移動後の両方を渡す。"""
+    keys = {store_tile_key(*tile) for lat, lon in positions for tile in store_tiles(lat, lon)}
+    if keys:
+        cache.delete_many(list(keys))
@@ -0,0 +1,203 @@
+import datetime
+from array import array
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from ciquest_model.bulk import upsert
+from ciquest_model.models import Store, StoreRecommendation, StoreStampHistory, UserChallenge
+
+# 共起を数えるときに1回に作る (店舗, 店舗) の組の数の上限（メモリの上限）
+_PAIR_CHUNK = 4_000_000
+
+
+def export_visits(since):
+    """直近の来店（スタンプ）とクエストのクリアを配列 (user_id, store_id, epoch 秒) として書き出す。"""
+    users, stores, moments = array("q"), array("q"), array("q")
+    sources = (
+        StoreStampHistory.objects.filter(stamped_at__gte=since).values_list("user_id", "store_id", "stamped_at"),
+        UserChallenge.objects.filter(status="cleared", cleared_at__gte=since).values_list(
+            "user_id", "challenge__store_id", "cleared_at"
+        ),
+    )
+    for rows in sources:
+        for user_id, store_id, moment in rows.iterator(chunk_size=5000):
+            users.append(user_id)
+            stores.append(store_id)
+            moments.append(int(moment.timestamp()))
+    return (
+        np.array(users, dtype=np.int64),
+        np.array(stores, dtype=np.int64),
+        np.array(moments, dtype=np.int64),
+    )
+
+
+def _group_starts(values):
+    """並べ替え済みの values の、値ごとのまとまりの先頭位置と長さ。"""
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    return starts, np.diff(np.r_[starts, values.size])
+
+
+def recent_user_stores(users, stores, moments, per_user):
+    """利用者ごとに、最後に来た順で上位 per_user 店舗の (user_id, store_id)（利用者順）。同じ店舗は1回に数える。"""
+    if not users.size:
+        return users, stores
+    # 利用者・店舗ごとに一番新しい1件だけ残す
+    order = np.lexsort((-moments, stores, users))
+    users, stores, moments = users[order], stores[order], moments[order]
+    first = np.r_[True, (users[1:] != users[:-1]) | (stores[1:] != stores[:-1])]
+    users, stores, moments = users[first], stores[first], moments[first]
+    # 来店の多い利用者は組の数が店舗数の2乗で増えるため、新しい順に per_user 店舗までにする
+    order = np.lexsort((-moments, users))
+    users, stores = users[order], stores[order]
+    starts, sizes = _group_starts(users)
+    rank = np.arange(users.size) - np.repeat(starts, sizes)
+    keep = rank < per_user
+    return users[keep], stores[keep]
+
+
+def covisit_counts(users, store_index, store_count):
+    """
+    同じ利用者が来た店舗の組ごとの人数（利用者×店舗の 0/1 行列 A の AᵀA の非対角成分）。
+    組を _PAIR_CHUNK 件ずつ作って数え、戻り値は (組の番号 = 店舗a × store_count + 店舗b, 人数)。
+    """
+    if not users.size:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    starts, sizes = _group_starts(users)
+    pair_totals = np.cumsum(sizes * sizes)
+    found_keys, found_counts = [], []
+    begin = 0
+    while begin < starts.size:
+        done = pair_totals[begin - 1] if begin else 0
+        end = max(int(np.searchsorted(pair_totals, done + _PAIR_CHUNK, side="right")), begin + 1)
+        chunk_starts, chunk_sizes = starts[begin:end], sizes[begin:end]
+        # 利用者の各店舗（左）を、その利用者の全店舗（右）と組にする
+        members = np.arange(chunk_starts[0], chunk_starts[-1] + chunk_sizes[-1])
+        repeats = np.repeat(chunk_sizes, chunk_sizes)
+        left = np.repeat(members, repeats)
+        right_start = np.repeat(np.repeat(chunk_starts, chunk_sizes), repeats)
+        right = right_start + np.arange(left.size) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        mask = left != right
+        keys, counts = np.unique(store_index[left[mask]] * store_count + store_index[right[mask]], return_counts=True)
+        found_keys.append(keys)
+        found_counts.append(counts)
+        begin = end
+    keys, inverse = np.unique(np.concatenate(found_keys), return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=np.concatenate(found_counts)).astype(np.int64)
+    return keys, counts
+
+
+def top_neighbors(keys, counts, visitors, store_ids, neighbors, min_covisits):
+    """
+    共起人数をコサイン類似度（人数 / √(店舗a の人数 × 店舗b の人数)）にし、店舗ごとに上位 neighbors 件を残す。
+    戻り値は {store_id: [[store_id, スコア], ...]}。
+    """
+    keep = counts >= min_covisits
+    keys, counts = keys[keep], counts[keep]
+    store_count = store_ids.size
+    left, right = keys // store_count, keys % store_count
+    scores = counts / np.sqrt(visitors[left] * visitors[right])
+    order = np.lexsort((right, -scores, left))
+    left, right, scores = left[order], right[order], scores[order]
+    result = {}
+    if not left.size:
+        return result
+    starts, sizes = _group_starts(left)
+    rank = np.arange(left.size) - np.repeat(starts, sizes)
+    keep = rank < neighbors
+    for a, b, score in zip(store_ids[left[keep]].tolist(), store_ids[right[keep]].tolist(), scores[keep].tolist()):
+        result.setdefault(a, []).append([b, round(score, 4)])
+    return result
+
+
+def build_store_recommendations(now=None, batch_size=500):
+    """
+    来店・クリアの共起から店舗ごとの近傍を作り直して StoreRecommendation に保存する。
+    直近 RECOMMENDATION_WINDOW_DAYS 日の履歴を配列に書き出し、集計は NumPy でまとめて行う。戻り値は店舗数。
+    """
+    now = now or timezone.now()
+    since = now - datetime.timedelta(days=getattr(settings, "RECOMMENDATION_WINDOW_DAYS", 180))
+    users, stores, moments = export_visits(since)
+    users, stores = recent_user_stores(
+        users, stores, moments, getattr(settings, "RECOMMENDATION_MAX_STORES_PER_USER", 50)
+    )
+    store_ids, store_index = np.unique(stores, return_inverse=True)
+    store_index = store_index.ravel()
+    keys, counts = covisit_counts(users, store_index, store_ids.size)
+    neighbors = top_neighbors(
+        keys,
+        counts,
+        np.bincount(store_index, minlength=store_ids.size),
+        store_ids,
+        getattr(settings, "RECOMMENDATION_NEIGHBORS", 20),
+        getattr(settings, "RECOMMENDATION_MIN_COVISITS", 2),
+    )
+
+    targets = list(Store.objects.order_by("store_id").values_list("store_id", flat=True))
+    upsert(
+        StoreRecommendation,
+        [
+            StoreRecommendation(store_id=store_id, neighbors=neighbors.get(store_id, []), computed_at=now)
+            for store_id in targets
+        ],
+        ["store"],
+        ["neighbors", "computed_at"],
+        batch_size=batch_size,
+    )
+    return len(targets)
+
+
+def _visit_sources(user_id):
+    """利用者の来店（スタンプ）とクリアを、(店舗 ID の列, 日時の列, クエリセット) の組で返す。"""
+    return (
+        ("store_id", "stamped_at", StoreStampHistory.objects.filter(user_id=user_id)),
+        (
+            "challenge__store_id",
+            "cleared_at",
+            UserChallenge.objects.filter(user_id=user_id, status="cleared", cleared_at__isnull=False),
+        ),
+    )
+
+
+def recent_stores(user_id, limit):
+    """
+    利用者が最後に来た順の店舗（来店とクリアの両方、上位 limit 件）。
+    店舗ごとの最後の日時を DB で集計し、来店・クリアそれぞれ上位 limit 件だけを読む。
+    """
+    latest = {}
+    for store_field, moment_field, rows in _visit_sources(user_id):
+        grouped = rows.values(store_field).annotate(last=Max(moment_field)).order_by("-last")
+        for store_id, moment in grouped.values_list(store_field, "last")[:limit]:
+            if store_id not in latest or moment > latest[store_id]:
+                latest[store_id] = moment
+    return sorted(latest, key=latest.get, reverse=True)[:limit]
+
+
+def visited_stores(user_id, store_ids):
+    """store_ids のうち利用者が来たことのある（スタンプ・クリアのある）店舗。"""
+    visited = set()
+    for store_field, _, rows in _visit_sources(user_id):
+        visited.update(rows.filter(**{f"{store_field}__in": store_ids}).values_list(store_field, flat=True).distinct())
+    return visited
+
+
+def recommend(user_id, accept=None):
+    """
+    利用者の最近の店舗（上位 RECOMMENDATION_RECENT_STORES 件）の近傍をまとめ、スコア順の [(store_id, スコア), ...] を返す。
+    新しく来た店舗の近傍ほど重くし、来たことのある店舗と accept(store_id) が偽の店舗は除く。
+    2番目の戻り値はもとにした店舗のリスト。
+    """
+    recent = recent_stores(user_id, getattr(settings, "RECOMMENDATION_RECENT_STORES", 10))
+    lists = dict(StoreRecommendation.objects.filter(store_id__in=recent).values_list("store_id", "neighbors"))
+    # 来たことがあるかは近傍に挙がった店舗についてだけ調べる（履歴を全件読まない）
+    visited = visited_stores(user_id, {neighbor_id for neighbors in lists.values() for neighbor_id, _ in neighbors})
+    scores = {}
+    for position, store_id in enumerate(recent):
+        weight = 0.8 ** position
+        for neighbor_id, score in lists.get(store_id, []):
+            if neighbor_id in visited or (accept is not None and not accept(neighbor_id)):
+                continue
+            scores[neighbor_id] = scores.get(neighbor_id, 0.0) + weight * score
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0])), recent
@@ -0,0 +1,301 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, FloatField, IntegerField, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from ciquest_model.changelog import challenge_is_public, store_is_public
+from ciquest_model.models import Challenge, SearchDocument, SearchGram, Store, Tag, User
+
+QUERY_MAX_LENGTH = 50
+# マイグレーション 0033 で作る DB ごとの全文検索索引
+FTS_TABLE = "search_document_fts"
+FULLTEXT_INDEX = "ftx_search_document_text"
+DOCUMENT_FIELDS = ["store_id", "title", "key", "text", "is_public"]
+
+_KATAKANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+_SPACES = re.compile(r"\s+")
+_native_index = {}
+
+
+def normalize(text):
+    """NFKC → 小文字 → カタカナをひらがなに → 空白をまとめる（アプリの SearchScreen と同じ正規化）。"""
+    text = unicodedata.normalize("NFKC", text or "").lower().translate(_KATAKANA)
+    return _SPACES.sub(" ", text).strip()
+
+
+def query_terms(query):
+    """検索語を正規化して空白で区切る（重複は除く）。"""
+    return list(dict.fromkeys(normalize(query)[:QUERY_MAX_LENGTH].split()))
+
+
+def grams(text):
+    """語ごとに末尾へ空白を足して2文字ずつ切り出す（1文字の語も "あ " として索引に載る）。"""
+    result = set()
+    for token in text.split():
+        padded = token + " "
+        result.update(padded[i:i + 2] for i in range(len(token)))
+    return result
+
+
+# --- 文書の内容 ---
+
+
+def _store_fields(store):
+    tags = [store_tag.tag.name for store_tag in store.storetag_set.all() if store_tag.tag.is_active]
+    return store.store_id, store.name, [store.address, store.store_description, *tags], store_is_public(store)
+
+
+def _challenge_fields(challenge):
+    return (
+        challenge.store_id,
+        challenge.title,
+        [challenge.description, challenge.store.name],
+        challenge_is_public(challenge, challenge.store.status),
+    )
+
+
+def _tag_fields(tag):
+    return None, tag.name, [tag.category], tag.is_active
+
+
+def _user_fields(user):
+    return None, user.username, [user.email], False
+
+
+# 種類 -> (対象の QuerySet, (store_id, 見出し, 本文のリスト, 公開中か) を返す関数)
+SOURCES = {
+    "store": (lambda: Store.objects.prefetch_related("storetag_set__tag"), _store_fields),
+    "challenge": (lambda: Challenge.objects.select_related("store"), _challenge_fields),
+    "tag": (lambda: Tag.objects.all(), _tag_fields),
+    "user": (lambda: User.objects.only("user_id", "username", "email"), _user_fields),
+}
+
+
+def _write_documents(kind, objects, fields):
+    """文書を差分だけ書き込み、text が変わった文書の SearchGram を作り直す。"""
+    entries = {}
+    for obj in objects:
+        store_id, title, body, is_public = fields(obj)
+        entries[obj.pk] = {
+            "store_id": store_id,
+            "title": title[:255],
+            "key": normalize(title)[:255],
+            "text": normalize(" ".join([title, *filter(None, body)])),
+            "is_public": is_public,
+        }
+    existing = {doc.object_id: doc for doc in SearchDocument.objects.filter(kind=kind, object_id__in=entries)}
+    now = timezone.now()
+    created, changed, regram_ids = [], [], []
+    for object_id, values in entries.items():
+        doc = existing.get(object_id)
+        if doc is None:
+            created.append(SearchDocument(kind=kind, object_id=object_id, updated_at=now, **values))
+            regram_ids.append(object_id)
+            continue
+        if all(getattr(doc, name) == value for name, value in values.items()):
+            continue
+        if doc.text != values["text"]:
+            regram_ids.append(object_id)
+        for name, value in values.items():
+            setattr(doc, name, value)
+        doc.updated_at = now
+        changed.append(doc)
+    SearchDocument.objects.bulk_create(created)
+    SearchDocument.objects.bulk_update(changed, [*DOCUMENT_FIELDS, "updated_at"])
+    if not regram_ids:
+        return
+    # MySQL の bulk_create は主キーを返さないため読み直す
+    targets = list(SearchDocument.objects.filter(kind=kind, object_id__in=regram_ids).values_list("pk", "text"))
+    SearchGram.objects.filter(document_id__in=[pk for pk, _ in targets]).delete()
+    SearchGram.objects.bulk_create(
+        [SearchGram(gram=gram, document_id=pk) for pk, text in targets for gram in grams(text)],
+        batch_size=1000,
+    )
+
+
+def index_objects(kind, object_ids):
+    """指定した対象の文書を作り直す。元データがなくなっていれば文書を消す。"""
+    object_ids = set(object_ids)
+    if not object_ids:
+        return
+    queryset, fields = SOURCES[kind]
+    objects = {obj.pk: obj for obj in queryset().filter(pk__in=object_ids)}
+    with transaction.atomic():
+        SearchDocument.objects.filter(kind=kind, object_id__in=object_ids - objects.keys()).delete()
+        _write_documents(kind, objects.values(), fields)
+
+
+def remove_objects(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def rebuild_search_index(kinds=None, batch_size=500):
+    """全文書を作り直す（変わった文書だけ書き込む）。作り直した対象の件数を返す。"""
+    total = 0
+    for kind in kinds or SOURCES:
+        queryset, _ = SOURCES[kind]
+        object_ids = list(queryset().order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(object_ids), batch_size):
+            index_objects(kind, object_ids[start:start + batch_size])
+        stale = sorted(
+            set(SearchDocument.objects.filter(kind=kind).values_list("object_id", flat=True)) - set(object_ids)
+        )
+        for start in range(0, len(stale), batch_size):
+            remove_objects(kind, stale[start:start + batch_size])
+        total += len(object_ids)
+    return total
+
+
+# --- 検索 ---
+
+
+class NgramBackend:
+    """SearchGram で候補を絞り、正規化済みの text の部分一致で確かめる。どの DB でも動く。"""
+
+    name = "ngram"
+
+    def filter(self, documents, terms):
+        for term in terms:
+            documents = documents.filter(pk__in=self._gram_candidates(term), text__contains=term)
+        return documents
+
+    def order_by(self, query):
+        return []
+
+    def _gram_candidates(self, term):
+        if len(term) == 1:
+            return SearchGram.objects.filter(gram__startswith=term).values("document_id")
+        wanted = {term[i:i + 2] for i in range(len(term) - 1)}
+        return (
+            SearchGram.objects.filter(gram__in=wanted)
+            .values("document_id")
+            .annotate(hits=Count("gram", distinct=True))
+            .filter(hits=len(wanted))
+            .values("document_id")
+        )
+
+
+class SqliteFtsBackend(NgramBackend):
+    """SQLite の FTS5（trigram）。3文字未満の語は trigram で引けないため SearchGram を使う。"""
+
+    name = "sqlite_fts5"
+
+    def filter(self, documents, terms):
+        long_terms = [term for term in terms if len(term) >= 3]
+        if long_terms:
+            match = " AND ".join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+            documents = documents.filter(
+                pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+            )
+        return super().filter(documents, [term for term in terms if len(term) < 3])
+
+
+class PostgresBackend(NgramBackend):
+    """PostgreSQL の pg_trgm（GIN 索引で LIKE を引く）。同順位は tsvector の ts_rank で並べる。"""
+
+    name = "postgresql"
+
+    def filter(self, documents, terms):
+        for term in terms:
+            if len(term) >= 3:
+                documents = documents.filter(text__contains=term)
+            else:
+                documents = super().filter(documents, [term])
+        return documents
+
+    def order_by(self, query):
+        column = f"{connection.ops.quote_name(SearchDocument._meta.db_table)}.{connection.ops.quote_name('text')}"
+        rank = RawSQL(
+            f"ts_rank(to_tsvector('simple', {column}), plainto_tsquery('simple', %s))",
+            [query],
+            output_field=FloatField(),
+        )
+        return [rank.desc()]
+
+
+class MysqlBackend(NgramBackend):
+    """MySQL の FULLTEXT（ngram パーサー、2文字単位）。1文字の語は SearchGram を使う。"""
+
+    name = "mysql"
+
+    def filter(self, documents, terms):
+        long_terms = [term for term in terms if len(term) >= 2]
+        if long_terms:
+            column = f"{connection.ops.quote_name(SearchDocument._meta.db_table)}.{connection.ops.quote_name('text')}"
+            against = " ".join('+"{}"'.format(term.replace('"', " ")) for term in long_terms)
+            documents = documents.alias(
+                fulltext=RawSQL(f"MATCH ({column}) AGAINST (%s IN BOOLEAN MODE)", [against], output_field=FloatField())
+            ).filter(fulltext__gt=0)
+            for term in long_terms:
+                documents = documents.filter(text__contains=term)
+        return super().filter(documents, [term for term in terms if len(term) < 2])
+
+
+def _has_native_index():
+    """マイグレーションで全文検索索引を作れたか（古い SQLite / MySQL では作れないことがある）。"""
+    vendor = connection.vendor
+    if vendor not in _native_index:
+        with connection.cursor() as cursor:
+            if vendor == "sqlite":
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            elif vendor == "postgresql":
+                cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [FULLTEXT_INDEX])
+            elif vendor == "mysql":
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND INDEX_NAME = %s",
+                    [FULLTEXT_INDEX],
+                )
+            else:
+                _native_index[vendor] = False
+                return False
+            _native_index[vendor] = cursor.fetchone() is not None
+    return _native_index[vendor]
+
+
+def get_backend():
+    """SEARCH_BACKEND（auto / ngram）と接続先の DB から検索方法を選ぶ。"""
+    if getattr(settings, "SEARCH_BACKEND", "auto") == "ngram" or not _has_native_index():
+        return NgramBackend()
+    return {"sqlite": SqliteFtsBackend, "postgresql": PostgresBackend, "mysql": MysqlBackend}[connection.vendor]()
+
+
+def search_documents(query, kinds=None, public_only=True):
+    """検索語（空白区切りはすべて含むもの）に一致する SearchDocument。並び順は付けない。"""
+    terms = query_terms(query)
+    if not terms:
+        return SearchDocument.objects.none()
+    documents = SearchDocument.objects.all()
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    if public_only:
+        documents = documents.filter(is_public=True)
+    return get_backend().filter(documents, terms)
+
+
+def search(query, kinds=None, public_only=True):
+    """
+    関連度順の SearchDocument。見出しの完全一致 → 前方一致 → 部分一致 → 本文のみの順で、
+    同順位は短い見出しを先にする。
+    """
+    terms = query_terms(query)
+    phrase, head = " ".join(terms), terms[0] if terms else ""
+    relevance = Case(
+        When(key=phrase, then=0),
+        When(key__startswith=head, then=1),
+        When(key__contains=head, then=2),
+        default=3,
+        output_field=IntegerField(),
+    )
+    return search_documents(query, kinds, public_only).order_by(
+        relevance, *get_backend().order_by(phrase), Length("key"), "doc_id"
+    )
+
+
+def matching_object_ids(kind, query):
+    """運営画面の検索用。一致した対象の主キーのサブクエリ（非公開も含む）。"""
+    return search_documents(query, kinds=[kind], public_only=False).values("object_id")
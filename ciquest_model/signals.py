@@ -0,0 +1,314 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from ciquest_model.business_hours import invalidate_hours_index
+from ciquest_model.changelog import (
+    challenge_is_public,
+    coupon_is_public,
+    record_changes,
+    record_store_children,
+    store_is_public,
+)
+from ciquest_model.events import publish as publish_event
+from ciquest_model.models import (
+    Challenge,
+    Coupon,
+    Notice,
+    Store,
+    StoreStampReward,
+    StoreStampSetting,
+    StoreTag,
+    Tag,
+    User,
+    UserCoupon,
+)
+from ciquest_model.public_cache import (
+    invalidate_notices,
+    invalidate_store_catalog,
+    invalidate_store_detail,
+    invalidate_store_tiles,
+)
+from ciquest_model.search import index_objects, remove_objects
+from ciquest_model.store_feed import affected_cells
+from ciquest_model.store_map import invalidate_store_map
+from ciquest_model.tag_index import invalidate_tag_index
+from ciquest_model.tasks import enqueue as enqueue_task
+
+
+@receiver([post_save, post_delete], sender=Store)
+def store_changed(sender, instance, **kwargs):
+    invalidate_store_catalog(instance.store_id)
+    # 移動した店舗は移動前のタイルからも消す（_previous_map は store_remember_status で保存前に読む）
+    previous_lat, previous_lon = (getattr(instance, "_previous_map", None) or (None, None))[:2]
+    invalidate_store_tiles((instance.latitude, instance.longitude), (previous_lat, previous_lon))
+
+
+@receiver([post_save, post_delete], sender=StoreTag)
+def store_tag_changed(sender, instance, **kwargs):
+    invalidate_store_catalog(instance.store_id)
+    invalidate_store_tiles(*Store.objects.filter(store_id=instance.store_id).values_list("latitude", "longitude"))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    store_ids = StoreTag.objects.filter(tag_id=instance.tag_id).values_list("store_id", flat=True)
+    invalidate_store_catalog(*store_ids)
+    invalidate_store_tiles(*Store.objects.filter(storetag__tag_id=instance.tag_id).values_list("latitude", "longitude"))
+
+
+@receiver([post_save, post_delete], sender=Challenge)
+def challenge_changed(sender, instance, **kwargs):
+    invalidate_store_detail(instance.store_id)
+
+
+def _coupon_reward_store_ids(coupon_id):
+    return list(
+        StoreStampReward.objects.filter(reward_coupon_id=coupon_id).values_list("setting__store_id", flat=True)
+    )
+
+
+@receiver(pre_delete, sender=Coupon)
+def coupon_remember_rewards(sender, instance, **kwargs):
+    # 削除では特典の reward_coupon が NULL に更新され（signals なし）、post_delete では参照元を引けない
+    instance._reward_store_ids = _coupon_reward_store_ids(instance.coupon_id)
+
+
+@receiver([post_save, post_delete], sender=Coupon)
+def coupon_changed(sender, instance, **kwargs):
+    # 共通クーポンは他店舗のスタンプ特典にも使われるため、参照元の店舗も無効化する
+    reward_store_ids = getattr(instance, "_reward_store_ids", None)
+    if reward_store_ids is None:
+        reward_store_ids = _coupon_reward_store_ids(instance.coupon_id)
+    invalidate_store_detail(instance.store_id, *reward_store_ids)
+
+
+@receiver([post_save, post_delete], sender=StoreStampSetting)
+def stamp_setting_changed(sender, instance, **kwargs):
+    invalidate_store_detail(instance.store_id)
+
+
+@receiver([post_save, post_delete], sender=StoreStampReward)
+def stamp_reward_changed(sender, instance, **kwargs):
+    store_id = (
+        StoreStampSetting.objects.filter(pk=instance.setting_id).values_list("store_id", flat=True).first()
+    )
+    invalidate_store_detail(store_id)
+
+
+@receiver([post_save, post_delete], sender=Notice)
+def notice_changed(sender, instance, **kwargs):
+    invalidate_notices()
+
+
+# --- 差分同期（/api/sync/）用の変更記録 ---
+
+
+@receiver(pre_save, sender=Store)
+def store_remember_status(sender, instance, **kwargs):
+    previous = (
+        Store.objects.filter(store_id=instance.store_id)
+        .values_list("status", "business_hours_intervals", "latitude", "longitude", "is_featured", "priority")
+        .first()
+        if instance.store_id
+        else None
+    )
+    previous = previous or (None,) * 6
+    instance._previous_status, instance._previous_hours = previous[:2]
+    # 地図のクラスタに関わる項目
+    instance._previous_map = previous[2:]
+
+
+@receiver(post_save, sender=Store)
+def store_record_change(sender, instance, **kwargs):
+    record_changes("store", [instance.store_id], deleted=not store_is_public(instance))
+    if getattr(instance, "_previous_status", None) != instance.status:
+        record_store_children(instance)
+
+
+@receiver(post_delete, sender=Store)
+def store_record_delete(sender, instance, **kwargs):
+    record_changes("store", [instance.store_id], deleted=True)
+
+
+@receiver([post_save, post_delete], sender=StoreTag)
+def store_tag_record_change(sender, instance, **kwargs):
+    store = Store.objects.filter(store_id=instance.store_id).only("store_id", "status").first()
+    if store:
+        record_changes("store", [store.store_id], deleted=not store_is_public(store))
+
+
+@receiver(post_save, sender=Challenge)
+def challenge_record_change(sender, instance, **kwargs):
+    record_changes("challenge", [instance.challenge_id], deleted=not challenge_is_public(instance))
+
+
+@receiver(post_delete, sender=Challenge)
+def challenge_record_delete(sender, instance, **kwargs):
+    record_changes("challenge", [instance.challenge_id], deleted=True)
+
+
+@receiver(post_save, sender=Coupon)
+def coupon_record_change(sender, instance, **kwargs):
+    record_changes("coupon", [instance.coupon_id], deleted=not coupon_is_public(instance))
+
+
+@receiver(post_delete, sender=Coupon)
+def coupon_record_delete(sender, instance, **kwargs):
+    record_changes("coupon", [instance.coupon_id], deleted=True)
+
+
+@receiver(post_save, sender=Tag)
+def tag_record_change(sender, instance, **kwargs):
+    for store in Store.objects.filter(storetag__tag_id=instance.tag_id).only("store_id", "status"):
+        record_changes("store", [store.store_id], deleted=not store_is_public(store))
+
+
+# --- SSE（/api/events/）への配信 ---
+
+
+@receiver(post_save, sender=UserCoupon)
+def user_coupon_publish_event(sender, instance, created, **kwargs):
+    if not created:
+        return
+    publish_event(
+        "coupon_granted",
+        {
+            "user_coupon_id": instance.user_coupon_id,
+            "coupon_id": instance.coupon_id,
+            "title": instance.coupon.title,
+        },
+        user_id=instance.user_id,
+    )
+
+
+@receiver(pre_save, sender=Notice)
+def notice_remember_published(sender, instance, **kwargs):
+    instance._was_published = bool(
+        instance.notice_id
+        and Notice.objects.filter(notice_id=instance.notice_id, is_published=True).exists()
+    )
+
+
+@receiver(post_save, sender=Notice)
+def notice_publish_event(sender, instance, **kwargs):
+    # 公開に切り替わったときだけ送る（オーナー向けのお知らせは利用者アプリに流さない）
+    if not instance.is_published or getattr(instance, "_was_published", False):
+        return
+    if instance.target not in {"all", "user"}:
+        return
+    publish_event(
+        "notice_published",
+        {
+            "notice_id": instance.notice_id,
+            "title": instance.title,
+            "start_at": instance.start_at.isoformat() if instance.start_at else None,
+            "end_at": instance.end_at.isoformat() if instance.end_at else None,
+        },
+    )
+
+
+# --- 検索索引（ciquest_model.search）---
+
+
+@receiver(post_save, sender=Store)
+def store_index_search(sender, instance, **kwargs):
+    # クエストの文書は店舗名と公開状態を含むため一緒に作り直す
+    index_objects("store", [instance.store_id])
+    index_objects("challenge", Challenge.objects.filter(store_id=instance.store_id).values_list("challenge_id", flat=True))
+
+
+@receiver(post_delete, sender=Store)
+def store_remove_search(sender, instance, **kwargs):
+    remove_objects("store", [instance.store_id])
+
+
+@receiver([post_save, post_delete], sender=StoreTag)
+def store_tag_index_search(sender, instance, **kwargs):
+    index_objects("store", [instance.store_id])
+
+
+@receiver(post_save, sender=Tag)
+def tag_index_search(sender, instance, **kwargs):
+    index_objects("tag", [instance.tag_id])
+    index_objects("store", StoreTag.objects.filter(tag_id=instance.tag_id).values_list("store_id", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_remove_search(sender, instance, **kwargs):
+    remove_objects("tag", [instance.tag_id])
+
+
+@receiver(post_save, sender=Challenge)
+def challenge_index_search(sender, instance, **kwargs):
+    index_objects("challenge", [instance.challenge_id])
+
+
+@receiver(post_delete, sender=Challenge)
+def challenge_remove_search(sender, instance, **kwargs):
+    remove_objects("challenge", [instance.challenge_id])
+
+
+@receiver(post_save, sender=User)
+def user_index_search(sender, instance, update_fields=None, **kwargs):
+    # ポイント更新などの保存では索引の内容が変わらない
+    if update_fields and not {"username", "email"} & set(update_fields):
+        return
+    index_objects("user", [instance.user_id])
+
+
+@receiver(post_delete, sender=User)
+def user_remove_search(sender, instance, **kwargs):
+    remove_objects("user", [instance.user_id])
+
+
+# --- タグ絞り込み・営業時間・地図の索引（ciquest_model.tag_index / business_hours / store_map）---
+
+
+@receiver([post_save, post_delete], sender=StoreTag)
+@receiver([post_save, post_delete], sender=Tag)
+def tag_index_changed(sender, instance, **kwargs):
+    invalidate_tag_index()
+
+
+@receiver(post_save, sender=Store)
+def store_local_index_changed(sender, instance, **kwargs):
+    # 公開状態が変わったときだけ（作成時は _previous_status が None）
+    if getattr(instance, "_previous_status", None) != instance.status:
+        invalidate_tag_index()
+        invalidate_hours_index()
+        invalidate_store_map()
+        return
+    if getattr(instance, "_previous_hours", None) != instance.business_hours_intervals:
+        invalidate_hours_index()
+    map_fields = (instance.latitude, instance.longitude, instance.is_featured, instance.priority)
+    if getattr(instance, "_previous_map", None) != map_fields:
+        invalidate_store_map()
+
+
+@receiver(post_delete, sender=Store)
+def store_local_index_deleted(sender, instance, **kwargs):
+    invalidate_tag_index()
+    invalidate_hours_index()
+    invalidate_store_map()
+
+
+# --- ホームのおすすめ順（ciquest_model.store_feed）---
+
+
+@receiver(post_save, sender=Store)
+def store_feed_changed(sender, instance, **kwargs):
+    # 並びに関わる公開状態・位置・おすすめ・優先度が変わったときだけ、移動前後の周りのマスを作り直す
+    map_fields = (instance.latitude, instance.longitude, instance.is_featured, instance.priority)
+    previous_map = getattr(instance, "_previous_map", None) or (None,) * 4
+    if getattr(instance, "_previous_status", None) == instance.status and previous_map == map_fields:
+        return
+    cells = affected_cells((instance.latitude, instance.longitude), previous_map[:2])
+    if cells:
+        enqueue_task("refresh_store_feeds", {"cells": sorted(cells)})
+
+
+@receiver(post_delete, sender=Store)
+def store_feed_deleted(sender, instance, **kwargs):
+    cells = affected_cells((instance.latitude, instance.longitude))
+    if cells:
+        enqueue_task("refresh_store_feeds", {"cells": sorted(cells)})
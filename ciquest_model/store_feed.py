@@ -0,0 +1,177 @@
+import datetime
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ciquest_model.bulk import upsert
+from ciquest_model.models import Store, StoreDailyStats, StoreFeed
+from ciquest_model.store_map import haversine_km, tile_bounds, tile_of
+
+# ホームのおすすめ順（/api/stores/feed/）は地域のマス（Web メルカトルの FEED_ZOOM のタイル）ごとに並べておく。
+# 候補はマスと周り8マスの店舗で、距離はマスの中心から測る
+FEED_ZOOM = 12
+# スコア = おすすめ + 優先度 + 最近の活動（スタンプ・クリア数の log）- 距離（FEED_DISTANCE_SCALE_KM ごとに 1）
+FEED_FEATURED_WEIGHT = 3.0
+FEED_PRIORITY_WEIGHT = 0.5
+FEED_ACTIVITY_WEIGHT = 1.0
+FEED_DISTANCE_SCALE_KM = 5.0
+
+
+def store_feed_key(x, y):
+    return f"store_feed:{FEED_ZOOM}:{x}:{y}"
+
+
+def feed_cell(lat, lon):
+    return tile_of(lat, lon, FEED_ZOOM)
+
+
+def _neighborhood(x, y):
+    size = 1 << FEED_ZOOM
+    return [
+        (x + dx, y + dy)
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        if 0 <= x + dx < size and 0 <= y + dy < size
+    ]
+
+
+def affected_cells(*positions):
+    """(緯度, 経度) の店舗を候補に含むマス（その店舗のマスと周り8マス）。"""
+    cells = set()
+    for lat, lon in positions:
+        if lat is not None and lon is not None:
+            cells.update(_neighborhood(*feed_cell(float(lat), float(lon))))
+    return cells
+
+
+def _cell_center(x, y):
+    south, west, north, east = tile_bounds(FEED_ZOOM, x, y)
+    return (south + north) / 2, (west + east) / 2
+
+
+def recent_activity(store_ids=None, today=None):
+    """
+    店舗ごとの直近 STORE_FEED_ACTIVITY_DAYS 日（昨日まで）のスタンプ数＋クリア数（StoreDailyStats から）。
+    当日分は含めないため、値は日付が変わるまで変わらない（夜間の作り直しで反映する）。
+    """
+    today = today or timezone.localdate()
+    days = getattr(settings, "STORE_FEED_ACTIVITY_DAYS", 14)
+    rows = StoreDailyStats.objects.filter(date__gte=today - datetime.timedelta(days=days), date__lt=today)
+    if store_ids is not None:
+        rows = rows.filter(store_id__in=store_ids)
+    return dict(rows.values("store_id").annotate(total=Sum(F("stamps") + F("clears"))).values_list("store_id", "total"))
+
+
+def rank_cell(x, y, candidates, activity):
+    """候補 [(store_id, 緯度, 経度, おすすめか, 優先度), ...] をスコア順に並べた店舗 ID（上位 STORE_FEED_SIZE 件）。"""
+    center_lat, center_lon = _cell_center(x, y)
+    scored = []
+    for store_id, lat, lon, is_featured, priority in candidates:
+        score = (
+            FEED_FEATURED_WEIGHT * is_featured
+            + FEED_PRIORITY_WEIGHT * priority
+            + FEED_ACTIVITY_WEIGHT * math.log1p(activity.get(store_id, 0))
+            - haversine_km(center_lat, center_lon, lat, lon) / FEED_DISTANCE_SCALE_KM
+        )
+        scored.append((-score, store_id))
+    scored.sort()
+    return [store_id for _, store_id in scored[:getattr(settings, "STORE_FEED_SIZE", 200)]]
+
+
+def _candidates(stores):
+    return [
+        (store_id, float(lat), float(lon), is_featured, priority)
+        for store_id, lat, lon, is_featured, priority in stores.values_list(
+            "store_id", "latitude", "longitude", "is_featured", "priority"
+        )
+        if lat is not None and lon is not None
+    ]
+
+
+def _save(feeds, now):
+    """並びを保存する。候補のないマスは行を持たない（行があれば消す）。"""
+    upsert(
+        StoreFeed,
+        [
+            StoreFeed(cell_x=x, cell_y=y, store_ids=store_ids, computed_at=now)
+            for (x, y), store_ids in feeds.items()
+            if store_ids
+        ],
+        ["cell_x", "cell_y"],
+        ["store_ids", "computed_at"],
+    )
+    for x, y in [cell for cell, store_ids in feeds.items() if not store_ids]:
+        StoreFeed.objects.filter(cell_x=x, cell_y=y).delete()
+    cache.delete_many([store_feed_key(x, y) for x, y in feeds])
+
+
+def _rank_cells(cells):
+    """
+    指定のマスの並びを作る（保存はしない）。候補はマスと周り8マスの範囲の店舗を DB から引く。
+    戻り値は {(x, y): [store_id, ...]}。
+    """
+    feeds = {}
+    for x, y in cells:
+        area = _neighborhood(x, y)
+        south = tile_bounds(FEED_ZOOM, *max(area, key=lambda cell: cell[1]))[0]
+        north = tile_bounds(FEED_ZOOM, *min(area, key=lambda cell: cell[1]))[2]
+        west = tile_bounds(FEED_ZOOM, *min(area))[1]
+        east = tile_bounds(FEED_ZOOM, *max(area))[3]
+        candidates = [
+            candidate
+            for candidate in _candidates(
+                Store.objects.filter(
+                    status="approved",
+                    latitude__range=(south, north),
+                    longitude__range=(west, east),
+                )
+            )
+            # 範囲の端の店舗は tile_of で周り8マスに入るものだけにする（全件の作り直しと同じ候補にする）
+            if feed_cell(candidate[1], candidate[2]) in area
+        ]
+        activity = recent_activity([candidate[0] for candidate in candidates])
+        feeds[(x, y)] = rank_cell(x, y, candidates, activity)
+    return feeds
+
+
+def refresh_feeds(cells, now=None):
+    """指定のマスの並びだけを作り直して保存する（店舗の変更時）。戻り値は {(x, y): [store_id, ...]}。"""
+    feeds = _rank_cells(cells)
+    _save(feeds, now or timezone.now())
+    return feeds
+
+
+def rebuild_feeds(now=None):
+    """公開中の全店舗から、店舗のあるすべてのマスの並びを作り直す（夜間）。戻り値はマスの数。"""
+    now = now or timezone.now()
+    activity = recent_activity()
+    members = {}
+    for candidate in _candidates(Store.objects.filter(status="approved")):
+        for cell in _neighborhood(*feed_cell(candidate[1], candidate[2])):
+            members.setdefault(cell, []).append(candidate)
+    feeds = {cell: rank_cell(*cell, candidates, activity) for cell, candidates in members.items()}
+    _save(feeds, now)
+    # 候補がなくなったマスの並びは捨てる
+    StoreFeed.objects.filter(computed_at__lt=now).delete()
+    return len(feeds)
+
+
+def get_feed(lat, lon):
+    """
+    (緯度, 経度) のマスの並び。まだ作られていないマスはその場で作る。
+    候補のないマスは保存せず、空の並びはキャッシュにだけ置く（任意の座標の問い合わせで行を増やさない）。
+    """
+    x, y = feed_cell(lat, lon)
+    key = store_feed_key(x, y)
+    store_ids = cache.get(key)
+    if store_ids is None:
+        store_ids = StoreFeed.objects.filter(cell_x=x, cell_y=y).values_list("store_ids", flat=True).first()
+        if store_ids is None:
+            store_ids = _rank_cells([(x, y)])[(x, y)]
+            if store_ids:
+                _save({(x, y): store_ids}, timezone.now())
+        cache.set(key, store_ids, getattr(settings, "STORE_FEED_CACHE_SECONDS", 300))
+    return (x, y), store_ids
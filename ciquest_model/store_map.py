@@ -0,0 +1,188 @@
+import math
+
+from ciquest_model.local_index import LocalIndex
+
+# 地図のクラスタは Web メルカトルの 256px タイル上で CLUSTER_CELL_PX 四方のマスごとにまとめる
+TILE_SIZE = 256
+CLUSTER_CELL_PX = 64
+CLUSTER_MAX_ZOOM = 18
+# 1回に返すマスの上限（画面の広さに対して bbox が広すぎる要求を断る）
+CLUSTER_MAX_CELLS = 4096
+MAX_LATITUDE = 85.05112878
+STORE_MAP_VERSION_CACHE_KEY = "store_map:version"
+# 店舗タイル（/api/stores/tiles/<z>/<x>/<y>/）を配るズームの範囲。これより引いた表示はクラスタを使う
+STORE_TILE_MIN_ZOOM = 10
+STORE_TILE_MAX_ZOOM = 16
+# 近くの店舗を探すときに店舗を入れるマスのズーム（64px のマスで1辺およそ 8〜10km、半径 50km でも 200 マス弱）
+NEARBY_BUCKET_ZOOM = 10
+EARTH_RADIUS_KM = 6371.0
+
+
+def to_world(lat, lon):
+    """緯度経度を Web メルカトルの世界座標（0〜1）にする。"""
+    lat = min(max(lat, -MAX_LATITUDE), MAX_LATITUDE)
+    x = (lon + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points on Earth in kilometers."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def tile_of(lat, lon, zoom):
+    """緯度経度を含むタイルの (x, y)。"""
+    x, y = to_world(lat, lon)
+    size = 1 << zoom
+    return min(int(x * size), size - 1), min(int(y * size), size - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """タイルの (南, 西, 北, 東) の緯度経度。"""
+    size = 1 << zoom
+
+    def latitude(world_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * world_y))))
+
+    return latitude((y + 1) / size), x / size * 360.0 - 180.0, latitude(y / size), (x + 1) / size * 360.0 - 180.0
+
+
+def store_tiles(lat, lon):
+    """店舗の位置を含む、配布するすべてのズームのタイル [(z, x, y), ...]。"""
+    if lat is None or lon is None:
+        return []
+    lat, lon = float(lat), float(lon)
+    return [(zoom, *tile_of(lat, lon, zoom)) for zoom in range(STORE_TILE_MIN_ZOOM, STORE_TILE_MAX_ZOOM + 1)]
+
+
+def _cells_per_world(zoom):
+    return (TILE_SIZE << zoom) // CLUSTER_CELL_PX
+
+
+def _cell(x, y, zoom):
+    scale = _cells_per_world(zoom)
+    return min(int(x * scale), scale - 1), min(int(y * scale), scale - 1)
+
+
+class StoreClusters:
+    """
+    公開中の店舗を、ズームごとのマス目でまとめた階層。マスはズームが1つ上がると縦横2分割されるため、
+    最大ズームで店舗をマスに入れ、下のズームはそのマスを (x >> 差, y >> 差) にまとめて作る。
+    下のズームは作り直しのたびに全部は作らず、そのズームが初めて問い合わされたときに作って持っておく。
+    各マスは (件数, 緯度の和, 経度の和, 代表店舗の優先度, 代表店舗 ID)。
+    近くの店舗を探す nearby() 用に、NEARBY_BUCKET_ZOOM のマスごとの店舗の位置も持つ。
+    """
+
+    def __init__(self, top, buckets, positions):
+        # zoom -> {(cx, cy): [件数, 緯度の和, 経度の和, 優先度, 代表店舗 ID]}（最大ズーム以外は level() で作る）
+        self.levels = {CLUSTER_MAX_ZOOM: top}
+        # (cx, cy) -> [(店舗 ID, 緯度, 経度), ...]
+        self.buckets = buckets
+        # 店舗 ID -> (緯度, 経度)
+        self.positions = positions
+
+    @classmethod
+    def build(cls):
+        from ciquest_model.models import Store
+
+        top = {}
+        buckets = {}
+        positions = {}
+        rows = Store.objects.filter(status="approved").values_list(
+            "store_id", "latitude", "longitude", "is_featured", "priority"
+        )
+        for store_id, lat, lon, is_featured, priority in rows:
+            if lat is None or lon is None:
+                continue
+            lat, lon = float(lat), float(lon)
+            positions[store_id] = (lat, lon)
+            x, y = to_world(lat, lon)
+            buckets.setdefault(_cell(x, y, NEARBY_BUCKET_ZOOM), []).append((store_id, lat, lon))
+            # 代表はおすすめ → 優先度 → 古い店舗の順
+            rank = (is_featured, priority, -store_id)
+            cell = top.setdefault(_cell(x, y, CLUSTER_MAX_ZOOM), [0, 0.0, 0.0, None, None])
+            cls._merge(cell, [1, lat, lon, rank, store_id])
+        return cls(top, buckets, positions)
+
+    def level(self, zoom):
+        """ズームのマス。まだなければ最大ズームのマスをまとめて作る（同時に作られても結果は同じ）。"""
+        level = self.levels.get(zoom)
+        if level is None:
+            shift = CLUSTER_MAX_ZOOM - zoom
+            level = {}
+            for (cx, cy), child in self.levels[CLUSTER_MAX_ZOOM].items():
+                self._merge(level.setdefault((cx >> shift, cy >> shift), [0, 0.0, 0.0, None, None]), child)
+            self.levels[zoom] = level
+        return level
+
+    @staticmethod
+    def _merge(cell, other):
+        cell[0] += other[0]
+        cell[1] += other[1]
+        cell[2] += other[2]
+        if cell[3] is None or other[3] > cell[3]:
+            cell[3], cell[4] = other[3], other[4]
+
+    def query(self, zoom, south, west, north, east):
+        """
+        bbox（南西・北東の緯度経度）に重なるマスのクラスタ。マスの数が CLUSTER_MAX_CELLS を超える bbox は ValueError。
+        返す件数はマスの数（＝画面の広さ）で頭打ちになり、店舗数には比例しない。
+        """
+        zoom = min(max(zoom, 0), CLUSTER_MAX_ZOOM)
+        x0, y0 = _cell(*to_world(north, west), zoom)
+        x1, y1 = _cell(*to_world(south, east), zoom)
+        cells = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if cells > CLUSTER_MAX_CELLS:
+            raise ValueError(cells)
+        level = self.level(zoom)
+        if cells <= len(level):
+            found = ((key, level.get(key)) for key in ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)))
+        else:
+            found = ((key, cell) for key, cell in level.items() if x0 <= key[0] <= x1 and y0 <= key[1] <= y1)
+        return [
+            {
+                "lat": round(cell[1] / cell[0], 6),
+                "lon": round(cell[2] / cell[0], 6),
+                "count": cell[0],
+                "store_id": cell[4],
+            }
+            for _, cell in sorted((item for item in found if item[1]), key=lambda item: item[0])
+        ]
+
+    def nearby(self, lat, lon, radius_km):
+        """
+        (lat, lon) から radius_km 以内の公開中の店舗 [(距離 km, 店舗 ID), ...]（近い順）。
+        半径を囲む範囲のマスの店舗だけ距離を測るため、全店舗は見ない。
+        """
+        lat_delta = radius_km / 111.0
+        lon_delta = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+        x0, y0 = _cell(*to_world(lat + lat_delta, max(lon - lon_delta, -180.0)), NEARBY_BUCKET_ZOOM)
+        x1, y1 = _cell(*to_world(lat - lat_delta, min(lon + lon_delta, 180.0)), NEARBY_BUCKET_ZOOM)
+        found = []
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                for store_id, store_lat, store_lon in self.buckets.get((x, y), ()):
+                    distance_km = haversine_km(lat, lon, store_lat, store_lon)
+                    if distance_km <= radius_km:
+                        found.append((distance_km, store_id))
+        found.sort()
+        return found
+
+
+_store_clusters = LocalIndex(STORE_MAP_VERSION_CACHE_KEY, StoreClusters.build)
+
+
+def get_store_clusters():
+    return _store_clusters.get()
+
+
+def invalidate_store_map():
+    _store_clusters.invalidate()
@@ -0,0 +1,261 @@
+import datetime
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ciquest_model.bulk import upsert
+from ciquest_model.models import (
+    BackgroundTask,
+    CouponUsageHistory,
+    Store,
+    StoreDailyStats,
+    StoreStampHistory,
+    StoreStatsTotal,
+    UserChallenge,
+)
+
+COUNTER_FIELDS = [
+    "stamps",
+    "clears",
+    "attempts",
+    "cleared",
+    "new_participants",
+    "unique_users",
+    "redemptions",
+]
+# 元データから復元できない列（再集計では既存値と比べて大きい方を残す）
+_EVENT_ONLY_FIELDS = {"clears", "unique_users"}
+
+
+def is_first_visit(user_id, store_id, when):
+    """その日その店舗で初めての来店（スタンプ・クリア）か。書き込みの前に呼ぶこと。"""
+    day = timezone.localdate(when)
+    if StoreStampHistory.objects.filter(user_id=user_id, store_id=store_id, stamp_date=day).exists():
+        return False
+    return not UserChallenge.objects.filter(
+        user_id=user_id,
+        challenge__store_id=store_id,
+        status="cleared",
+        cleared_at__date=day,
+    ).exists()
+
+
+def visited_store_days(user_id, store_ids, days):
+    """
+    store_ids × days のうち、利用者のスタンプまたはクリアがある (店舗, 日) の組。
+    まとめて処理するときに is_first_visit を件数分呼ばずに済むよう、2回のクエリで読む。
+    """
+    visited = set(
+        StoreStampHistory.objects.filter(user_id=user_id, store_id__in=store_ids, stamp_date__in=days).values_list(
+            "store_id", "stamp_date"
+        )
+    )
+    for store_id, cleared_at in UserChallenge.objects.filter(
+        user_id=user_id,
+        challenge__store_id__in=store_ids,
+        status="cleared",
+        cleared_at__date__in=days,
+    ).values_list("challenge__store_id", "cleared_at"):
+        visited.add((store_id, timezone.localdate(cleared_at)))
+    return visited
+
+
+def record_store_activity(store_id, when, challenge_id=None, **deltas):
+    """(店舗, 日) の行と店舗の合計の行に加算する。1件分の record_store_activities。"""
+    record_store_activities([(store_id, when, challenge_id, deltas)])
+
+
+def record_store_activities(entries):
+    """
+    [(店舗 ID, 日時, challenge_id, {列: 加算値}), ...] を (店舗, 日) と店舗ごとに合算し、
+    日別の行と店舗の合計の行に加算する。件数によらずクエリ数は一定（行の作成・ロック・更新がそれぞれ1回ずつ）。
+    行をロックして更新し、呼び出し側は元データの書き込みと同じトランザクションの中で呼ぶため、
+    元データの書き込みがロールバックされれば集計も戻る。
+    """
+    by_day = {}
+    by_store = {}
+    for store_id, when, challenge_id, deltas in entries:
+        deltas = {field: amount for field, amount in deltas.items() if amount}
+        if store_id is None or not deltas:
+            continue
+        for target in (
+            by_day.setdefault((store_id, timezone.localdate(when)), ({}, {})),
+            by_store.setdefault(store_id, ({}, {})),
+        ):
+            counts, challenges = target
+            for field, amount in deltas.items():
+                counts[field] = counts.get(field, 0) + amount
+            if challenge_id and deltas.get("cleared"):
+                key = str(challenge_id)
+                challenges[key] = challenges.get(key, 0) + deltas["cleared"]
+    if not by_day:
+        return
+    with transaction.atomic():
+        StoreDailyStats.objects.bulk_create(
+            [StoreDailyStats(store_id=store_id, date=day) for store_id, day in by_day], ignore_conflicts=True
+        )
+        StoreStatsTotal.objects.bulk_create(
+            [StoreStatsTotal(store_id=store_id) for store_id in by_store], ignore_conflicts=True
+        )
+        # 並行する書き込みとデッドロックしないよう、どちらも pk 順にロックする
+        daily_rows = list(
+            StoreDailyStats.objects.select_for_update()
+            .filter(reduce(or_, [Q(store_id=store_id, date=day) for store_id, day in by_day]))
+            .order_by("pk")
+        )
+        total_rows = list(StoreStatsTotal.objects.select_for_update().filter(store_id__in=by_store).order_by("pk"))
+        _add_to_rows(StoreDailyStats, daily_rows, by_day, lambda row: (row.store_id, row.date))
+        _add_to_rows(StoreStatsTotal, total_rows, by_store, lambda row: row.store_id)
+
+
+def _add_to_rows(model, rows, sums, key_of):
+    """ロック済みの rows に sums[key_of(row)]（列ごとの加算値, クエストごとの cleared）を足し、1回の UPDATE で書く。"""
+    fields = set()
+    now = timezone.now()
+    for row in rows:
+        counts, challenges = sums[key_of(row)]
+        for field, amount in counts.items():
+            setattr(row, field, getattr(row, field) + amount)
+        for key, amount in challenges.items():
+            row.challenge_clears[key] = row.challenge_clears.get(key, 0) + amount
+        fields.update(counts)
+        # bulk_update では auto_now が入らない
+        row.updated_at = now
+    model.objects.bulk_update(rows, sorted(fields) + ["challenge_clears", "updated_at"])
+
+
+def _derive_store_days(store_id):
+    """元データから店舗の日別集計を組み立てる。"""
+    days = defaultdict(lambda: {"counts": dict.fromkeys(COUNTER_FIELDS, 0), "challenges": {}, "users": set()})
+
+    for day, count in (
+        StoreStampHistory.objects.filter(store_id=store_id)
+        .values_list("stamp_date")
+        .annotate(count=Count("pk"))
+        .order_by()
+    ):
+        days[day]["counts"]["stamps"] = count
+    for day, user_id in (
+        StoreStampHistory.objects.filter(store_id=store_id).values_list("stamp_date", "user_id").distinct()
+    ):
+        days[day]["users"].add(user_id)
+
+    # cleared_at のない行（進行中・日時なしで登録された行）はチャレンジの作成日に計上する
+    challenges = UserChallenge.objects.filter(challenge__store_id=store_id).annotate(
+        happened_at=Coalesce("cleared_at", "challenge__created_at"),
+        day=TruncDate("happened_at"),
+    )
+    for day, challenge_id, status, count in (
+        challenges.values_list("day", "challenge_id", "status").annotate(count=Count("pk")).order_by()
+    ):
+        counts = days[day]["counts"]
+        counts["attempts"] += count
+        if status == "cleared":
+            counts["cleared"] += count
+            counts["clears"] += count
+            days[day]["challenges"][str(challenge_id)] = count
+    for day, user_id in challenges.filter(status="cleared").values_list("day", "user_id").distinct():
+        days[day]["users"].add(user_id)
+    for first_cleared_at in (
+        challenges.filter(status="cleared")
+        .values("user_id")
+        .annotate(first=Min("happened_at"))
+        .values_list("first", flat=True)
+        .order_by()
+    ):
+        days[timezone.localdate(first_cleared_at)]["counts"]["new_participants"] += 1
+
+    for day, count in (
+        CouponUsageHistory.objects.filter(store_id=store_id)
+        .annotate(day=TruncDate("used_at"))
+        .values_list("day")
+        .annotate(count=Count("pk"))
+        .order_by()
+    ):
+        days[day]["counts"]["redemptions"] = count
+
+    for entry in days.values():
+        entry["counts"]["unique_users"] = len(entry["users"])
+    return days
+
+
+def rebuild_store(store_id):
+    """
+    1店舗分を全期間について再集計し、行を置き換える。店舗の合計の行も日別の行の合計に置き換える。
+    clears と unique_users は元データ（UserChallenge は最新のクリアだけを持つ）から
+    完全には復元できないため、書き込み時に加算した値の方が大きければそちらを残す。
+    """
+    derived = _derive_store_days(store_id)
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            row.date: row for row in StoreDailyStats.objects.select_for_update().filter(store_id=store_id)
+        }
+        rows = []
+        for day in set(derived) | set(existing):
+            entry = derived.get(day)
+            counts = entry["counts"] if entry else dict.fromkeys(COUNTER_FIELDS, 0)
+            current = existing.get(day)
+            if current:
+                for field in _EVENT_ONLY_FIELDS:
+                    counts[field] = max(counts[field], getattr(current, field))
+            if not any(counts.values()):
+                continue
+            rows.append(
+                StoreDailyStats(
+                    store_id=store_id,
+                    date=day,
+                    challenge_clears=entry["challenges"] if entry else {},
+                    updated_at=now,
+                    **counts,
+                )
+            )
+        stale_days = [day for day in existing if day not in {row.date for row in rows}]
+        if stale_days:
+            StoreDailyStats.objects.filter(store_id=store_id, date__in=stale_days).delete()
+        upsert(StoreDailyStats, rows, ["store", "date"], COUNTER_FIELDS + ["challenge_clears", "updated_at"])
+        total = StoreStatsTotal(store_id=store_id, updated_at=now)
+        for row in rows:
+            for field in COUNTER_FIELDS:
+                setattr(total, field, getattr(total, field) + getattr(row, field))
+            for challenge_id, count in row.challenge_clears.items():
+                total.challenge_clears[challenge_id] = total.challenge_clears.get(challenge_id, 0) + count
+        upsert(StoreStatsTotal, [total], ["store"], COUNTER_FIELDS + ["challenge_clears", "updated_at"])
+    return len(rows)
+
+
+def rebuild_store_stats(store_ids=None):
+    """店舗ごとに rebuild_store を実行する。戻り値は (店舗数, 行数)。"""
+    stores = Store.objects.order_by("store_id").values_list("store_id", flat=True)
+    if store_ids:
+        stores = stores.filter(store_id__in=store_ids)
+    store_count = row_count = 0
+    for store_id in stores:
+        row_count += rebuild_store(store_id)
+        store_count += 1
+    return store_count, row_count
+
+
+def schedule_nightly_rebuild(now=None):
+    """次の STORE_STATS_REBUILD_HOUR 時に再集計タスクを積む（実行待ちが既にあれば何もしない）。"""
+    from ciquest_model.tasks import enqueue
+
+    if BackgroundTask.objects.filter(name="rebuild_store_stats", status="pending").exists():
+        return False
+    now = timezone.localtime(now or timezone.now())
+    next_run = now.replace(
+        hour=getattr(settings, "STORE_STATS_REBUILD_HOUR", 4),
+        minute=0,
+        second=0,
+        microsecond=0,
+    )
+    if next_run <= now:
+        next_run += datetime.timedelta(days=1)
+    enqueue("rebuild_store_stats", delay_seconds=int((next_run - now).total_seconds()))
+    return True
@@ -0,0 +1,88 @@
+import re
+
+from ciquest_model.local_index import LocalIndex
+from ciquest_model.models import Store, StoreTag, Tag
+
+# 索引の版。タグ・店舗タグ・店舗の公開状態が変わると signals で新しい値にし、各プロセスはそれを見て作り直す
+TAG_INDEX_VERSION_CACHE_KEY = "tag_index:version"
+
+
+def store_bitmap(store_ids):
+    """店舗 ID をビット位置とする int を作る（1ビットずつ OR すると毎回 int を作り直すため bytes から作る）。"""
+    store_ids = list(store_ids)
+    if not store_ids:
+        return 0
+    buffer = bytearray(max(store_ids) // 8 + 1)
+    for store_id in store_ids:
+        buffer[store_id >> 3] |= 1 << (store_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def bitmap_store_ids(bitmap):
+    # 2進文字列を下位ビットから走査する（1ビットずつ取り出すより桁違いに速い）
+    return [match.start() for match in re.finditer("1", bin(bitmap)[:1:-1])]
+
+
+class TagIndex:
+    """
+    タグ -> 公開中の店舗の集合を、店舗 ID をビット位置とする int（ビットマップ）で持つ。
+    AND / OR はビット演算、件数は int.bit_count() で求められ、店舗数が数万でも数マイクロ秒で済む。
+    """
+
+    def __init__(self, postings, tags, stores):
+        # tag_id -> ビットマップ
+        self.postings = postings
+        # tag_id -> (名前, 有効か)
+        self.tags = tags
+        self.tag_ids_by_name = {name: tag_id for tag_id, (name, _) in tags.items()}
+        # 公開中の全店舗
+        self.stores = stores
+
+    @classmethod
+    def build(cls):
+        tags = {tag_id: (name, is_active) for tag_id, name, is_active in Tag.objects.values_list("tag_id", "name", "is_active")}
+        store_ids_by_tag = {}
+        for tag_id, store_id in StoreTag.objects.filter(store__status="approved").values_list("tag_id", "store_id"):
+            store_ids_by_tag.setdefault(tag_id, []).append(store_id)
+        postings = {tag_id: store_bitmap(store_ids) for tag_id, store_ids in store_ids_by_tag.items()}
+        stores = store_bitmap(Store.objects.filter(status="approved").values_list("store_id", flat=True))
+        return cls(postings, tags, stores)
+
+    def lookup(self, value):
+        """タグ名または tag_id の文字列から tag_id を引く。見つからなければ None。"""
+        value = value.strip()
+        if value.isdigit() and int(value) in self.tags:
+            return int(value)
+        return self.tag_ids_by_name.get(value)
+
+    def match(self, tag_ids, match_all=True):
+        """タグをすべて持つ（match_all=False ならいずれかを持つ）店舗のビットマップ。不明なタグ（None）は持つ店舗なし。"""
+        if not tag_ids:
+            return self.stores
+        bitmaps = [self.postings.get(tag_id, 0) if tag_id is not None else 0 for tag_id in tag_ids]
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result & bitmap if match_all else result | bitmap
+        return result
+
+    def facets(self, bitmap):
+        """有効なタグごとの、bitmap の店舗のうちそのタグを持つ店舗数（0件のタグは除く・多い順）。"""
+        counts = []
+        for tag_id, posting in self.postings.items():
+            name, is_active = self.tags.get(tag_id, (None, False))
+            count = (posting & bitmap).bit_count()
+            if is_active and count:
+                counts.append({"tag_id": tag_id, "name": name, "count": count})
+        counts.sort(key=lambda facet: (-facet["count"], facet["name"]))
+        return counts
+
+
+_tag_index = LocalIndex(TAG_INDEX_VERSION_CACHE_KEY, TagIndex.build)
+
+
+def get_tag_index():
+    return _tag_index.get()
+
+
+def invalidate_tag_index():
+    _tag_index.invalidate()
@@ -0,0 +1,188 @@
+import datetime
+import time
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ciquest_model.models import BackgroundTask, User
+
+_HANDLERS = {}
+
+
+def task(name):
+    """タスク名とハンドラ関数を対応付けるデコレータ。"""
+
+    def decorator(func):
+        _HANDLERS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name, payload=None, delay_seconds=0, max_attempts=None):
+    """
+    現在のトランザクションがコミットされた後にタスク行を作成する。
+    ロールバックされた書き込みに対してタスクが走ることはない。
+    """
+    if name not in _HANDLERS:
+        raise LookupError(f"Unknown task: {name}")
+    payload = dict(payload or {})
+    attempts_limit = max_attempts or getattr(settings, "BACKGROUND_TASK_MAX_ATTEMPTS", 5)
+
+    def create():
+        BackgroundTask.objects.create(
+            name=name,
+            payload=payload,
+            max_attempts=attempts_limit,
+            run_after=timezone.now() + datetime.timedelta(seconds=delay_seconds),
+        )
+
+    transaction.on_commit(create)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, "BACKGROUND_TASK_RETRY_BASE_SECONDS", 10)
+    limit = getattr(settings, "BACKGROUND_TASK_RETRY_MAX_SECONDS", 30 * 60)
+    return datetime.timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), limit))
+
+
+def claim_tasks(limit=10, now=None):
+    """
+    実行対象を limit 件まで確保して running にする（SKIP LOCKED）。
+    一定時間 running のまま残った行（ワーカー異常終了）も再取得する。
+    """
+    now = now or timezone.now()
+    stale_before = now - datetime.timedelta(
+        seconds=getattr(settings, "BACKGROUND_TASK_CLAIM_TIMEOUT_SECONDS", 10 * 60)
+    )
+    with transaction.atomic():
+        rows = list(
+            BackgroundTask.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status="pending", run_after__lte=now)
+                | Q(status="running", claimed_at__lt=stale_before)
+            )
+            .order_by("run_after", "task_id")[:limit]
+        )
+        if rows:
+            BackgroundTask.objects.filter(task_id__in=[row.task_id for row in rows]).update(
+                status="running",
+                claimed_at=now,
+            )
+    return rows
+
+
+def run_task(row):
+    """
+    1件を実行し、結果・試行回数・所要時間を記録する。
+    ワーカースレッドから呼ばれるため、終了時に DB 接続を片付ける。
+    """
+    started = time.monotonic()
+    try:
+        handler = _HANDLERS.get(row.name)
+        if handler is None:
+            raise LookupError(f"Unknown task: {row.name}")
+        handler(**row.payload)
+    except Exception:
+        row.attempts += 1
+        row.last_error = traceback.format_exc()[-2000:]
+        if row.attempts >= row.max_attempts:
+            row.status = "failed"
+            row.finished_at = timezone.now()
+        else:
+            row.status = "pending"
+            row.run_after = timezone.now() + _retry_delay(row.attempts)
+    else:
+        row.attempts += 1
+        row.status = "done"
+        row.last_error = ""
+        row.finished_at = timezone.now()
+    finally:
+        row.duration_ms = int((time.monotonic() - started) * 1000)
+        row.claimed_at = None
+        try:
+            row.save(
+                update_fields=[
+                    "attempts",
+                    "status",
+                    "last_error",
+                    "run_after",
+                    "finished_at",
+                    "duration_ms",
+                    "claimed_at",
+                ]
+            )
+        finally:
+            close_old_connections()
+    return row.status
+
+
+@task("award_badges")
+def award_badges(user_id, cleared_at=None, store_id=None):
+    """クリア・スタンプ後のバッジ判定。獲得分は未通知のまま保存される。"""
+    from ciquest_model.gamification import award_badges_for_user
+
+    user = User.objects.filter(user_id=user_id).first()
+    if not user:
+        return
+    award_badges_for_user(
+        user,
+        cleared_at=parse_datetime(cleared_at) if cleared_at else None,
+        store_id=store_id,
+    )
+
+
+@task("rebuild_store_stats")
+def rebuild_store_stats():
+    """
+    店舗統計（StoreDailyStats）の夜間再集計。失敗しても次の夜の分は必ず積む。
+    続きの分析・おすすめ・ホームの並びは成功したときだけ積む（再試行のたびに積まない）。
+    """
+    from ciquest_model.store_stats import rebuild_store_stats as rebuild, schedule_nightly_rebuild
+
+    try:
+        rebuild()
+    finally:
+        schedule_nightly_rebuild()
+    enqueue("build_store_analytics")
+    enqueue("build_store_recommendations")
+    enqueue("refresh_store_feeds")
+
+
+@task("build_store_analytics")
+def build_store_analytics(store_ids=None):
+    """オーナー分析（StoreAnalytics）の作り直し。夜間の再集計に続けて実行される。"""
+    from ciquest_model.analytics import build_store_analytics as build
+
+    build(store_ids)
+
+
+@task("build_store_recommendations")
+def build_store_recommendations():
+    """おすすめ店舗の近傍（StoreRecommendation）の作り直し。夜間の再集計に続けて実行される。"""
+    from ciquest_model.recommendations import build_store_recommendations as build
+
+    build()
+
+
+@task("refresh_store_feeds")
+def refresh_store_feeds(cells=None):
+    """ホームのおすすめ順（StoreFeed）の作り直し。cells があればそのマスだけ、なければ全体（夜間）。"""
+    from ciquest_model.store_feed import rebuild_feeds, refresh_feeds
+
+    if cells is None:
+        rebuild_feeds()
+    else:
+        refresh_feeds([tuple(cell) for cell in cells])
+
+
+@task("rebuild_search_index")
+def rebuild_search_index(kinds=None):
+    """検索索引（SearchDocument）の作り直し。通常は signals で更新され、初回と取りこぼしの補正に使う。"""
+    from ciquest_model.search import rebuild_search_index as rebuild
+
+    rebuild(kinds)
@@ -1,4 +1,127 @@
 # C:\Users\j_tagami\CiquestWebApp\ciquest_model\tests.py
-from django.test import TestCase
+import datetime
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ciquest_model.business_hours import MINUTES_PER_DAY, MINUTES_PER_WEEK, HoursIndex, compile_business_hours
+from ciquest_model.exports import _keyset_rows, export_rows
+from ciquest_model.models import Store, StoreOwner, StoreStampHistory, User, UserRefreshToken
+from ciquest_server import views
+
+
+class RefreshTokenTests(TestCase):
+    """refresh トークンのローテーション・再利用検知・ログアウト"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="tester", email="tester@example.com", password="pw12345")
+
+    def post(self, path, data):
+        return self.client.post(path, json.dumps(data), content_type="application/json")
+
+    def login(self):
+        response = self.post("/api/login/", {"email": "tester@example.com", "password": "pw12345"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["refresh"]
+
+    def refresh(self, token):
+        return self.post("/api/token/refresh/", {"refresh": token})
+
+    def test_rotate_rejects_previous_token(self):
+        old = self.login()
+        response = self.refresh(old)
+        self.assertEqual(response.status_code, 200)
+        new = response.json()["refresh"]
+        self.assertNotEqual(new, old)
+
+        self.assertEqual(self.refresh(old).status_code, 401)
+        # 別プロセス（失効済み jti を知らない）でも DB の条件付き UPDATE で弾かれる
+        with mock.patch.object(views, "_revoked_refresh_jtis", views._RevokedJtiFilter()):
+            self.assertEqual(self.refresh(old).status_code, 401)
+
+    def test_replayed_token_revokes_family(self):
+        old = self.login()
+        new = self.refresh(old).json()["refresh"]
+
+        with mock.patch.object(views, "_revoked_refresh_jtis", views._RevokedJtiFilter()):
+            self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertIsNotNone(UserRefreshToken.objects.get(user=self.user).revoked_at)
+        # 正規の利用者が持っている新しいトークンも使えなくなる
+        self.assertEqual(self.refresh(new).status_code, 401)
+
+    def test_refresh_after_logout_is_rejected_without_db_read(self):
+        token = self.login()
+        self.assertEqual(self.post("/api/logout/", {"refresh": token}).status_code, 200)
+
+        # 失効済み jti のフィルタで弾かれ、トークン行は読みも更新もしない（ファミリー失効の UPDATE 1回だけ）
+        with CaptureQueriesContext(connection) as queries:
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("family_id", queries[0]["sql"])
+        self.assertNotIn("token_hash", queries[0]["sql"])
+
+
+class BusinessHoursTests(SimpleTestCase):
+    """business_hours_json から週の分の営業区間への変換"""
+
+    def minute(self, day, clock):
+        hours, minutes = map(int, clock.split(":"))
+        return day * MINUTES_PER_DAY + hours * 60 + minutes
+
+    def test_cross_midnight(self):
+        intervals = compile_business_hours({"fri": ["18:00", "02:00"]})
+        self.assertEqual(intervals, [[self.minute(4, "18:00"), self.minute(5, "02:00")]])
+
+    def test_sunday_wraps_to_monday(self):
+        intervals = compile_business_hours({"sun": ["22:00", "03:00"]})
+        self.assertEqual(intervals, [[0, self.minute(0, "03:00")], [self.minute(6, "22:00"), MINUTES_PER_WEEK]])
+
+        index = HoursIndex([(start, end, 1) for start, end in intervals])
+        self.assertEqual(index.open_store_ids(self.minute(0, "01:00")), {1})
+        self.assertEqual(index.open_store_ids(self.minute(6, "23:30")), {1})
+        self.assertEqual(index.open_store_ids(self.minute(0, "03:00")), set())
+
+    def test_wrapped_range_merges_with_monday(self):
+        intervals = compile_business_hours({"sun": ["22:00", "03:00"], "mon": ["02:00", "10:00"]})
+        self.assertEqual(intervals, [[0, self.minute(0, "10:00")], [self.minute(6, "22:00"), MINUTES_PER_WEEK]])
+
+
+class ExportKeysetTests(TestCase):
+    """キーセットでのページ分けが同じ日時の行をページの境目で落とさず、重複もさせないこと"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = StoreOwner.objects.create(email="owner@example.com", password="pw12345")
+        store = Store.objects.create(
+            owner=owner, name="store", address="address", latitude=35, longitude=139, qr_code="export-test",
+        )
+        user = User.objects.create(username="tester", email="tester@example.com", password="pw12345")
+        first = timezone.make_aware(datetime.datetime(2026, 1, 1, 12, 0))
+        second = first + datetime.timedelta(hours=1)
+        StoreStampHistory.objects.bulk_create(
+            StoreStampHistory(user=user, store=store, stamp_date=stamped_at.date(), stamped_at=stamped_at)
+            for stamped_at in [second, first, second, first, first, second, first]
+        )
+        cls.expected = list(
+            StoreStampHistory.objects.order_by("stamped_at", "pk").values_list("store_stamp_history_id", flat=True)
+        )
+
+    def test_page_boundary_on_tied_dates(self):
+        rows = StoreStampHistory.objects.all()
+        for chunk_size in range(1, len(self.expected) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertNumQueries(len(self.expected) // chunk_size + 1):
+                    ids = [row[0] for row in _keyset_rows(rows, ["store_stamp_history_id"], ["stamped_at"], chunk_size)]
+                self.assertEqual(ids, self.expected)
+
+    @override_settings(EXPORT_CHUNK_SIZE=3)
+    def test_export_rows(self):
+        stamped = [row[0] for row in export_rows("stamps")]
+        self.assertEqual(stamped, sorted(stamped))
+        self.assertEqual(len(stamped), len(self.expected))
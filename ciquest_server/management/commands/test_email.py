@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.core.mail import get_connection, send_mail
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from ciquest_model.email_outbox import drain
 
 
 class Command(BaseCommand):
@@ -9,8 +11,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             "--to",
-            required=True,
-            help="送信先メールアドレス（必須）",
+            help="送信先メールアドレス（--drain を使わない場合は必須）",
         )
         parser.add_argument(
             "--subject",
@@ -28,9 +29,22 @@ class Command(BaseCommand):
             default=5,
             help="接続タイムアウト秒数（デフォルト5秒）",
         )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="送信キュー（EmailOutbox）を空になるまで送信する（--to 併用時はその後テストメールも送信）",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="--drain 時の1バッチあたりの件数",
+        )
 
     def handle(self, *args, **options):
         to_addr = options["to"]
+        if not to_addr and not options["drain"]:
+            raise CommandError("--to または --drain を指定してください。")
         subject = options["subject"]
         body = options["body"]
         timeout = options["timeout"]
@@ -47,6 +61,14 @@ class Command(BaseCommand):
         self.stdout.write(f"DEFAULT_FROM_EMAIL: {getattr(settings, 'DEFAULT_FROM_EMAIL', None)}")
         self.stdout.write("=========================================")
 
+        if options["drain"]:
+            sent, failed = drain(batch_size=options["batch_size"], timeout=timeout)
+            self.stdout.write(self.style.SUCCESS(f"Outbox drained: sent={sent} failed={failed}"))
+            if failed:
+                self.stderr.write(self.style.WARNING("失敗したメールは再送待ちになりました（last_error を確認してください）。"))
+            if not to_addr:
+                return
+
         try:
             connection = get_connection(timeout=timeout)
             sent = send_mail(
@@ -144,11 +144,15 @@ else:
         }
     }
 
+# DB 接続を使い回す秒数。ASGI（start.sh の uvicorn）では同期ビューがリクエストごとに別スレッドで動き、
+# 持続接続はスレッドごとに残って接続数の上限に達するため、既定は 0（リクエストごとに閉じる）
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", "0"))
+
 # DATABASE_URL が設定されている場合は優先して利用（Render/Postgres 用）
 DATABASE_URL = os.environ.get("DATABASE_URL")
 if DATABASE_URL:
     DATABASES = {
-        "default": dj_database_url.config(default=DATABASE_URL, conn_max_age=600)
+        "default": dj_database_url.config(default=DATABASE_URL, conn_max_age=DATABASE_CONN_MAX_AGE)
     }
 
 
@@ -262,4 +266,77 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", EMAIL_HOST_USER or "no-reply@ciquest.local")
 
+# メール送信キュー（python manage.py send_email_outbox --loop で送信）
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get("EMAIL_OUTBOX_RETRY_BASE_SECONDS", "30"))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.environ.get("EMAIL_OUTBOX_RETRY_MAX_SECONDS", str(60 * 60)))
+EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS = int(os.environ.get("EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS", str(10 * 60)))
+
+# アプリ起動用 /api/bootstrap/ の共通部分（店舗・お知らせ・カタログの版）のキャッシュ秒数
+BOOTSTRAP_CACHE_SECONDS = int(os.environ.get("BOOTSTRAP_CACHE_SECONDS", "30"))
+# 店舗詳細 /api/stores/<id>/ の公開部分のキャッシュ秒数（更新時は signals で即時無効化）
+# 既定のキャッシュはプロセス内メモリのため、複数ワーカー間の反映はこの秒数が上限になる
+STORE_DETAIL_CACHE_SECONDS = int(os.environ.get("STORE_DETAIL_CACHE_SECONDS", "60"))
+# スタンプカードの要約（上限と 個数 -> 特典）のキャッシュ秒数。スキャン時の特典判定にも使うため、
+# 共有キャッシュでないときは短めにする（更新時は signals で消すが、他のワーカーへの反映はこの秒数が上限）
+STAMP_PROGRAM_CACHE_SECONDS = int(os.environ.get("STAMP_PROGRAM_CACHE_SECONDS", "60"))
+# 店舗タイル /api/stores/tiles/<z>/<x>/<y>/ のサーバー側キャッシュ秒数（更新時は signals でタイル単位に無効化）
+# 共有キャッシュ（Redis など）を使うなら長くしてよい
+STORE_TILE_CACHE_SECONDS = int(os.environ.get("STORE_TILE_CACHE_SECONDS", "300"))
+# 店舗タイルの Cache-Control: ブラウザの max-age と CDN の s-maxage（期限切れ後は ETag で再検証）
+STORE_TILE_MAX_AGE = int(os.environ.get("STORE_TILE_MAX_AGE", "60"))
+STORE_TILE_CDN_MAX_AGE = int(os.environ.get("STORE_TILE_CDN_MAX_AGE", "300"))
+# 差分同期 /api/sync/ で token を進めない直近の秒数（並行トランザクションのコミット順のずれ対策）
+SYNC_SETTLE_SECONDS = int(os.environ.get("SYNC_SETTLE_SECONDS", "5"))
+# オフライン一括送信 /api/scans/bulk/ で受け付けるスキャン時刻の古さの上限（時間）
+OFFLINE_SCAN_MAX_AGE_HOURS = int(os.environ.get("OFFLINE_SCAN_MAX_AGE_HOURS", "72"))
+
+# バックグラウンドタスク（python manage.py run_worker --loop で実行）
+BACKGROUND_TASK_MAX_ATTEMPTS = int(os.environ.get("BACKGROUND_TASK_MAX_ATTEMPTS", "5"))
+BACKGROUND_TASK_RETRY_BASE_SECONDS = int(os.environ.get("BACKGROUND_TASK_RETRY_BASE_SECONDS", "10"))
+BACKGROUND_TASK_RETRY_MAX_SECONDS = int(os.environ.get("BACKGROUND_TASK_RETRY_MAX_SECONDS", str(30 * 60)))
+BACKGROUND_TASK_CLAIM_TIMEOUT_SECONDS = int(os.environ.get("BACKGROUND_TASK_CLAIM_TIMEOUT_SECONDS", str(10 * 60)))
+# 店舗統計（StoreDailyStats）の夜間再集計を行う時刻（ローカル時間の時）
+STORE_STATS_REBUILD_HOUR = int(os.environ.get("STORE_STATS_REBUILD_HOUR", "4"))
+# オーナー分析画面の週次リテンションで遡る週数
+ANALYTICS_COHORT_WEEKS = int(os.environ.get("ANALYTICS_COHORT_WEEKS", "12"))
+# おすすめ店舗（/api/recommendations/）: 夜間バッチで数える履歴の日数、店舗ごとに残す近傍の件数、
+# 組にする利用者ごとの店舗数の上限（新しい順）、近傍とみなす共通の利用者数の下限、もとにする利用者の最近の店舗数
+RECOMMENDATION_WINDOW_DAYS = int(os.environ.get("RECOMMENDATION_WINDOW_DAYS", "180"))
+RECOMMENDATION_NEIGHBORS = int(os.environ.get("RECOMMENDATION_NEIGHBORS", "20"))
+RECOMMENDATION_MAX_STORES_PER_USER = int(os.environ.get("RECOMMENDATION_MAX_STORES_PER_USER", "50"))
+RECOMMENDATION_MIN_COVISITS = int(os.environ.get("RECOMMENDATION_MIN_COVISITS", "2"))
+RECOMMENDATION_RECENT_STORES = int(os.environ.get("RECOMMENDATION_RECENT_STORES", "10"))
+# ホームのおすすめ順（/api/stores/feed/）: マスごとに並べておく店舗数、活動量として数える日数（昨日まで）、
+# マスの並びと店舗の要約のキャッシュ秒数（並びは作り直したときに消す）
+STORE_FEED_SIZE = int(os.environ.get("STORE_FEED_SIZE", "200"))
+STORE_FEED_ACTIVITY_DAYS = int(os.environ.get("STORE_FEED_ACTIVITY_DAYS", "14"))
+STORE_FEED_CACHE_SECONDS = int(os.environ.get("STORE_FEED_CACHE_SECONDS", "300"))
+# 運営画面の一覧 API で正確に数える件数の上限（超えた分はテーブル統計の概算）
+ADMIN_LIST_EXACT_COUNT_LIMIT = int(os.environ.get("ADMIN_LIST_EXACT_COUNT_LIMIT", "10000"))
+# 履歴の CSV / JSONL 出力で1回に DB から読む行数
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "2000"))
+# オーナー分析画面のブラウザキャッシュ秒数（夜間バッチで更新されるため長めでよい）
+OWNER_ANALYTICS_CACHE_SECONDS = int(os.environ.get("OWNER_ANALYTICS_CACHE_SECONDS", "600"))
+# タグ絞り込み・営業時間・地図のクラスタなど、プロセス内に持つ索引を作り直すまでの最長秒数
+# （更新時は版で即時に作り直すが、既定のキャッシュはプロセス内メモリのため他のワーカーへの反映はこの秒数が上限）
+LOCAL_INDEX_MAX_AGE_SECONDS = int(os.environ.get("LOCAL_INDEX_MAX_AGE_SECONDS", "60"))
+# 検索の方法: auto = DB の全文検索索引（SQLite FTS5 / pg_trgm / MySQL ngram）を使う / ngram = SearchGram の転置索引のみ
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto")
+
+# SSE /api/events/（ASGI で配信。start.sh は uvicorn のワーカーで起動し、WSGI で受けた接続には 503 を返す）
+# 配信経路: db = UserEvent テーブルをポーリング（複数プロセス可） / local = 同一プロセス内のみ
+EVENT_TRANSPORT = os.environ.get("EVENT_TRANSPORT", "db")
+EVENT_POLL_SECONDS = float(os.environ.get("EVENT_POLL_SECONDS", "1"))
+# event_id の欠番（未コミットの行）をこの秒数まで待ってから飛ばす
+EVENT_SETTLE_SECONDS = int(os.environ.get("EVENT_SETTLE_SECONDS", "5"))
+EVENT_HEARTBEAT_SECONDS = int(os.environ.get("EVENT_HEARTBEAT_SECONDS", "15"))
+# アクセストークンの有効期限に合わせて接続を閉じ、端末に再接続させる
+EVENT_STREAM_MAX_SECONDS = int(os.environ.get("EVENT_STREAM_MAX_SECONDS", "600"))
+EVENT_RETRY_MS = int(os.environ.get("EVENT_RETRY_MS", "3000"))
+# 1接続あたりの未送信イベントの上限（超えたら接続を閉じ、Last-Event-ID で再開させる）
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "100"))
+# UserEvent の保持時間（python manage.py purge_user_events で削除）
+EVENT_RETENTION_HOURS = int(os.environ.get("EVENT_RETENTION_HOURS", "72"))
+
 
@@ -27,17 +27,31 @@ urlpatterns = [
     path('api/token/refresh/', views.api_token_refresh, name='api_token_refresh'),
     path('api/logout/', views.api_logout, name='api_logout'),
     path('api/me/', views.api_me, name='api_me'),
+    path('api/bootstrap/', views.api_bootstrap, name='api_bootstrap'),
+    path('api/batch/', views.api_batch, name='api_batch'),
+    path('api/sync/', views.public_sync, name='public_sync'),
     path('api/user-challenges/clear/', views.api_user_challenge_clear, name='api_user_challenge_clear'),
     path('api/user-coupons/use/', views.api_user_coupon_use, name='api_user_coupon_use'),
     path('api/user-coupons/history/', views.api_user_coupon_history, name='api_user_coupon_history'),
+    path('api/coupons/exchange/', views.api_coupon_exchange, name='api_coupon_exchange'),
     path('api/user-badges/', views.api_user_badges, name='api_user_badges'),
+    path('api/user-badges/pending/', views.api_user_badges_pending, name='api_user_badges_pending'),
+    path('api/events/', views.api_events, name='api_events'),
     path('api/inquiries/', views.api_user_inquiry_create, name='api_user_inquiry_create'),
     path('api/store-coupons/history/', views.api_store_coupon_history, name='api_store_coupon_history'),
     path('api/stamps/scan/', views.api_store_stamp_scan, name='api_store_stamp_scan'),
+    path('api/scans/bulk/', views.api_scans_bulk, name='api_scans_bulk'),
     path('api/stores/', views.public_store_list, name='public_store_list'),
+    path('api/stores/clusters/', views.public_store_clusters, name='public_store_clusters'),
+    path('api/stores/feed/', views.public_store_feed, name='public_store_feed'),
+    path('api/stores/tiles/<int:zoom>/<int:x>/<int:y>/', views.public_store_tile, name='public_store_tile'),
+    path('api/stores/<int:store_id>/', views.public_store_detail, name='public_store_detail'),
     path('api/stamp-settings/', views.public_stamp_setting, name='public_stamp_setting'),
     path('api/coupons/', views.public_coupon_list, name='public_coupon_list'),
     path('api/challenges/', views.public_challenge_list, name='public_challenge_list'),
+    path('api/challenges/nearby/', views.public_challenge_nearby, name='public_challenge_nearby'),
+    path('api/search/', views.public_search, name='public_search'),
+    path('api/recommendations/', views.api_recommendations, name='api_recommendations'),
     path('api/notices/', views.public_notice_list, name='public_notice_list'),
     re_path(r'^_expo/(?P<path>.*)$', views.phone_web, name='phone_web_expo'),
     re_path(r'^assets/(?P<path>.*)$', views.phone_web, name='phone_web_assets'),
@@ -1,38 +1,48 @@
+import bisect
 import datetime
 import hashlib
+import io
 import json
+import logging
 import math
 import mimetypes
 import os
 import secrets
+import threading
 import urllib.parse
 import urllib.request
 from urllib.error import HTTPError, URLError
 
 import jwt
+from asgiref.sync import sync_to_async
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout as django_logout
 from django.contrib.auth.hashers import check_password, make_password
-from django.core.exceptions import SuspiciousFileOperation
-from django.core.mail import get_connection, send_mail
-from django.db.models import Q
-from django.http import FileResponse, Http404, JsonResponse
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
-from django.urls import reverse
+from django.urls import Resolver404, resolve, reverse
 from django.utils import timezone
 from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
 from ciquest_model.models import (
     AdminAccount,
-    Badge,
     AdminInquiry,
+    ChangeLog,
     Challenge,
     Coupon,
-    Rank,
+    CouponUsageHistory,
     Notice,
     Store,
     StoreOwner,
@@ -45,12 +55,59 @@ from ciquest_model.models import (
     User,
     UserChallenge,
     UserCoupon,
-    UserCouponUsageHistory,
     UserBadge,
-    StoreCouponUsageHistory,
     UserRefreshToken,
 )
+from ciquest_model.business_hours import get_hours_index, parse_open_at
+from ciquest_model.email_outbox import enqueue_email
+from ciquest_model.events import publish as publish_event
+from ciquest_model.events import publish_many
+from ciquest_model.events import stream as event_stream
+from ciquest_model.events import user_channel
+from ciquest_model.gamification import (
+    BADGE_DEFINITIONS,
+    RANK_DEFINITIONS,
+    ensure_user_rank,
+    rank_index,
+    rank_multiplier,
+    serialize_badge,
+)
 from ciquest_model.markdown_utils import render_markdown
+from ciquest_model.points import InsufficientPoints, earn_points, earn_points_bulk, spend_points
+from ciquest_model.public_cache import (
+    BOOTSTRAP_NOTICES_CACHE_KEY,
+    BOOTSTRAP_STORES_CACHE_KEY,
+    BOOTSTRAP_VERSIONS_CACHE_KEY,
+    stamp_program_cache_seconds,
+    stamp_program_key,
+    store_detail_cache_seconds,
+    store_detail_key,
+    store_summary_key,
+    store_tile_cache_seconds,
+    store_tile_key,
+)
+from ciquest_model.recommendations import recommend
+from ciquest_model.search import QUERY_MAX_LENGTH as SEARCH_QUERY_MAX_LENGTH
+from ciquest_model.search import search as search_catalog
+from ciquest_model.store_feed import get_feed
+from ciquest_model.store_map import (
+    CLUSTER_MAX_CELLS,
+    CLUSTER_MAX_ZOOM,
+    STORE_TILE_MAX_ZOOM,
+    STORE_TILE_MIN_ZOOM,
+    get_store_clusters,
+    haversine_km,
+    tile_bounds,
+    tile_of,
+)
+from ciquest_model.store_stats import (
+    is_first_visit,
+    record_store_activities,
+    record_store_activity,
+    visited_store_days,
+)
+from ciquest_model.tag_index import bitmap_store_ids, get_tag_index, store_bitmap
+from ciquest_model.tasks import enqueue as enqueue_task
 from ciquest_server.forms import AdminSignupForm, OwnerProfileForm, OwnerSignupForm
 
 
@@ -99,26 +156,20 @@ def unified_login(request):
                     request.session["admin_authenticated"] = True
                     request.session["admin_id"] = admin.admin_id
                     # 管理ログイン通知メール（EMAIL_HOST が未設定なら送信しない）
+                    # 送信は send_email_outbox ワーカーが行うため、ログイン応答は SMTP を待たない
                     if getattr(settings, "EMAIL_HOST", ""):
+                        ip = request.META.get("REMOTE_ADDR") or "unknown"
+                        now = timezone.now().strftime("%Y-%m-%d %H:%M:%S %Z")
+                        subject = "【Ciquest】運営ログイン通知"
+                        body = (
+                            f"{admin.name} 様\n\n"
+                            "以下の内容で運営ダッシュボードへのログインが行われました。\n"
+                            f"日時: {now}\n"
+                            f"IP: {ip}\n\n"
+                            "心当たりがない場合はパスワードを変更し、他の運営に連絡してください。"
+                        )
                         try:
-                            ip = request.META.get("REMOTE_ADDR") or "unknown"
-                            now = timezone.now().strftime("%Y-%m-%d %H:%M:%S %Z")
-                            subject = "【Ciquest】運営ログイン通知"
-                            body = (
-                                f"{admin.name} 様\n\n"
-                                "以下の内容で運営ダッシュボードへのログインが行われました。\n"
-                                f"日時: {now}\n"
-                                f"IP: {ip}\n\n"
-                                "心当たりがない場合はパスワードを変更し、他の運営に連絡してください。"
-                            )
-                            from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None) or getattr(
-                                settings, "EMAIL_HOST_USER", None
-                            ) or "no-reply@ciquest.local"
-                            try:
-                                connection = get_connection(timeout=5)
-                            except Exception:
-                                connection = None
-                            send_mail(subject, body, from_email, [admin.email], fail_silently=True, connection=connection)
+                            enqueue_email(subject, body, [admin.email])
                         except Exception:
                             pass
                     return redirect("admin_dashboard")
@@ -340,24 +391,12 @@ def api_google_login(request):
             email=email,
             password=make_password(secrets.token_urlsafe(18)),
         )
-    _ensure_user_rank(user)
+    ensure_user_rank(user)
     access = _create_access_token(user)
-    refresh = _create_refresh_token(user)
+    refresh = _create_refresh_token(user, device_id=data.get("device_id") if data else None)
     return JsonResponse({"user": _serialize_user(user), "access": access, "refresh": refresh})
 
 
-def _haversine_km(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points on Earth in kilometers."""
-    r = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    d_phi = math.radians(lat2 - lat1)
-    d_lambda = math.radians(lon2 - lon1)
-    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return r * c
-
-
 def _verify_password(raw_password, stored_password, user_obj):
     if not stored_password:
         return False
@@ -444,233 +483,12 @@ def _serialize_user(user):
         "email": user.email,
         "rank_id": user.rank_id,
         "rank": user.rank.name if user.rank else None,
-        "rank_multiplier": _rank_multiplier(user.rank),
+        "rank_multiplier": rank_multiplier(user.rank),
         "points": user.points,
         "created_at": user.created_at.isoformat() if user.created_at else None,
     }
 
 
-RANK_DEFINITIONS = [
-    {"name": "ブロンズ", "threshold": 0, "multiplier": 1.0},
-    {"name": "シルバー", "threshold": 25, "multiplier": 1.1},
-    {"name": "ゴールド", "threshold": 50, "multiplier": 1.2},
-    {"name": "レジェンド", "threshold": 100, "multiplier": 1.3},
-    {"name": "エリート", "threshold": 200, "multiplier": 1.4},
-]
-RANK_ORDER = [definition["name"] for definition in RANK_DEFINITIONS]
-
-
-def _rank_period_start(now=None):
-    current = timezone.localtime(now or timezone.now())
-    start_month = current.month if current.month % 2 == 1 else current.month - 1
-    start_year = current.year
-    start_date = datetime.datetime(start_year, start_month, 1)
-    return timezone.make_aware(start_date, timezone.get_current_timezone())
-
-
-def _ensure_rank_catalog():
-    ranks = {}
-    for definition in RANK_DEFINITIONS:
-        rank, created = Rank.objects.get_or_create(
-            name=definition["name"],
-            defaults={"required_points": definition["threshold"]},
-        )
-        if not created and rank.required_points != definition["threshold"]:
-            rank.required_points = definition["threshold"]
-            rank.save(update_fields=["required_points"])
-        ranks[definition["name"]] = rank
-    return ranks
-
-
-def _rank_index(rank):
-    if not rank:
-        return 0
-    try:
-        return RANK_ORDER.index(rank.name)
-    except ValueError:
-        return 0
-
-
-def _rank_multiplier(rank):
-    if not rank:
-        return 1.0
-    for definition in RANK_DEFINITIONS:
-        if definition["name"] == rank.name:
-            return definition["multiplier"]
-    return 1.0
-
-
-def _rank_from_clears(clears, ranks):
-    for definition in reversed(RANK_DEFINITIONS):
-        if clears >= definition["threshold"]:
-            return ranks[definition["name"]]
-    return ranks[RANK_ORDER[0]]
-
-
-def _ensure_user_rank(user):
-    ranks = _ensure_rank_catalog()
-    fields_to_update = []
-
-    if not user.rank_id:
-        user.rank = ranks[RANK_ORDER[0]]
-        fields_to_update.append("rank")
-    current_rank = user.rank or ranks[RANK_ORDER[0]]
-
-    period_start = _rank_period_start()
-    if user.last_rank_reset_at is None or user.last_rank_reset_at < period_start:
-        new_index = max(_rank_index(current_rank) - 1, 0)
-        new_rank = ranks[RANK_ORDER[new_index]]
-        if current_rank.rank_id != new_rank.rank_id:
-            user.rank = new_rank
-            fields_to_update.append("rank")
-            current_rank = new_rank
-        user.last_rank_reset_at = period_start
-        fields_to_update.append("last_rank_reset_at")
-
-    clears = UserChallenge.objects.filter(
-        user=user,
-        status="cleared",
-        cleared_at__gte=period_start,
-    ).count()
-    target_rank = _rank_from_clears(clears, ranks)
-    if _rank_index(target_rank) > _rank_index(current_rank):
-        user.rank = target_rank
-        fields_to_update.append("rank")
-        current_rank = target_rank
-
-    if fields_to_update:
-        user.save(update_fields=sorted(set(fields_to_update)))
-    return current_rank, clears
-
-
-BADGE_DEFINITIONS = [
-    {"code": "quest_1", "name": "はじめの一歩", "description": "クエストを1回クリア", "category": "quest", "hidden": False},
-    {"code": "quest_10", "name": "冒険者", "description": "クエストを10回クリア", "category": "quest", "hidden": False},
-    {"code": "quest_50", "name": "熟練者", "description": "クエストを50回クリア", "category": "quest", "hidden": False},
-    {"code": "quest_200", "name": "伝説", "description": "クエストを200回クリア", "category": "quest", "hidden": False},
-    {"code": "stamp_5", "name": "コレクター", "description": "スタンプを5回獲得", "category": "stamp", "hidden": False},
-    {"code": "stamp_20", "name": "マニア", "description": "スタンプを20回獲得", "category": "stamp", "hidden": False},
-    {"code": "stamp_100", "name": "マスター", "description": "スタンプを100回獲得", "category": "stamp", "hidden": False},
-    {"code": "store_3", "name": "探索者", "description": "3店舗でクエストをクリア", "category": "store", "hidden": False},
-    {"code": "store_10", "name": "放浪者", "description": "10店舗でクエストをクリア", "category": "store", "hidden": False},
-    {"code": "store_30", "name": "世界見聞", "description": "30店舗でクエストをクリア", "category": "store", "hidden": False},
-    {"code": "night_owl", "name": "夜更かし冒険者", "description": "深夜にクエストをクリア", "category": "hidden", "hidden": True},
-    {"code": "streak_7", "name": "連続挑戦者", "description": "7日連続でクエストをクリア", "category": "hidden", "hidden": True},
-    {"code": "stamp_artisan", "name": "スタンプ職人", "description": "同じ店舗でスタンプを10回獲得", "category": "hidden", "hidden": True},
-]
-
-
-def _ensure_badge_catalog():
-    badges = {}
-    for definition in BADGE_DEFINITIONS:
-        badge, created = Badge.objects.get_or_create(
-            code=definition["code"],
-            defaults={
-                "name": definition["name"],
-                "description": definition["description"],
-                "category": definition["category"],
-                "is_hidden": definition["hidden"],
-            },
-        )
-        if not created:
-            updates = []
-            if badge.name != definition["name"]:
-                badge.name = definition["name"]
-                updates.append("name")
-            if badge.description != definition["description"]:
-                badge.description = definition["description"]
-                updates.append("description")
-            if badge.category != definition["category"]:
-                badge.category = definition["category"]
-                updates.append("category")
-            if badge.is_hidden != definition["hidden"]:
-                badge.is_hidden = definition["hidden"]
-                updates.append("is_hidden")
-            if updates:
-                badge.save(update_fields=updates)
-        badges[definition["code"]] = badge
-    return badges
-
-
-def _serialize_badge(badge, awarded_at=None):
-    return {
-        "id": badge.badge_id,
-        "code": badge.code,
-        "name": badge.name,
-        "description": badge.description or "",
-        "category": badge.category,
-        "awarded_at": awarded_at.isoformat() if awarded_at else None,
-    }
-
-
-def _grant_badge(user, badge):
-    user_badge, created = UserBadge.objects.get_or_create(user=user, badge=badge)
-    if not created:
-        return None
-    return _serialize_badge(badge, awarded_at=user_badge.awarded_at)
-
-
-def _has_streak(user, days):
-    cleared_dates = set(
-        UserChallenge.objects.filter(user=user, status="cleared")
-        .values_list("cleared_at__date", flat=True)
-        .distinct()
-    )
-    if not cleared_dates:
-        return False
-    current = timezone.localdate()
-    for _ in range(days):
-        if current not in cleared_dates:
-            return False
-        current -= datetime.timedelta(days=1)
-    return True
-
-
-def _award_badges_for_user(user, cleared_at=None, store_id=None):
-    badges = _ensure_badge_catalog()
-    new_badges = []
-
-    def maybe_award(code, condition):
-        if not condition:
-            return
-        payload = _grant_badge(user, badges[code])
-        if payload:
-            new_badges.append(payload)
-
-    total_clears = UserChallenge.objects.filter(user=user, status="cleared").count()
-    maybe_award("quest_1", total_clears >= 1)
-    maybe_award("quest_10", total_clears >= 10)
-    maybe_award("quest_50", total_clears >= 50)
-    maybe_award("quest_200", total_clears >= 200)
-
-    total_stamps = StoreStampHistory.objects.filter(user=user).count()
-    maybe_award("stamp_5", total_stamps >= 5)
-    maybe_award("stamp_20", total_stamps >= 20)
-    maybe_award("stamp_100", total_stamps >= 100)
-
-    unique_stores = (
-        UserChallenge.objects.filter(user=user, status="cleared")
-        .values("challenge__store_id")
-        .distinct()
-        .count()
-    )
-    maybe_award("store_3", unique_stores >= 3)
-    maybe_award("store_10", unique_stores >= 10)
-    maybe_award("store_30", unique_stores >= 30)
-
-    if cleared_at:
-        local_time = timezone.localtime(cleared_at)
-        maybe_award("night_owl", 0 <= local_time.hour < 5)
-        maybe_award("streak_7", _has_streak(user, 7))
-
-    if store_id:
-        user_stamp = StoreStamp.objects.filter(user=user, store_id=store_id).first()
-        if user_stamp and user_stamp.stamps_count >= 10:
-            maybe_award("stamp_artisan", True)
-
-    return new_badges
-
-
 def _hash_token(raw_token):
     return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
 
@@ -718,29 +536,138 @@ def _create_access_token(user):
     return _jwt_encode(payload)
 
 
-def _create_refresh_token(user):
+class _RevokedJtiFilter:
+    """
+    失効済み refresh トークンの jti をプロセス内に保持する簡易フィルタ。
+    再利用されたトークンを DB を読まずに弾くためのもので、正はあくまで DB。
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti, exp):
+        if not jti:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now_ts = int(timezone.now().timestamp())
+                self._entries = {k: v for k, v in self._entries.items() if v > now_ts}
+                if len(self._entries) >= self.max_entries:
+                    # 期限の近いものから捨てる
+                    for key in sorted(self._entries, key=self._entries.get)[: self.max_entries // 10 or 1]:
+                        del self._entries[key]
+            self._entries[jti] = int(exp or 0)
+
+    def __contains__(self, jti):
+        if not jti:
+            return False
+        exp = self._entries.get(jti)
+        return exp is not None and exp > int(timezone.now().timestamp())
+
+
+_revoked_refresh_jtis = _RevokedJtiFilter()
+
+
+def _normalize_device_id(value):
+    device_id = str(value or "").strip()[:64]
+    return device_id or "default"
+
+
+def _issue_refresh_payload(user_id, family_id):
     now, exp = _jwt_timestamps(
         getattr(settings, "JWT_REFRESH_LIFETIME_SECONDS", 60 * 60 * 24 * 14)
     )
     jti = secrets.token_hex(16)
     payload = {
-        "sub": str(user.user_id),
+        "sub": str(user_id),
         "type": "refresh",
         "jti": jti,
+        "fam": family_id,
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
     }
-    raw_token = _jwt_encode(payload)
-    UserRefreshToken.objects.filter(user=user, revoked_at__isnull=True).update(revoked_at=now)
-    UserRefreshToken.objects.create(
-        user=user,
+    return _jwt_encode(payload), jti, now, exp
+
+
+def _create_refresh_token(user, device_id=None):
+    """
+    ログイン時に新しいトークンファミリーを開始する。
+    ユーザー×端末ごとに1行だけを持ち、既存行があれば上書き（＝旧トークンは無効）する。
+    """
+    device_id = _normalize_device_id(device_id)
+    family_id = secrets.token_hex(16)
+    raw_token, jti, now, exp = _issue_refresh_payload(user.user_id, family_id)
+    values = {
+        "family_id": family_id,
+        "jti": jti,
+        "token_hash": _hash_token(raw_token),
+        "issued_at": now,
+        "rotated_at": None,
+        "expires_at": exp,
+        "revoked_at": None,
+    }
+    updated = UserRefreshToken.objects.filter(user=user, device_id=device_id).update(**values)
+    if not updated:
+        UserRefreshToken.objects.create(user=user, device_id=device_id, **values)
+    return raw_token
+
+
+def _rotate_refresh_token(raw_token, payload):
+    """
+    提示された refresh トークンを1回の条件付き UPDATE で次のトークンに差し替える。
+    既に差し替え済みのトークンが再提示された場合はファミリーごと失効させる。
+    戻り値は (新しい raw token, user_id)。失敗時は (None, None)。
+    """
+    user_id = payload.get("sub")
+    if not user_id:
+        return None, None
+    family_id = payload.get("fam") or ""
+    next_token, next_jti, now, exp = _issue_refresh_payload(user_id, family_id)
+    rotated = UserRefreshToken.objects.filter(
+        user_id=user_id,
         token_hash=_hash_token(raw_token),
+        revoked_at__isnull=True,
+        expires_at__gt=now,
+    ).update(
+        token_hash=_hash_token(next_token),
+        jti=next_jti,
+        rotated_at=now,
         expires_at=exp,
     )
-    return raw_token
+    _revoked_refresh_jtis.add(payload.get("jti"), payload.get("exp"))
+    if rotated:
+        return next_token, user_id
+
+    _revoke_refresh_family(user_id, family_id)
+    return None, None
+
+
+def _revoke_refresh_family(user_id, family_id):
+    """旧トークンの再利用（盗用の可能性）: 同じファミリーの現行トークンも失効させる"""
+    if not user_id or not family_id:
+        return
+    UserRefreshToken.objects.filter(
+        user_id=user_id,
+        family_id=family_id,
+        revoked_at__isnull=True,
+    ).update(revoked_at=timezone.now())
 
 
 def _get_user_from_access_token(request):
+    """
+    アクセストークンから利用者を取得する。結果はリクエストに保持し、
+    /api/batch/ のサブリクエスト間でも共有する（JWT 検証と User 取得は1回）。
+    """
+    cached = getattr(request, "_access_token_auth", None)
+    if cached is None:
+        cached = _resolve_access_token(request)
+        request._access_token_auth = cached
+    return cached
+
+
+def _resolve_access_token(request):
     raw_token = _extract_bearer_token(request)
     if not raw_token:
         return None, _json_error("Authorization token is required.", status=401)
@@ -787,7 +714,7 @@ def api_user_create(request):
         return _json_error("Email already exists.", status=400)
 
     user = User.objects.create(username=username, email=email, password=password)
-    _ensure_user_rank(user)
+    ensure_user_rank(user)
     return JsonResponse(_serialize_user(user), status=201)
 
 
@@ -807,9 +734,9 @@ def api_login(request):
     if not user or not _verify_password(password, user.password, user):
         return _json_error("Email address or password is incorrect.", status=401)
 
-    _ensure_user_rank(user)
+    ensure_user_rank(user)
     access = _create_access_token(user)
-    refresh = _create_refresh_token(user)
+    refresh = _create_refresh_token(user, device_id=data.get("device_id") if data else None)
     return JsonResponse({"user": _serialize_user(user), "access": access, "refresh": refresh})
 
 
@@ -830,18 +757,17 @@ def api_token_refresh(request):
         return _json_error("Invalid token.", status=401)
     if payload.get("type") != "refresh":
         return _json_error("Invalid token type.", status=401)
-    token_hash = _hash_token(refresh)
-    token_obj = (
-        UserRefreshToken.objects.select_related("user", "user__rank")
-        .filter(token_hash=token_hash, revoked_at__isnull=True)
-        .first()
-    )
-    if not token_obj:
+    if payload.get("jti") in _revoked_refresh_jtis:
+        # 既知の失効トークン: DB を読まずに拒否し、念のためファミリーを失効させる
+        _revoke_refresh_family(payload.get("sub"), payload.get("fam"))
         return _json_error("Invalid token.", status=401)
-    if token_obj.expires_at and token_obj.expires_at <= timezone.now():
-        return _json_error("Token has expired.", status=401)
-    access = _create_access_token(token_obj.user)
-    return JsonResponse({"access": access})
+    next_refresh, user_id = _rotate_refresh_token(refresh, payload)
+    if not next_refresh:
+        return _json_error("Invalid token.", status=401)
+    # access トークンの発行に必要なのは user_id だけなので User は読まない
+    user_ref = User(user_id=int(user_id))
+    access = _create_access_token(user_ref)
+    return JsonResponse({"access": access, "refresh": next_refresh})
 
 
 @csrf_exempt
@@ -853,24 +779,104 @@ def api_logout(request):
     refresh = data.get("refresh") if data else None
     if not refresh:
         return _json_error("refresh is required.", status=400)
-    token_hash = _hash_token(refresh)
-    token_obj = UserRefreshToken.objects.filter(token_hash=token_hash, revoked_at__isnull=True).first()
-    if not token_obj:
+    revoked = UserRefreshToken.objects.filter(
+        token_hash=_hash_token(refresh),
+        revoked_at__isnull=True,
+    ).update(revoked_at=timezone.now())
+    if not revoked:
         return _json_error("Invalid token.", status=401)
-    token_obj.revoked_at = timezone.now()
-    token_obj.save(update_fields=["revoked_at"])
+    try:
+        payload = jwt.decode(refresh, options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        payload = {}
+    _revoked_refresh_jtis.add(payload.get("jti"), payload.get("exp"))
     return JsonResponse({"detail": "Logged out."})
 
 
+def _batch_memo(request, key, factory):
+    """/api/batch/ 内では同じ計算（ランク再計算など）を1回にまとめる。単発リクエストでは素通し。"""
+    memo = getattr(request, "batch_memo", None)
+    if memo is None:
+        return factory()
+    if key not in memo:
+        memo[key] = factory()
+    return memo[key]
+
+
 @require_http_methods(["GET"])
 def api_me(request):
     user, error = _get_user_from_access_token(request)
     if error:
         return error
-    _ensure_user_rank(user)
+    _batch_memo(request, ("rank", user.user_id), lambda: ensure_user_rank(user))
     return JsonResponse(_serialize_user(user))
 
 
+# クリア・スタンプの判定条件（単発・一括送信で共通）
+CLEAR_GEOFENCE_M = 50
+DAILY_CLEAR_LIMIT = 5
+STAMP_COOLDOWN = datetime.timedelta(hours=4)
+
+
+def _store_clear_activity(challenge, cleared_at, attempts_delta, cleared_delta, new_participant, first_visit):
+    """
+    クリアの店舗の日別集計への加算分と、オーナーの統計画面への通知の組。
+    画面側はこの差分で参加者数・クリア率・ランキングを更新する。利用者を特定できる情報は含めない。
+    """
+    activity = (
+        challenge.store_id,
+        cleared_at,
+        challenge.challenge_id,
+        {
+            "clears": 1,
+            "attempts": attempts_delta,
+            "cleared": cleared_delta,
+            "new_participants": int(new_participant),
+            "unique_users": int(first_visit),
+        },
+    )
+    event = (
+        "challenge_cleared",
+        {
+            "store_id": challenge.store_id,
+            "challenge_id": challenge.challenge_id,
+            "challenge_title": challenge.title,
+            "cleared_at": cleared_at.isoformat(),
+            "attempts_delta": attempts_delta,
+            "cleared_delta": cleared_delta,
+            "new_participant": new_participant,
+        },
+        None,
+        challenge.store_id,
+    )
+    return activity, event
+
+
+def _store_stamp_activity(store_id, stamped_at, first_visit):
+    """スタンプの店舗の日別集計への加算分と、オーナーの統計画面への通知の組。"""
+    activity = (store_id, stamped_at, None, {"stamps": 1, "unique_users": int(first_visit)})
+    event = (
+        "stamp_scanned",
+        {
+            "store_id": store_id,
+            "stamped_at": stamped_at.isoformat(),
+            "stamp_date": timezone.localdate(stamped_at).isoformat(),
+        },
+        None,
+        store_id,
+    )
+    return activity, event
+
+
+def _record_store_activities(pairs, events=()):
+    """
+    (集計, 通知) の組をまとめて店舗の集計に加算し、通知を発行する（events は先に発行する他の通知）。
+    件数によらずクエリ数は一定。
+    """
+    record_store_activities([activity for activity, _ in pairs])
+    publish_many([*events, *[event for _, event in pairs]])
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_user_challenge_clear(request):
@@ -908,13 +914,13 @@ def api_user_challenge_clear(request):
         return _json_error("Challenge store is not set.", status=400)
     if challenge.store.latitude is None or challenge.store.longitude is None:
         return _json_error("Store location is not set.", status=400)
-    distance_m = _haversine_km(
+    distance_m = haversine_km(
         lat,
         lon,
         float(challenge.store.latitude),
         float(challenge.store.longitude),
     ) * 1000
-    if distance_m > 50:
+    if distance_m > CLEAR_GEOFENCE_M:
         return _json_error("User is not within 50m of the store.", status=400)
 
     today = timezone.localdate()
@@ -932,60 +938,75 @@ def api_user_challenge_clear(request):
         status="cleared",
         cleared_at__date=today,
     ).count()
-    if daily_cleared_count >= 5:
+    if daily_cleared_count >= DAILY_CLEAR_LIMIT:
         return _json_error("Daily clear limit reached.", status=400)
 
     now = timezone.now()
-    user_challenge, created = UserChallenge.objects.get_or_create(
-        user=user,
-        challenge=challenge,
-        defaults={
-            "status": "cleared",
-            "cleared_at": now,
-        },
-    )
-    if not created:
-        user_challenge.status = "cleared"
-        user_challenge.cleared_at = now
-        user_challenge.save(update_fields=["status", "cleared_at"])
+    with transaction.atomic():
+        first_visit = is_first_visit(user.user_id, challenge.store_id, now)
+        user_challenge, created = UserChallenge.objects.get_or_create(
+            user=user,
+            challenge=challenge,
+            defaults={
+                "status": "cleared",
+                "cleared_at": now,
+            },
+        )
+        newly_cleared = created or user_challenge.status != "cleared"
+        if not created:
+            user_challenge.status = "cleared"
+            user_challenge.cleared_at = now
+            user_challenge.save(update_fields=["status", "cleared_at"])
+        new_participant = (
+            newly_cleared
+            and not UserChallenge.objects.filter(user=user, challenge__store_id=challenge.store_id, status="cleared")
+            .exclude(pk=user_challenge.pk)
+            .exists()
+        )
+        _record_store_activities(
+            [_store_clear_activity(challenge, now, int(created), int(newly_cleared), new_participant, first_visit)]
+        )
 
-    previous_rank = user.rank
-    previous_rank_index = _rank_index(previous_rank)
-    _ensure_user_rank(user)
-    current_rank = user.rank
-    current_rank_index = _rank_index(current_rank)
-    rank_multiplier = _rank_multiplier(current_rank)
-    rank_up = current_rank_index > previous_rank_index
-
-    reward_points_awarded = 0
-    reward_coupon = None
-    reward_granted = False
-    if challenge.reward_type == "points":
-        if challenge.reward_points:
-            reward_points_awarded = int(round(challenge.reward_points * rank_multiplier))
-            user.points = (user.points or 0) + reward_points_awarded
-            user.save(update_fields=["points"])
+        previous_rank = user.rank
+        previous_rank_index = rank_index(previous_rank)
+        ensure_user_rank(user)
+        current_rank = user.rank
+        current_rank_index = rank_index(current_rank)
+        multiplier = rank_multiplier(current_rank)
+        rank_up = current_rank_index > previous_rank_index
+
+        reward_points_awarded = 0
+        reward_coupon = None
+        reward_granted = False
+        if challenge.reward_type == "points":
+            if challenge.reward_points:
+                reward_points_awarded = int(round(challenge.reward_points * multiplier))
+                earn_points(user, reward_points_awarded, challenge=challenge)
+                reward_granted = True
+        elif challenge.reward_type == "coupon" and challenge.reward_coupon_id:
+            reward_coupon = challenge.reward_coupon
+            user_coupon, created_coupon = UserCoupon.objects.get_or_create(
+                user=user,
+                coupon=reward_coupon,
+                defaults={"is_used": False, "used_at": None},
+            )
+            reward_granted = created_coupon
+        elif challenge.reward_type == "service":
             reward_granted = True
-    elif challenge.reward_type == "coupon" and challenge.reward_coupon_id:
-        reward_coupon = challenge.reward_coupon
-        user_coupon, created_coupon = UserCoupon.objects.get_or_create(
-            user=user,
-            coupon=reward_coupon,
-            defaults={"is_used": False, "used_at": None},
+
+        reward_detail = challenge.reward_detail or ""
+        if not reward_detail and reward_coupon:
+            reward_detail = reward_coupon.title
+
+        # バッジ判定はワーカーで行い、結果は /api/user-badges/pending/ で受け取る
+        enqueue_task(
+            "award_badges",
+            {
+                "user_id": user.user_id,
+                "cleared_at": user_challenge.cleared_at.isoformat() if user_challenge.cleared_at else None,
+                "store_id": challenge.store_id,
+            },
         )
-        reward_granted = created_coupon
-    elif challenge.reward_type == "service":
-        reward_granted = True
-
-    reward_detail = challenge.reward_detail or ""
-    if not reward_detail and reward_coupon:
-        reward_detail = reward_coupon.title
-
-    new_badges = _award_badges_for_user(
-        user,
-        cleared_at=user_challenge.cleared_at,
-        store_id=challenge.store_id,
-    )
 
     response = {
         "user_challenge_id": user_challenge.user_challenge_id,
@@ -1001,11 +1022,12 @@ def api_user_challenge_clear(request):
         "user_points": user.points,
         "rank": current_rank.name if current_rank else None,
         "rank_id": current_rank.rank_id if current_rank else None,
-        "rank_multiplier": rank_multiplier,
+        "rank_multiplier": multiplier,
         "previous_rank": previous_rank.name if previous_rank else None,
         "previous_rank_id": previous_rank.rank_id if previous_rank else None,
         "rank_up": rank_up,
-        "new_badges": new_badges,
+        "new_badges": [],
+        "badges_pending": True,
     }
     return JsonResponse(response, status=201 if created else 200)
 
@@ -1039,34 +1061,43 @@ def api_user_coupon_use(request):
         if not coupon.store_id or coupon.store_id != store.store_id:
             return _json_error("Coupon is not valid for this store.", status=400)
 
-    user_coupon = UserCoupon.objects.filter(user=user, coupon=coupon).first()
-    if not user_coupon:
-        return _json_error("Coupon is not owned by user.", status=404)
-    if user_coupon.is_used:
-        return _json_error("Coupon already used.", status=400)
-
     now = timezone.now()
-    user_coupon.is_used = True
-    user_coupon.used_at = now
-    user_coupon.save(update_fields=["is_used", "used_at"])
-
-    UserCouponUsageHistory.objects.create(
-        user=user,
-        coupon=coupon,
-        store=store,
-        coupon_type=coupon.type,
-        used_at=now,
-    )
-    StoreCouponUsageHistory.objects.create(
-        store=store,
-        user=user,
-        coupon=coupon,
-        coupon_type=coupon.type,
-        used_at=now,
+    with transaction.atomic():
+        # is_used=False を条件にした1回の UPDATE で二重利用を防ぐ
+        redeemed = UserCoupon.objects.filter(user=user, coupon=coupon, is_used=False).update(
+            is_used=True,
+            used_at=now,
+        )
+        if not redeemed:
+            if UserCoupon.objects.filter(user=user, coupon=coupon).exists():
+                return _json_error("Coupon already used.", status=400)
+            return _json_error("Coupon is not owned by user.", status=404)
+        CouponUsageHistory.objects.create(
+            user=user,
+            coupon=coupon,
+            store=store,
+            coupon_type=coupon.type,
+            used_at=now,
+        )
+        record_store_activity(store.store_id, now, redemptions=1)
+        publish_event(
+            "coupon_redeemed",
+            {
+                "store_id": store.store_id,
+                "coupon_id": coupon.coupon_id,
+                "coupon_title": coupon.title,
+                "used_at": now.isoformat(),
+            },
+            store_id=store.store_id,
+        )
+    user_coupon_id = (
+        UserCoupon.objects.filter(user=user, coupon=coupon)
+        .values_list("user_coupon_id", flat=True)
+        .first()
     )
 
     response = {
-        "user_coupon_id": user_coupon.user_coupon_id,
+        "user_coupon_id": user_coupon_id,
         "coupon_id": coupon.coupon_id,
         "coupon_title": coupon.title,
         "coupon_type": coupon.type,
@@ -1077,13 +1108,75 @@ def api_user_coupon_use(request):
     return JsonResponse(response)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_coupon_exchange(request):
+    """
+    ポイントでクーポンを交換する。
+    POST /api/coupons/exchange/ {"coupon_id": ..}
+    """
+    user, error = _get_user_from_access_token(request)
+    if error:
+        return error
+    data, error = _get_request_data(request)
+    if error:
+        return error
+
+    coupon_id = data.get("coupon_id") if data else None
+    if not coupon_id:
+        return _json_error("coupon_id is required.", status=400)
+    try:
+        coupon_id = int(coupon_id)
+    except (TypeError, ValueError):
+        return _json_error("coupon_id must be an integer.", status=400)
+
+    coupon = (
+        Coupon.objects.select_related("store")
+        .filter(pk=coupon_id, publish_to_shop=True)
+        .filter(Q(store__isnull=True) | Q(store__status="approved"))
+        .first()
+    )
+    if not coupon:
+        return _json_error("Coupon not found.", status=404)
+    now = timezone.now()
+    if coupon.expires_at and coupon.expires_at <= now:
+        return _json_error("Coupon has expired.", status=400)
+    if not coupon.required_points or coupon.required_points < 1:
+        return _json_error("Coupon cannot be exchanged for points.", status=400)
+
+    try:
+        with transaction.atomic():
+            # 同じ利用者の交換が並行しても、所持の確認から付与までを利用者の行のロックで直列にする
+            user = User.objects.select_for_update().get(pk=user.pk)
+            if UserCoupon.objects.filter(user=user, coupon=coupon).exists():
+                return _json_error("Coupon already owned.", status=400)
+            spend_points(user, coupon.required_points, coupon=coupon, note="coupon exchange")
+            user_coupon = UserCoupon.objects.create(user=user, coupon=coupon)
+    except InsufficientPoints:
+        return _json_error("Not enough points.", status=400)
+
+    return JsonResponse(
+        {
+            "user_coupon_id": user_coupon.user_coupon_id,
+            "coupon_id": coupon.coupon_id,
+            "coupon_title": coupon.title,
+            "coupon_type": coupon.type,
+            "store_id": coupon.store_id,
+            "store_name": coupon.store.name if coupon.store else "",
+            "spent_points": coupon.required_points,
+            "user_points": user.points,
+        },
+        status=201,
+    )
+
+
 @require_http_methods(["GET"])
 def api_user_coupon_history(request):
     user, error = _get_user_from_access_token(request)
     if error:
         return error
     history = (
-        UserCouponUsageHistory.objects.select_related("coupon", "store")
+        CouponUsageHistory.objects.select_related("coupon", "store")
         .filter(user=user)
         .order_by("-used_at")
     )
@@ -1114,10 +1207,67 @@ def api_user_badges(request):
     )
     results = []
     for entry in entries:
-        results.append(_serialize_badge(entry.badge, awarded_at=entry.awarded_at))
+        results.append(serialize_badge(entry.badge, awarded_at=entry.awarded_at))
+    return JsonResponse(results, safe=False)
+
+
+@require_http_methods(["GET"])
+def api_user_badges_pending(request):
+    """
+    まだ端末へ返していない獲得バッジを返し、通知済みにする。
+    クリア・スタンプ後のバッジ判定はワーカーで行うため、アプリはこれで獲得を知る。
+    """
+    user, error = _get_user_from_access_token(request)
+    if error:
+        return error
+    entries = list(
+        UserBadge.objects.select_related("badge")
+        .filter(user=user, notified_at__isnull=True)
+        .order_by("awarded_at")
+    )
+    if entries:
+        UserBadge.objects.filter(
+            id__in=[entry.id for entry in entries],
+            notified_at__isnull=True,
+        ).update(notified_at=timezone.now())
+    results = [serialize_badge(entry.badge, awarded_at=entry.awarded_at) for entry in entries]
     return JsonResponse(results, safe=False)
 
 
+@require_http_methods(["GET"])
+async def api_events(request):
+    """
+    バッジ獲得・ランク変更・クーポン付与・お知らせ公開を SSE（text/event-stream）で配信する。
+    GET /api/events/  （Authorization: Bearer <access>）
+
+    ASGI で動かすこと。WSGI では接続を閉じるまで何も送られずワーカーも占有するため、503 を返して
+    クライアントにポーリングへ切り替えさせる。
+    再接続時は Last-Event-ID ヘッダー（または ?last_event_id=）より後のイベントを先に送る。
+    一定時間ごとにコメント行のハートビートを送り、EVENT_STREAM_MAX_SECONDS で接続を閉じる。
+    """
+    if not isinstance(request, ASGIRequest):
+        return _json_error("Event stream requires an ASGI server.", status=503)
+    user, error = await sync_to_async(_get_user_from_access_token)(request)
+    if error:
+        return error
+    last_event_id, error = _parse_int_param(
+        request.headers.get("Last-Event-ID") or request.GET.get("last_event_id"),
+        "last_event_id",
+        None,
+        0,
+        2**63 - 1,
+    )
+    if error:
+        return error
+    response = StreamingHttpResponse(
+        event_stream([user_channel(user.user_id)], last_event_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_user_inquiry_create(request):
@@ -1184,7 +1334,7 @@ def api_store_coupon_history(request):
     except (TypeError, ValueError):
         return _json_error("store_id must be an integer.", status=400)
     history = (
-        StoreCouponUsageHistory.objects.select_related("coupon", "user", "store")
+        CouponUsageHistory.objects.select_related("coupon", "user", "store")
         .filter(store_id=store_id)
         .order_by("-used_at")
     )
@@ -1205,14 +1355,54 @@ def api_store_coupon_history(request):
     return JsonResponse(results, safe=False)
 
 
+def _serialize_public_store(store, distance_km=None):
+    tags = [st.tag.name for st in store.storetag_set.all() if st.tag]
+    return {
+        "id": store.store_id,
+        "name": store.name,
+        "description": store.store_description or "",
+        "lat": float(store.latitude) if store.latitude is not None else None,
+        "lon": float(store.longitude) if store.longitude is not None else None,
+        "distance": distance_km,  # km
+        "tags": tags,
+        "main_image": store.main_image or "",
+        "phone": store.phone or "",
+        "website": store.website or "",
+        "instagram": store.instagram or "",
+        "business_hours": store.business_hours or "",
+        "business_hours_json": store.business_hours_json or {},
+        "is_featured": store.is_featured,
+        "priority": store.priority,
+        "updated_at": store.updated_at.isoformat() if store.updated_at else None,
+    }
+
+
+STORE_LIST_IN_FILTER_LIMIT = 10000
+
+
 def public_store_list(request):
     """
     公開用 店舗一覧API
-    GET /api/stores?lat=..&lon=..
+    GET /api/stores?lat=..&lon=..&radius_km=..&tags=カフェ,ラーメン&match=all&open_at=now&facets=1
+    radius_km は lat/lon から半径何 km 以内か（lat/lon があるときだけ有効）。
+    tags はタグ名または tag_id のカンマ区切り（match=all はすべて持つ店舗、any はいずれかを持つ店舗）。
+    open_at は now または ISO 8601 の日時で、その時刻に営業中の店舗だけにする。
+    facets=1 のときは {"results": [...], "facets": [{"tag_id", "name", "count"}, ...]} で返し、
+    facets は絞り込み後の店舗のうち各タグを持つ店舗数。
     """
     auth_error = _require_phone_api_key(request)
     if auth_error:
         return auth_error
+    tag_values = [value for value in (request.GET.get("tags") or "").split(",") if value.strip()]
+    match = request.GET.get("match") or "all"
+    if match not in {"all", "any"}:
+        return JsonResponse({"detail": "match は all または any で指定してください。"}, status=400)
+    with_facets = request.GET.get("facets") in {"1", "true"}
+    open_minute = None
+    if request.GET.get("open_at"):
+        open_minute = parse_open_at(request.GET["open_at"])
+        if open_minute is None:
+            return JsonResponse({"detail": "open_at は now または ISO 8601 形式の日時で指定してください。"}, status=400)
     user_lat = request.GET.get("lat")
     user_lon = request.GET.get("lon")
     lat_lon_provided = user_lat is not None and user_lon is not None
@@ -1225,19 +1415,53 @@ def public_store_list(request):
             return JsonResponse({"detail": "lat/lon は数値で指定してください。"}, status=400)
     else:
         user_lat_f = user_lon_f = None
+    radius_km = None
+    if lat_lon_provided and request.GET.get("radius_km") not in (None, ""):
+        try:
+            radius_km = min(max(float(request.GET["radius_km"]), 0.1), 50.0)
+        except ValueError:
+            return JsonResponse({"detail": "radius_km は数値で指定してください。"}, status=400)
 
     stores = (
         Store.objects.filter(status="approved")
         .prefetch_related("storetag_set__tag")
         .order_by("-created_at")
     )
+    if radius_km is not None:
+        # 緯度経度の範囲で DB 側で粗く絞り、正確な距離は下で確かめる
+        lat_delta = radius_km / 111.0
+        lon_delta = radius_km / (111.0 * max(math.cos(math.radians(user_lat_f)), 0.01))
+        stores = stores.filter(
+            latitude__range=(user_lat_f - lat_delta, user_lat_f + lat_delta),
+            longitude__range=(user_lon_f - lon_delta, user_lon_f + lon_delta),
+        )
+
+    # タグと営業時間の条件は、メモリ上の索引で店舗のビットマップにしてから DB に渡す
+    tag_index = get_tag_index() if tag_values or with_facets else None
+    matched = None
+    if tag_values:
+        matched = tag_index.match([tag_index.lookup(value) for value in tag_values], match_all=match == "all")
+    if open_minute is not None:
+        open_stores = store_bitmap(get_hours_index().open_store_ids(open_minute))
+        matched = open_stores if matched is None else matched & open_stores
+    matched_ids = None
+    if matched is not None:
+        matched_ids = bitmap_store_ids(matched)
+        # IN 句の変数の上限（SQLite は 32766）を超えそうなときは読み込みながら絞る
+        if len(matched_ids) <= STORE_LIST_IN_FILTER_LIMIT:
+            stores = stores.filter(store_id__in=matched_ids)
+            matched_ids = None
+        else:
+            matched_ids = set(matched_ids)
 
     results = []
     for store in stores:
+        if matched_ids is not None and store.store_id not in matched_ids:
+            continue
         distance_km = None
         if lat_lon_provided and store.latitude is not None and store.longitude is not None:
             distance_km = round(
-                _haversine_km(
+                haversine_km(
                     user_lat_f,
                     user_lon_f,
                     float(store.latitude),
@@ -1245,52 +1469,279 @@ def public_store_list(request):
                 ),
                 3,
             )
+            if radius_km is not None and distance_km > radius_km:
+                continue
 
-        tags = [st.tag.name for st in store.storetag_set.all() if st.tag]
+        results.append(_serialize_public_store(store, distance_km=distance_km))
 
-        results.append(
+    if with_facets:
+        if radius_km is not None:
+            # 件数も半径内の店舗で数える
+            matched = store_bitmap(row["id"] for row in results)
+        return JsonResponse({"results": results, "facets": tag_index.facets(tag_index.stores if matched is None else matched)})
+    return JsonResponse(results, safe=False)
+
+
+@require_http_methods(["GET"])
+def public_store_clusters(request):
+    """
+    地図の縮小表示用 店舗クラスタAPI
+    GET /api/stores/clusters/?bbox=西経度,南緯度,東経度,北緯度&zoom=..
+    ズームごとのマス目（64px 四方）でまとめた {lat, lon（重心）, count, store_id（代表店舗）} を返す。
+    件数は画面の広さで決まり、店舗数には比例しない。1件のクラスタは store_id の店舗そのもの。
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    try:
+        west, south, east, north = (float(value) for value in (request.GET.get("bbox") or "").split(","))
+    except ValueError:
+        return JsonResponse({"detail": "bbox は 西経度,南緯度,東経度,北緯度 の数値で指定してください。"}, status=400)
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        return JsonResponse({"detail": "bbox の範囲が正しくありません。"}, status=400)
+    try:
+        zoom = int(request.GET.get("zoom", ""))
+    except ValueError:
+        return JsonResponse({"detail": "zoom は整数で指定してください。"}, status=400)
+    zoom = min(max(zoom, 0), CLUSTER_MAX_ZOOM)
+
+    try:
+        clusters = get_store_clusters().query(zoom, south, west, north, east)
+    except ValueError:
+        return JsonResponse(
+            {"detail": f"bbox が広すぎます（zoom に対して {CLUSTER_MAX_CELLS} マスまで）。"},
+            status=400,
+        )
+    return JsonResponse({"zoom": zoom, "clusters": clusters})
+
+
+def _store_tile_public(zoom, x, y):
+    """
+    タイル内の公開中の店舗の要約（JSON の本文と ETag）。タイル単位でキャッシュし、
+    店舗・タグの更新時に signals で、その店舗を含むタイルだけを無効化する。
+    """
+    key = store_tile_key(zoom, x, y)
+    tile = cache.get(key)
+    if tile is not None:
+        return tile
+
+    south, west, north, east = tile_bounds(zoom, x, y)
+    stores = (
+        Store.objects.filter(
+            status="approved",
+            latitude__range=(south, north),
+            longitude__range=(west, east),
+        )
+        .prefetch_related("storetag_set__tag")
+        .order_by("store_id")
+    )
+    summaries = []
+    for store in stores:
+        lat, lon = float(store.latitude), float(store.longitude)
+        # 境界上の店舗は隣のタイルと重ならないよう、tile_of で決まるタイルにだけ入れる
+        if tile_of(lat, lon, zoom) != (x, y):
+            continue
+        summaries.append(
             {
                 "id": store.store_id,
                 "name": store.name,
-                "description": store.store_description or "",
-                "lat": float(store.latitude) if store.latitude is not None else None,
-                "lon": float(store.longitude) if store.longitude is not None else None,
-                "distance": distance_km,  # km
-                "tags": tags,
+                "lat": round(lat, 6),
+                "lon": round(lon, 6),
+                "tags": [st.tag.name for st in store.storetag_set.all() if st.tag],
                 "main_image": store.main_image or "",
-                "phone": store.phone or "",
-                "website": store.website or "",
-                "instagram": store.instagram or "",
-                "business_hours": store.business_hours or "",
-                "business_hours_json": store.business_hours_json or {},
                 "is_featured": store.is_featured,
                 "priority": store.priority,
-                "updated_at": store.updated_at.isoformat() if store.updated_at else None,
             }
         )
-
-    return JsonResponse(results, safe=False)
+    body = json.dumps(
+        {"z": zoom, "x": x, "y": y, "stores": summaries},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    tile = {"body": body, "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"'}
+    cache.set(key, tile, store_tile_cache_seconds())
+    return tile
 
 
-def public_coupon_list(request):
+@require_http_methods(["GET"])
+def public_store_tile(request, zoom, x, y):
     """
-    Public coupon list API.
-    GET /api/coupons?store_id=..&type=..
+    地図タイル単位の店舗要約API（Web メルカトルのタイル番号）
+    GET /api/stores/tiles/<z>/<x>/<y>/
+    利用者や現在地に依存しないため CDN で共有でき、期限切れ後は強い ETag（本文の SHA-256）で再検証できる。
+    近くの店舗は、アプリが画面に重なるタイルを集めて組み立てる。
     """
     auth_error = _require_phone_api_key(request)
     if auth_error:
         return auth_error
-    store_id = request.GET.get("store_id")
-    coupon_type = request.GET.get("type")
+    if not (STORE_TILE_MIN_ZOOM <= zoom <= STORE_TILE_MAX_ZOOM) or x >= (1 << zoom) or y >= (1 << zoom):
+        return JsonResponse(
+            {"detail": f"z は {STORE_TILE_MIN_ZOOM}〜{STORE_TILE_MAX_ZOOM}、x / y はそのズームのタイル番号で指定してください。"},
+            status=400,
+        )
 
-    queryset = Coupon.objects.select_related("store").filter(publish_to_shop=True)
-    if coupon_type in {"common", "store_specific"}:
-        queryset = queryset.filter(type=coupon_type)
+    tile = _store_tile_public(zoom, x, y)
+    response = get_conditional_response(request, etag=tile["etag"])
+    if response is None:
+        response = HttpResponse(tile["body"], content_type="application/json")
+    response["ETag"] = tile["etag"]
+    cdn_max_age = getattr(settings, "STORE_TILE_CDN_MAX_AGE", 300)
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=getattr(settings, "STORE_TILE_MAX_AGE", 60),
+        s_maxage=cdn_max_age,
+        stale_while_revalidate=cdn_max_age,
+    )
+    return response
 
-    if store_id:
-        try:
-            store_id_int = int(store_id)
-        except (TypeError, ValueError):
+
+def _cached_store_summaries(store_ids):
+    """
+    店舗 ID の順に公開用の要約を返す（非公開・削除済みの店舗は含めない）。
+    要約は店舗ごとにキャッシュし、足りない分だけ DB から読む（店舗・タグの更新時に signals で消す）。
+    """
+    cached = cache.get_many([store_summary_key(store_id) for store_id in store_ids])
+    summaries = {store_id: cached[store_summary_key(store_id)] for store_id in store_ids if store_summary_key(store_id) in cached}
+    missing = [store_id for store_id in store_ids if store_id not in summaries]
+    if missing:
+        stores = Store.objects.filter(status="approved", store_id__in=missing).prefetch_related("storetag_set__tag")
+        loaded = {store.store_id: _serialize_public_store(store) for store in stores}
+        cache.set_many(
+            {store_summary_key(store_id): summary for store_id, summary in loaded.items()},
+            getattr(settings, "STORE_FEED_CACHE_SECONDS", 300),
+        )
+        summaries.update(loaded)
+    return [summaries[store_id] for store_id in store_ids if store_id in summaries]
+
+
+@require_http_methods(["GET"])
+def public_store_feed(request):
+    """
+    ホームのおすすめ順 店舗一覧API
+    GET /api/stores/feed/?lat=..&lon=..&limit=20&offset=0
+    現在地のマスについて、おすすめ・優先度・距離・最近の活動から前もって並べた店舗 ID（StoreFeed）を切り出し、
+    店舗の要約をキャッシュから埋めて返す。distance は現在地からの km。
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    if request.GET.get("lat") in (None, "") or request.GET.get("lon") in (None, ""):
+        return _json_error("lat and lon are required.", status=400)
+    lat, error = _parse_float_param(request.GET.get("lat"), "lat")
+    if error:
+        return error
+    lon, error = _parse_float_param(request.GET.get("lon"), "lon")
+    if error:
+        return error
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return _json_error("lat/lon is out of range.", status=400)
+    limit, error = _parse_int_param(request.GET.get("limit"), "limit", 20, 1, 100)
+    if error:
+        return error
+    offset, error = _parse_int_param(request.GET.get("offset"), "offset", 0, 0, 10000)
+    if error:
+        return error
+
+    (x, y), store_ids = get_feed(lat, lon)
+    results = [
+        {**summary, "distance": round(haversine_km(lat, lon, summary["lat"], summary["lon"]), 3)}
+        for summary in _cached_store_summaries(store_ids[offset:offset + limit])
+    ]
+    return JsonResponse(
+        {"results": results, "count": len(store_ids), "limit": limit, "offset": offset, "cell": f"{x}/{y}"}
+    )
+
+
+RECOMMENDATION_DEFAULT_RADIUS_KM = 10.0
+
+
+@require_http_methods(["GET"])
+def api_recommendations(request):
+    """
+    おすすめ店舗API（要ログイン）
+    GET /api/recommendations/?lat=..&lon=..&radius_km=10&limit=20
+    夜間バッチで作った店舗ごとの近傍（StoreRecommendation）のうち、利用者の最近の店舗の分だけを読んでまとめる。
+    lat/lon があれば radius_km 以内の店舗だけにする。来たことのある店舗は含めない。
+    """
+    user, error = _get_user_from_access_token(request)
+    if error:
+        return error
+    lat = lon = None
+    if request.GET.get("lat") is not None and request.GET.get("lon") is not None:
+        lat, error = _parse_float_param(request.GET.get("lat"), "lat")
+        if error:
+            return error
+        lon, error = _parse_float_param(request.GET.get("lon"), "lon")
+        if error:
+            return error
+    radius_km = RECOMMENDATION_DEFAULT_RADIUS_KM
+    if request.GET.get("radius_km") not in (None, ""):
+        radius_km, error = _parse_float_param(request.GET.get("radius_km"), "radius_km")
+        if error:
+            return error
+        radius_km = min(max(radius_km, 0.1), 50.0)
+    limit, error = _parse_int_param(request.GET.get("limit"), "limit", 20, 1, 50)
+    if error:
+        return error
+
+    # 公開中かどうかと位置は店舗の位置の索引（store_map）で確かめる
+    positions = get_store_clusters().positions
+
+    def accept(store_id):
+        position = positions.get(store_id)
+        return position is not None and (lat is None or haversine_km(lat, lon, *position) <= radius_km)
+
+    ranked, based_on = recommend(user.user_id, accept)
+    ranked = ranked[:limit]
+    stores = (
+        Store.objects.filter(status="approved")
+        .prefetch_related("storetag_set__tag")
+        .in_bulk([store_id for store_id, _ in ranked])
+    )
+    results = []
+    for store_id, score in ranked:
+        store = stores.get(store_id)
+        if store is None:
+            continue
+        distance_km = round(haversine_km(lat, lon, *positions[store_id]), 3) if lat is not None else None
+        results.append({**_serialize_public_store(store, distance_km=distance_km), "score": round(score, 4)})
+    return JsonResponse({"results": results, "based_on": based_on})
+
+
+def _serialize_public_coupon(coupon):
+    store = coupon.store
+    return {
+        "coupon_id": coupon.coupon_id,
+        "title": coupon.title,
+        "description": coupon.description or "",
+        "required_points": coupon.required_points,
+        "type": coupon.type,
+        "expires_at": coupon.expires_at.isoformat() if coupon.expires_at else None,
+        "store_id": coupon.store_id,
+        "store_name": store.name if store else "",
+    }
+
+
+def public_coupon_list(request):
+    """
+    Public coupon list API.
+    GET /api/coupons?store_id=..&type=..
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    store_id = request.GET.get("store_id")
+    coupon_type = request.GET.get("type")
+
+    queryset = Coupon.objects.select_related("store").filter(publish_to_shop=True)
+    if coupon_type in {"common", "store_specific"}:
+        queryset = queryset.filter(type=coupon_type)
+
+    if store_id:
+        try:
+            store_id_int = int(store_id)
+        except (TypeError, ValueError):
             return JsonResponse({"detail": "store_id は整数で指定してください。"}, status=400)
         queryset = queryset.filter(store_id=store_id_int)
 
@@ -1299,23 +1750,63 @@ def public_coupon_list(request):
         "-coupon_id",
     )
 
-    results = []
-    for coupon in queryset:
-        store = coupon.store
-        results.append(
+    results = [_serialize_public_coupon(coupon) for coupon in queryset]
+    return JsonResponse(results, safe=False)
+
+
+def _serialize_stamp_setting(setting, store, rewards):
+    return {
+        "exists": True,
+        "store_id": store.store_id,
+        "store_name": store.name,
+        "max_stamps": setting.max_stamps,
+        "rewards": [
             {
-                "coupon_id": coupon.coupon_id,
-                "title": coupon.title,
-                "description": coupon.description or "",
-                "required_points": coupon.required_points,
-                "type": coupon.type,
-                "expires_at": coupon.expires_at.isoformat() if coupon.expires_at else None,
-                "store_id": coupon.store_id,
-                "store_name": store.name if store else "",
+                "stamp_threshold": reward.stamp_threshold,
+                "reward_type": reward.reward_type,
+                "reward_coupon_id": reward.reward_coupon_id,
+                "reward_coupon_title": reward.reward_coupon.title if reward.reward_coupon else "",
+                "reward_service_desc": reward.reward_service_desc or "",
             }
+            for reward in rewards
+        ],
+    }
+
+
+def _stamp_program(store_id):
+    """
+    店舗のスタンプカードの要約。setting は公開用の設定（_serialize_stamp_setting、カードがなければ exists=False）、
+    rewards は 個数 -> 特典 の dict で、スキャン時の特典判定はこれを引くだけで済む。
+    店舗ごとにキャッシュし、スタンプ設定・特典・クーポン・店舗の更新時に signals で消す（invalidate_store_detail）。
+    """
+    key = stamp_program_key(store_id)
+    program = cache.get(key)
+    if program is not None:
+        return program
+
+    setting = StoreStampSetting.objects.select_related("store").filter(store_id=store_id).first()
+    if not setting:
+        program = {"setting": {"exists": False, "store_id": store_id}, "rewards": {}}
+    else:
+        serialized = _serialize_stamp_setting(
+            setting,
+            setting.store,
+            StoreStampReward.objects.filter(setting=setting).select_related("reward_coupon"),
         )
+        program = {
+            "setting": serialized,
+            "rewards": {reward["stamp_threshold"]: reward for reward in serialized["rewards"]},
+        }
+    cache.set(key, program, stamp_program_cache_seconds())
+    return program
 
-    return JsonResponse(results, safe=False)
+
+def _user_stamp_progress(user, store_id):
+    user_stamp = StoreStamp.objects.filter(user=user, store_id=store_id).first()
+    return {
+        "stamps_count": user_stamp.stamps_count if user_stamp else 0,
+        "reward_given": user_stamp.reward_given if user_stamp else False,
+    }
 
 
 @require_http_methods(["GET"])
@@ -1331,42 +1822,14 @@ def public_stamp_setting(request):
     except (TypeError, ValueError):
         return _json_error("store_id must be an integer.", status=400)
 
-    setting = (
-        StoreStampSetting.objects.select_related("store")
-        .prefetch_related("rewards", "rewards__reward_coupon")
-        .filter(store_id=store_id)
-        .first()
-    )
-    if not setting:
-        return JsonResponse({"exists": False, "store_id": store_id})
-
-    rewards = []
-    for reward in setting.rewards.all():
-        rewards.append(
-            {
-                "stamp_threshold": reward.stamp_threshold,
-                "reward_type": reward.reward_type,
-                "reward_coupon_id": reward.reward_coupon_id,
-                "reward_coupon_title": reward.reward_coupon.title if reward.reward_coupon else "",
-                "reward_service_desc": reward.reward_service_desc or "",
-            }
-        )
-
-    response = {
-        "exists": True,
-        "store_id": setting.store.store_id,
-        "store_name": setting.store.name,
-        "max_stamps": setting.max_stamps,
-        "rewards": rewards,
-    }
+    # キャッシュの値を書き換えないよう複製する
+    response = dict(_stamp_program(store_id)["setting"])
+    if not response["exists"]:
+        return JsonResponse(response)
 
     user, error = _get_user_from_access_token(request)
     if not error and user:
-        user_stamp = StoreStamp.objects.filter(user=user, store_id=store_id).first()
-        response["user_stamps"] = {
-            "stamps_count": user_stamp.stamps_count if user_stamp else 0,
-            "reward_given": user_stamp.reward_given if user_stamp else False,
-        }
+        response["user_stamps"] = _user_stamp_progress(user, store_id)
 
     return JsonResponse(response)
 
@@ -1396,8 +1859,8 @@ def api_store_stamp_scan(request):
     if store.qr_code != store_qr:
         return _json_error("Store QR does not match.", status=400)
 
-    setting = StoreStampSetting.objects.filter(store_id=store_id).first()
-    if not setting:
+    program = _stamp_program(store_id)
+    if not program["setting"]["exists"]:
         return _json_error("Stamp setting not found.", status=404)
 
     now = timezone.now()
@@ -1406,66 +1869,528 @@ def api_store_stamp_scan(request):
         .order_by("-stamped_at")
         .first()
     )
-    if last_stamp and (now - last_stamp.stamped_at).total_seconds() < 4 * 3600:
+    if last_stamp and now - last_stamp.stamped_at < STAMP_COOLDOWN:
         return _json_error("Already stamped within 4 hours.", status=400)
 
-    StoreStampHistory.objects.create(
-        user=user,
-        store=store,
-        stamp_date=timezone.localdate(),
-        stamped_at=now,
-    )
-    user_stamp, _ = StoreStamp.objects.get_or_create(user=user, store=store)
-    user_stamp.stamps_count = (user_stamp.stamps_count or 0) + 1
-    user_stamp.save(update_fields=["stamps_count"])
-
-    reward = (
-        StoreStampReward.objects.filter(setting=setting, stamp_threshold=user_stamp.stamps_count)
-        .select_related("reward_coupon")
-        .first()
-    )
-    reward_payload = {
-        "reward_type": "",
-        "reward_detail": "",
-        "reward_coupon_id": None,
-        "reward_coupon_title": "",
-    }
-    if reward:
-        if reward.reward_type == "coupon" and reward.reward_coupon_id:
-            user_coupon, _ = UserCoupon.objects.get_or_create(
-                user=user,
-                coupon=reward.reward_coupon,
-                defaults={"is_used": False, "used_at": None},
-            )
-            reward_payload.update(
-                {
-                    "reward_type": "coupon",
-                    "reward_detail": reward.reward_coupon.title,
-                    "reward_coupon_id": reward.reward_coupon.coupon_id,
-                    "reward_coupon_title": reward.reward_coupon.title,
-                }
-            )
-        elif reward.reward_type == "service":
-            reward_payload.update(
-                {
-                    "reward_type": "service",
-                    "reward_detail": reward.reward_service_desc or "サービス",
-                }
-            )
-
-    new_badges = _award_badges_for_user(user, store_id=store_id)
+    with transaction.atomic():
+        first_visit = is_first_visit(user.user_id, store.store_id, now)
+        StoreStampHistory.objects.create(
+            user=user,
+            store=store,
+            stamp_date=timezone.localdate(),
+            stamped_at=now,
+        )
+        _record_store_activities([_store_stamp_activity(store.store_id, now, first_visit)])
+        user_stamp, _ = StoreStamp.objects.get_or_create(user=user, store=store)
+        user_stamp.stamps_count = (user_stamp.stamps_count or 0) + 1
+        user_stamp.save(update_fields=["stamps_count"])
+
+        reward = program["rewards"].get(user_stamp.stamps_count)
+        reward_payload = {
+            "reward_type": "",
+            "reward_detail": "",
+            "reward_coupon_id": None,
+            "reward_coupon_title": "",
+        }
+        if reward:
+            if reward["reward_type"] == "coupon" and reward["reward_coupon_id"]:
+                user_coupon, _ = UserCoupon.objects.get_or_create(
+                    user=user,
+                    coupon_id=reward["reward_coupon_id"],
+                    defaults={"is_used": False, "used_at": None},
+                )
+                reward_payload.update(
+                    {
+                        "reward_type": "coupon",
+                        "reward_detail": reward["reward_coupon_title"],
+                        "reward_coupon_id": reward["reward_coupon_id"],
+                        "reward_coupon_title": reward["reward_coupon_title"],
+                    }
+                )
+            elif reward["reward_type"] == "service":
+                reward_payload.update(
+                    {
+                        "reward_type": "service",
+                        "reward_detail": reward["reward_service_desc"] or "サービス",
+                    }
+                )
+
+        enqueue_task("award_badges", {"user_id": user.user_id, "store_id": store_id})
 
     response = {
         "store_id": store.store_id,
         "store_name": store.name,
         "stamps_count": user_stamp.stamps_count,
         "stamped_at": now.isoformat(),
-        "new_badges": new_badges,
+        "new_badges": [],
+        "badges_pending": True,
         **reward_payload,
     }
     return JsonResponse(response, status=201)
 
 
+OFFLINE_SCAN_MAX_ITEMS = 50
+OFFLINE_SCAN_CLOCK_SKEW = datetime.timedelta(minutes=5)
+
+
+def _parse_scan_time(value, now):
+    scanned_at = parse_datetime(value) if isinstance(value, str) else None
+    if scanned_at is None:
+        return None, "scanned_at must be an ISO 8601 datetime."
+    if timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at, timezone.get_current_timezone())
+    if scanned_at > now + OFFLINE_SCAN_CLOCK_SKEW:
+        return None, "scanned_at is in the future."
+    max_age = datetime.timedelta(hours=getattr(settings, "OFFLINE_SCAN_MAX_AGE_HOURS", 72))
+    if scanned_at < now - max_age:
+        return None, "scanned_at is too old."
+    return min(scanned_at, now), None
+
+
+def _normalize_scan_item(item, now):
+    """一括送信の1件を検証して正規化する。戻り値は (scan, エラー文言)。"""
+    if not isinstance(item, dict):
+        return None, "Each item must be an object."
+    kind = item.get("kind")
+    if kind not in {"clear", "stamp"}:
+        return None, "kind must be clear or stamp."
+    scanned_at, error = _parse_scan_time(item.get("scanned_at"), now)
+    if error:
+        return None, error
+
+    if kind == "clear":
+        qr_code = (item.get("qr_code") or "").strip()
+        if not item.get("challenge_id") or not qr_code or item.get("lat") is None or item.get("lon") is None:
+            return None, "challenge_id, qr_code, lat, and lon are required."
+        try:
+            challenge_id = int(item.get("challenge_id"))
+            lat = float(item.get("lat"))
+            lon = float(item.get("lon"))
+        except (TypeError, ValueError):
+            return None, "challenge_id must be an integer and lat/lon must be numbers."
+        return {
+            "kind": kind,
+            "scanned_at": scanned_at,
+            "challenge_id": challenge_id,
+            "qr_code": qr_code,
+            "lat": lat,
+            "lon": lon,
+        }, None
+
+    store_qr = (item.get("store_qr") or "").strip()
+    if not item.get("store_id") or not store_qr:
+        return None, "store_id and store_qr are required."
+    try:
+        store_id = int(item.get("store_id"))
+    except (TypeError, ValueError):
+        return None, "store_id must be an integer."
+    return {"kind": kind, "scanned_at": scanned_at, "store_id": store_id, "store_qr": store_qr}, None
+
+
+class _OfflineScanBatch:
+    """
+    一括送信の処理。判定に必要な行は最初にまとめて読み込み、
+    各スキャンは時刻順にメモリ上の状態で判定する。書き込みは最後にまとめて行う。
+    """
+
+    def __init__(self, user, scans):
+        self.user = user
+        self.scans = scans
+        self.multiplier = rank_multiplier(user.rank)
+        self.clears = [scan for scan in scans if scan["kind"] == "clear"]
+        self.stamps = [scan for scan in scans if scan["kind"] == "stamp"]
+
+        self.new_user_challenges = []
+        self.updated_user_challenges = {}
+        self.new_histories = []
+        self.new_user_stamps = []
+        self.updated_user_stamps = {}
+        self.new_coupons = []
+        self.point_entries = []
+        self.cleared_times = []
+        # オーナー向け通知（保存後にまとめて発行する）
+        self.clear_events = []
+        self.stamp_events = []
+        self._load()
+
+    def _load(self):
+        user = self.user
+        challenge_ids = {scan["challenge_id"] for scan in self.clears}
+        store_ids = {scan["store_id"] for scan in self.stamps}
+
+        self.challenges = Challenge.objects.select_related("store", "reward_coupon").in_bulk(challenge_ids)
+        self.user_challenges = {
+            entry.challenge_id: entry
+            for entry in UserChallenge.objects.filter(user=user, challenge_id__in=challenge_ids)
+        }
+        # 日ごとのクリア件数と、各クエストの最終クリア日（単発APIと同じく UserChallenge の cleared_at 基準）
+        self.cleared_on = {}
+        self.daily_counts = {}
+        if self.clears:
+            first_day = timezone.localtime(self.clears[0]["scanned_at"]).replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+            for challenge_id, cleared_at in UserChallenge.objects.filter(
+                user=user,
+                status="cleared",
+                cleared_at__gte=first_day,
+            ).values_list("challenge_id", "cleared_at"):
+                day = timezone.localdate(cleared_at)
+                self.cleared_on[challenge_id] = day
+                self.daily_counts[day] = self.daily_counts.get(day, 0) + 1
+        # 既にクリア実績のある店舗（統計画面の参加者数の差分判定に使う）
+        self.participant_store_ids = set()
+        if self.clears:
+            self.participant_store_ids = set(
+                UserChallenge.objects.filter(
+                    user=user,
+                    status="cleared",
+                    challenge__store_id__in={challenge.store_id for challenge in self.challenges.values()},
+                ).values_list("challenge__store_id", flat=True)
+            )
+
+        self.stores = Store.objects.in_bulk(store_ids)
+        self.stamp_settings = {
+            setting.store_id: setting for setting in StoreStampSetting.objects.filter(store_id__in=store_ids)
+        }
+        self.stamp_rewards = {}
+        for reward in StoreStampReward.objects.filter(
+            setting__in=list(self.stamp_settings.values())
+        ).select_related("reward_coupon"):
+            self.stamp_rewards.setdefault((reward.setting_id, reward.stamp_threshold), reward)
+        self.stamp_times = {store_id: [] for store_id in store_ids}
+        if self.stamps:
+            for store_id, stamped_at in StoreStampHistory.objects.filter(
+                user=user,
+                store_id__in=store_ids,
+                stamped_at__gt=self.stamps[0]["scanned_at"] - STAMP_COOLDOWN,
+            ).values_list("store_id", "stamped_at"):
+                self.stamp_times[store_id].append(stamped_at)
+        self.user_stamps = {
+            entry.store_id: entry for entry in StoreStamp.objects.filter(user=user, store_id__in=store_ids)
+        }
+        # 来店済みの (店舗, 日)。店舗の集計の unique_users の判定に使い、一括送信の分はメモリで足していく
+        self.visited = visited_store_days(
+            user.user_id,
+            store_ids | {challenge.store_id for challenge in self.challenges.values() if challenge.store_id},
+            {timezone.localdate(scan["scanned_at"]) for scan in self.scans},
+        )
+
+        candidate_coupon_ids = {
+            challenge.reward_coupon_id for challenge in self.challenges.values() if challenge.reward_coupon_id
+        }
+        candidate_coupon_ids.update(
+            reward.reward_coupon_id for reward in self.stamp_rewards.values() if reward.reward_coupon_id
+        )
+        self.owned_coupon_ids = set(
+            UserCoupon.objects.filter(user=user, coupon_id__in=candidate_coupon_ids).values_list(
+                "coupon_id",
+                flat=True,
+            )
+        )
+
+    def _first_visit(self, store_id, when):
+        # 書き込みは最後なので DB は一括送信前の状態。_load で読んだ分に一括送信の分を足して判定する
+        key = (store_id, timezone.localdate(when))
+        if key in self.visited:
+            return False
+        self.visited.add(key)
+        return True
+
+    def _grant_coupon(self, coupon):
+        if coupon.coupon_id in self.owned_coupon_ids:
+            return False
+        self.owned_coupon_ids.add(coupon.coupon_id)
+        self.new_coupons.append(coupon)
+        return True
+
+    def apply_clear(self, scan):
+        challenge = self.challenges.get(scan["challenge_id"])
+        if not challenge:
+            return "Challenge not found."
+        if not challenge.qr_code:
+            return "Challenge qr_code is not set."
+        if scan["qr_code"] != challenge.qr_code:
+            return "qr_code does not match."
+        store = challenge.store
+        if store is None:
+            return "Challenge store is not set."
+        if store.latitude is None or store.longitude is None:
+            return "Store location is not set."
+        distance_m = haversine_km(scan["lat"], scan["lon"], float(store.latitude), float(store.longitude)) * 1000
+        if distance_m > CLEAR_GEOFENCE_M:
+            return "User is not within 50m of the store."
+
+        scanned_at = scan["scanned_at"]
+        day = timezone.localdate(scanned_at)
+        last_day = self.cleared_on.get(challenge.challenge_id)
+        if last_day == day:
+            return "Already cleared this challenge today."
+        if last_day and last_day > day:
+            return "A later clear of this challenge already exists."
+        if self.daily_counts.get(day, 0) >= DAILY_CLEAR_LIMIT:
+            return "Daily clear limit reached."
+
+        if last_day:
+            self.daily_counts[last_day] -= 1
+        self.daily_counts[day] = self.daily_counts.get(day, 0) + 1
+        self.cleared_on[challenge.challenge_id] = day
+
+        entry = self.user_challenges.get(challenge.challenge_id)
+        created = entry is None
+        if created:
+            entry = UserChallenge(user=self.user, challenge=challenge)
+            self.user_challenges[challenge.challenge_id] = entry
+            self.new_user_challenges.append(entry)
+        elif entry.pk:
+            self.updated_user_challenges[entry.pk] = entry
+        newly_cleared = created or entry.status != "cleared"
+        new_participant = newly_cleared and challenge.store_id not in self.participant_store_ids
+        self.participant_store_ids.add(challenge.store_id)
+        entry.status = "cleared"
+        entry.cleared_at = scanned_at
+        self.cleared_times.append((scanned_at, challenge.store_id))
+        self.clear_events.append(
+            (
+                challenge,
+                scanned_at,
+                int(created),
+                int(newly_cleared),
+                new_participant,
+                self._first_visit(challenge.store_id, scanned_at),
+            )
+        )
+
+        reward_points = 0
+        reward_coupon = None
+        reward_granted = False
+        if challenge.reward_type == "points":
+            if challenge.reward_points:
+                reward_points = int(round(challenge.reward_points * self.multiplier))
+                self.point_entries.append((reward_points, challenge))
+                reward_granted = True
+        elif challenge.reward_type == "coupon" and challenge.reward_coupon_id:
+            reward_coupon = challenge.reward_coupon
+            reward_granted = self._grant_coupon(challenge.reward_coupon)
+        elif challenge.reward_type == "service":
+            reward_granted = True
+
+        reward_detail = challenge.reward_detail or ""
+        if not reward_detail and reward_coupon:
+            reward_detail = reward_coupon.title
+        return {
+            "challenge_id": challenge.challenge_id,
+            "cleared_at": scanned_at.isoformat(),
+            "reward_type": challenge.reward_type,
+            "reward_points": reward_points,
+            "reward_detail": reward_detail,
+            "reward_coupon_id": reward_coupon.coupon_id if reward_coupon else None,
+            "reward_coupon_title": reward_coupon.title if reward_coupon else "",
+            "reward_granted": reward_granted,
+        }
+
+    def apply_stamp(self, scan):
+        store = self.stores.get(scan["store_id"])
+        if not store:
+            return "Store not found."
+        if store.qr_code != scan["store_qr"]:
+            return "Store QR does not match."
+        setting = self.stamp_settings.get(store.store_id)
+        if not setting:
+            return "Stamp setting not found."
+        scanned_at = scan["scanned_at"]
+        times = self.stamp_times[store.store_id]
+        if any(abs(scanned_at - stamped_at) < STAMP_COOLDOWN for stamped_at in times):
+            return "Already stamped within 4 hours."
+        times.append(scanned_at)
+        self.stamp_events.append((store.store_id, scanned_at, self._first_visit(store.store_id, scanned_at)))
+
+        self.new_histories.append(
+            StoreStampHistory(
+                user=self.user,
+                store=store,
+                stamp_date=timezone.localdate(scanned_at),
+                stamped_at=scanned_at,
+            )
+        )
+        user_stamp = self.user_stamps.get(store.store_id)
+        if user_stamp is None:
+            user_stamp = StoreStamp(user=self.user, store=store, stamps_count=0)
+            self.user_stamps[store.store_id] = user_stamp
+            self.new_user_stamps.append(user_stamp)
+        elif user_stamp.pk:
+            self.updated_user_stamps[user_stamp.pk] = user_stamp
+        user_stamp.stamps_count = (user_stamp.stamps_count or 0) + 1
+
+        payload = {
+            "store_id": store.store_id,
+            "store_name": store.name,
+            "stamps_count": user_stamp.stamps_count,
+            "stamped_at": scanned_at.isoformat(),
+            "reward_type": "",
+            "reward_detail": "",
+            "reward_coupon_id": None,
+            "reward_coupon_title": "",
+        }
+        reward = self.stamp_rewards.get((setting.id, user_stamp.stamps_count))
+        if reward:
+            if reward.reward_type == "coupon" and reward.reward_coupon_id:
+                self._grant_coupon(reward.reward_coupon)
+                payload.update(
+                    {
+                        "reward_type": "coupon",
+                        "reward_detail": reward.reward_coupon.title,
+                        "reward_coupon_id": reward.reward_coupon_id,
+                        "reward_coupon_title": reward.reward_coupon.title,
+                    }
+                )
+            elif reward.reward_type == "service":
+                payload.update({"reward_type": "service", "reward_detail": reward.reward_service_desc or "サービス"})
+        return payload
+
+    def save(self):
+        UserChallenge.objects.bulk_create(self.new_user_challenges)
+        if self.updated_user_challenges:
+            UserChallenge.objects.bulk_update(list(self.updated_user_challenges.values()), ["status", "cleared_at"])
+        StoreStampHistory.objects.bulk_create(self.new_histories)
+        StoreStamp.objects.bulk_create(self.new_user_stamps)
+        if self.updated_user_stamps:
+            StoreStamp.objects.bulk_update(list(self.updated_user_stamps.values()), ["stamps_count"])
+        user_coupons = UserCoupon.objects.bulk_create(
+            [UserCoupon(user=self.user, coupon=coupon) for coupon in self.new_coupons]
+        )
+        earn_points_bulk(self.user, self.point_entries)
+        # 店舗の集計は (店舗, 日)・店舗ごとにまとめて加算し、通知は1回の bulk_create で作る。
+        # bulk_create は post_save を送らないため、クーポンの付与イベントもここで発行する
+        _record_store_activities(
+            [_store_clear_activity(*args) for args in self.clear_events]
+            + [_store_stamp_activity(*args) for args in self.stamp_events],
+            events=[
+                (
+                    "coupon_granted",
+                    {
+                        "user_coupon_id": user_coupon.user_coupon_id,
+                        "coupon_id": user_coupon.coupon_id,
+                        "title": user_coupon.coupon.title,
+                    },
+                    self.user.user_id,
+                    None,
+                )
+                for user_coupon in user_coupons
+            ],
+        )
+
+    def badge_task_payload(self):
+        """バッジ判定は1回だけ。深夜のクリアがあればそれを、なければ最後のクリアを渡す。"""
+        payload = {"user_id": self.user.user_id, "cleared_at": None, "store_id": None}
+        if self.cleared_times:
+            night = [item for item in self.cleared_times if 0 <= timezone.localtime(item[0]).hour < 5]
+            cleared_at, store_id = (night or self.cleared_times)[-1]
+            payload.update({"cleared_at": cleared_at.isoformat(), "store_id": store_id})
+        if self.user_stamps:
+            top = max(self.user_stamps.values(), key=lambda entry: entry.stamps_count or 0)
+            payload["store_id"] = top.store_id
+        return payload
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_scans_bulk(request):
+    """
+    オフライン中に記録したクエストクリア・スタンプをまとめて送信する。
+    POST /api/scans/bulk/
+    {"items": [
+        {"client_id": "a1", "kind": "clear", "scanned_at": "...", "challenge_id": 1, "qr_code": "...", "lat": 0, "lon": 0},
+        {"client_id": "a2", "kind": "stamp", "scanned_at": "...", "store_id": 1, "store_qr": "..."}
+    ]}
+
+    50m 圏内・4時間のクールダウン・1日5件の判定は各 scanned_at の時点で行い、
+    結果は items と同じ順に1件ずつ返す。同じ内容の再送は重複判定で弾かれる。
+    ランクとバッジは全件の処理後に1回だけ評価する。
+    """
+    user, error = _get_user_from_access_token(request)
+    if error:
+        return error
+    data, error = _get_request_data(request)
+    if error:
+        return error
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return _json_error("items must be a non-empty list.", status=400)
+    if len(items) > OFFLINE_SCAN_MAX_ITEMS:
+        return _json_error(f"At most {OFFLINE_SCAN_MAX_ITEMS} items are allowed.", status=400)
+
+    now = timezone.now()
+    results = []
+    scans = []
+    for index, item in enumerate(items):
+        scan, detail = _normalize_scan_item(item, now)
+        result = {
+            "client_id": item.get("client_id") if isinstance(item, dict) else None,
+            "kind": item.get("kind") if isinstance(item, dict) else None,
+        }
+        if detail:
+            result.update({"status": "error", "detail": detail})
+        else:
+            scan["index"] = index
+            scans.append(scan)
+        results.append(result)
+    scans.sort(key=lambda scan: (scan["scanned_at"], scan["index"]))
+
+    previous_rank = user.rank
+    accepted = 0
+    with transaction.atomic():
+        # 同じ利用者の一括送信が並行しても二重に処理しない
+        user = User.objects.select_for_update().select_related("rank").get(pk=user.pk)
+        batch = _OfflineScanBatch(user, scans)
+        for scan in scans:
+            apply = batch.apply_clear if scan["kind"] == "clear" else batch.apply_stamp
+            outcome = apply(scan)
+            if isinstance(outcome, str):
+                results[scan["index"]].update({"status": "error", "detail": outcome})
+            else:
+                results[scan["index"]].update({"status": "ok", **outcome})
+                accepted += 1
+        if accepted:
+            batch.save()
+            ensure_user_rank(user)
+            enqueue_task("award_badges", batch.badge_task_payload())
+
+    current_rank = user.rank
+    return JsonResponse(
+        {
+            "results": results,
+            "accepted": accepted,
+            "user_points": user.points,
+            "rank": current_rank.name if current_rank else None,
+            "rank_id": current_rank.rank_id if current_rank else None,
+            "rank_multiplier": rank_multiplier(current_rank),
+            "previous_rank": previous_rank.name if previous_rank else None,
+            "rank_up": rank_index(current_rank) > rank_index(previous_rank),
+            "new_badges": [],
+            "badges_pending": bool(accepted),
+        }
+    )
+
+
+def _serialize_public_challenge(challenge):
+    return {
+        "challenge_id": challenge.challenge_id,
+        "title": challenge.title,
+        "description": challenge.description or "",
+        "reward_points": challenge.reward_points,
+        "type": challenge.type,
+        "quest_type": challenge.quest_type,
+        "reward_type": challenge.reward_type,
+        "reward_detail": challenge.reward_detail or "",
+        "reward_coupon_id": challenge.reward_coupon_id,
+        "store_id": challenge.store_id,
+        "store_name": challenge.store.name if challenge.store else "",
+        "qr_code": challenge.qr_code or "",
+        "created_at": challenge.created_at.isoformat(),
+    }
+
+
 def public_challenge_list(request):
     """
     Public challenge list API.
@@ -1488,41 +2413,194 @@ def public_challenge_list(request):
             return JsonResponse({"detail": "store_id は整数で指定してください。"}, status=400)
         queryset = queryset.filter(store_id=store_id_int)
 
-    results = []
-    for challenge in queryset:
-        results.append(
-            {
-                "challenge_id": challenge.challenge_id,
-                "title": challenge.title,
-                "description": challenge.description or "",
-                "reward_points": challenge.reward_points,
-                "type": challenge.type,
-                "quest_type": challenge.quest_type,
-                "reward_type": challenge.reward_type,
-                "reward_detail": challenge.reward_detail or "",
-                "reward_coupon_id": challenge.reward_coupon_id,
-                "store_id": challenge.store_id,
-                "store_name": challenge.store.name if challenge.store else "",
-                "qr_code": challenge.qr_code or "",
-                "created_at": challenge.created_at.isoformat(),
-            }
+    results = [_serialize_public_challenge(challenge) for challenge in queryset]
+    return JsonResponse(results, safe=False)
+
+
+NEARBY_CHALLENGE_DEFAULT_RADIUS_KM = 3.0
+
+
+def _parse_nearby_cursor(value):
+    """next_cursor（"距離 m-challenge_id"）を (距離 m, challenge_id) にする。読めなければ None。"""
+    meters, _, challenge_id = (value or "").partition("-")
+    if not (meters.isdigit() and challenge_id.isdigit()):
+        return None
+    return int(meters), int(challenge_id)
+
+
+@require_http_methods(["GET"])
+def public_challenge_nearby(request):
+    """
+    近くのクエストAPI
+    GET /api/challenges/nearby/?lat=..&lon=..&radius_km=3&limit=20&cursor=..
+    半径内の店舗を店舗の位置の索引（store_map）で求め、そのクエストを近い順（同じ距離は challenge_id 順）に返す。
+    各クエストには distance（km）と cleared_today（トークンの利用者が今日クリア済みか）を付ける。
+    続きは next_cursor を cursor に渡して取る（最後のページでは null）。
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    if request.GET.get("lat") in (None, "") or request.GET.get("lon") in (None, ""):
+        return _json_error("lat and lon are required.", status=400)
+    lat, error = _parse_float_param(request.GET.get("lat"), "lat")
+    if error:
+        return error
+    lon, error = _parse_float_param(request.GET.get("lon"), "lon")
+    if error:
+        return error
+    radius_km = NEARBY_CHALLENGE_DEFAULT_RADIUS_KM
+    if request.GET.get("radius_km") not in (None, ""):
+        radius_km, error = _parse_float_param(request.GET.get("radius_km"), "radius_km")
+        if error:
+            return error
+        radius_km = min(max(radius_km, 0.1), 50.0)
+    limit, error = _parse_int_param(request.GET.get("limit"), "limit", 20, 1, 100)
+    if error:
+        return error
+    cursor = None
+    if request.GET.get("cursor"):
+        cursor = _parse_nearby_cursor(request.GET["cursor"])
+        if cursor is None:
+            return _json_error("cursor is invalid.", status=400)
+
+    # 近い店舗から IN 句の上限までを候補にし、クエストは (距離 m, challenge_id) だけ読んで並べる
+    meters_by_store = {
+        store_id: round(distance_km * 1000)
+        for distance_km, store_id in get_store_clusters().nearby(lat, lon, radius_km)[:STORE_LIST_IN_FILTER_LIMIT]
+    }
+    keys = sorted(
+        (meters_by_store[store_id], challenge_id)
+        for challenge_id, store_id in Challenge.objects.filter(
+            is_banned=False, store__status="approved", store_id__in=list(meters_by_store)
+        ).values_list("challenge_id", "store_id")
+    )
+    start = bisect.bisect_right(keys, cursor) if cursor else 0
+    page = keys[start:start + limit]
+
+    # 詳細と今日のクリア状況はこのページの分だけ引く
+    challenges = Challenge.objects.select_related("store").in_bulk([challenge_id for _, challenge_id in page])
+    cleared_today = set()
+    user, error = _get_user_from_access_token(request)
+    if not error and user and page:
+        cleared_today = set(
+            UserChallenge.objects.filter(
+                user=user,
+                challenge_id__in=list(challenges),
+                status="cleared",
+                cleared_at__date=timezone.localdate(),
+            ).values_list("challenge_id", flat=True)
         )
+    results = [
+        {
+            **_serialize_public_challenge(challenges[challenge_id]),
+            "distance": meters / 1000,
+            "cleared_today": challenge_id in cleared_today,
+        }
+        for meters, challenge_id in page
+        if challenge_id in challenges
+    ]
+    next_cursor = None
+    if start + limit < len(keys):
+        next_cursor = "%d-%d" % page[-1]
+    return JsonResponse({"results": results, "next_cursor": next_cursor, "radius_km": radius_km})
 
-    return JsonResponse(results, safe=False)
+
+SEARCH_KINDS = ("store", "challenge", "tag")
 
 
 @require_http_methods(["GET"])
-def public_notice_list(request):
-    expected_key = getattr(settings, "PHONE_API_KEY", "")
-    provided_key = request.headers.get("phone-API-key") or request.META.get("HTTP_PHONE_API_KEY")
-    is_phone_client = bool(expected_key and provided_key and secrets.compare_digest(provided_key, expected_key))
+def public_search(request):
+    """
+    店舗・クエスト・タグの横断検索（公開中のもののみ）。
+    GET /api/search/?q=..&kinds=store,challenge&limit=20
+    q は NFKC・小文字・カタカナ→ひらがなに正規化し、空白区切りの語をすべて含むものを関連度順に返す。
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    query = (request.GET.get("q") or "").strip()
+    if not query:
+        return _json_error("q is required.", status=400)
+    if len(query) > SEARCH_QUERY_MAX_LENGTH:
+        return _json_error(f"q must be at most {SEARCH_QUERY_MAX_LENGTH} characters.", status=400)
+    kinds = [kind for kind in (request.GET.get("kinds") or "").split(",") if kind]
+    if any(kind not in SEARCH_KINDS for kind in kinds):
+        return _json_error(f"kinds must be a comma separated subset of {','.join(SEARCH_KINDS)}.", status=400)
+    limit, error = _parse_int_param(request.GET.get("limit"), "limit", 20, 1, 50)
+    if error:
+        return error
+
+    documents = search_catalog(query, kinds=kinds or SEARCH_KINDS).values_list("kind", "object_id", "title", "store_id")
+    results = [
+        {"kind": kind, "id": object_id, "title": title, "store_id": store_id}
+        for kind, object_id, title, store_id in documents[:limit]
+    ]
+    return JsonResponse({"query": query, "results": results})
+
+
+def _store_detail_public(store_id):
+    """
+    店舗詳細のうち利用者に依存しない部分。店舗単位でキャッシュし、
+    店舗・クエスト・クーポン・スタンプ特典の更新時に signals で無効化する。
+    クエリは店舗(+タグ)・クエスト・クーポン・スタンプ設定・特典の固定件数。
+    """
+    key = store_detail_key(store_id)
+    detail = cache.get(key)
+    if detail is not None:
+        return detail
+
+    store = (
+        Store.objects.filter(store_id=store_id, status="approved")
+        .prefetch_related("storetag_set__tag")
+        .first()
+    )
+    if not store:
+        return None
+
+    challenges = Challenge.objects.filter(store_id=store_id, is_banned=False).order_by("-created_at")
+    coupons = Coupon.objects.filter(store_id=store_id, publish_to_shop=True).order_by("-expires_at", "-coupon_id")
+    for obj in (*challenges, *coupons):
+        obj.store = store
+
+    stamp_setting = _stamp_program(store_id)["setting"]
+
+    detail = {
+        "store": _serialize_public_store(store),
+        "challenges": [_serialize_public_challenge(challenge) for challenge in challenges],
+        "coupons": [_serialize_public_coupon(coupon) for coupon in coupons],
+        "stamp_setting": stamp_setting,
+    }
+    cache.set(key, detail, store_detail_cache_seconds())
+    return detail
 
-    target = request.GET.get("target")
-    if target == "user" and is_phone_client:
-        targets = {"all", "user"}
-    else:
-        targets = {"all"}
 
+@require_http_methods(["GET"])
+def public_store_detail(request, store_id):
+    """
+    店舗詳細の集約API
+    GET /api/stores/<id>/
+
+    店舗・クエスト・公開クーポン・スタンプ設定を1回で返す。
+    アクセストークンがあれば利用者のスタンプ進捗も付ける。
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    detail = _store_detail_public(store_id)
+    if detail is None:
+        return _json_error("Store not found.", status=404)
+
+    response = dict(detail)
+    user, error = _get_user_from_access_token(request)
+    if not error and user and detail["stamp_setting"]["exists"]:
+        response["stamp_setting"] = {
+            **detail["stamp_setting"],
+            "user_stamps": _user_stamp_progress(user, store_id),
+        }
+    return JsonResponse(response)
+
+
+def _active_notices(targets):
     now = timezone.now()
     notices = Notice.objects.filter(
         is_published=True,
@@ -1544,7 +2622,363 @@ def public_notice_list(request):
                 "end_at": notice.end_at.isoformat(),
             }
         )
-    return JsonResponse(results, safe=False)
+    return results
+
+
+@require_http_methods(["GET"])
+def public_notice_list(request):
+    expected_key = getattr(settings, "PHONE_API_KEY", "")
+    provided_key = request.headers.get("phone-API-key") or request.META.get("HTTP_PHONE_API_KEY")
+    is_phone_client = bool(expected_key and provided_key and secrets.compare_digest(provided_key, expected_key))
+
+    target = request.GET.get("target")
+    if target == "user" and is_phone_client:
+        targets = {"all", "user"}
+    else:
+        targets = {"all"}
+
+    return JsonResponse(_active_notices(targets), safe=False)
+
+
+def _bootstrap_cache_seconds():
+    return getattr(settings, "BOOTSTRAP_CACHE_SECONDS", 30)
+
+
+def _cached_public_store_ids():
+    """
+    承認済み店舗の ID（新しい順）。利用者に依存しないのでキャッシュする。
+    店舗の公開データはページの分だけ _cached_store_summaries で埋める。
+    """
+    store_ids = cache.get(BOOTSTRAP_STORES_CACHE_KEY)
+    if store_ids is None:
+        store_ids = list(
+            Store.objects.filter(status="approved").order_by("-created_at").values_list("store_id", flat=True)
+        )
+        cache.set(BOOTSTRAP_STORES_CACHE_KEY, store_ids, _bootstrap_cache_seconds())
+    return store_ids
+
+
+def _cached_user_notices():
+    notices = cache.get(BOOTSTRAP_NOTICES_CACHE_KEY)
+    if notices is None:
+        notices = _active_notices({"all", "user"})
+        cache.set(BOOTSTRAP_NOTICES_CACHE_KEY, notices, _bootstrap_cache_seconds())
+    return notices
+
+
+def _version_stamp(aggregate):
+    updated = aggregate.get("updated")
+    if hasattr(updated, "timestamp"):
+        updated = int(updated.timestamp())
+    return f"{aggregate.get('count') or 0}-{updated or 0}"
+
+
+def _catalog_versions():
+    """
+    アプリ側キャッシュの再取得判定に使うカタログの版。
+    件数と最終更新日時から作るので、追加・更新・削除のいずれでも変わる。
+    """
+    versions = cache.get(BOOTSTRAP_VERSIONS_CACHE_KEY)
+    if versions is None:
+        versions = {
+            "stores": _version_stamp(
+                Store.objects.filter(status="approved").aggregate(count=Count("store_id"), updated=Max("updated_at"))
+            ),
+            "notices": _version_stamp(
+                Notice.objects.aggregate(count=Count("notice_id"), updated=Max("updated_at"))
+            ),
+            "tags": _version_stamp(Tag.objects.aggregate(count=Count("tag_id"), updated=Max("updated_at"))),
+            "badges": str(len(BADGE_DEFINITIONS)),
+            "ranks": str(len(RANK_DEFINITIONS)),
+        }
+        cache.set(BOOTSTRAP_VERSIONS_CACHE_KEY, versions, _bootstrap_cache_seconds())
+    return versions
+
+
+def _parse_float_param(value, name):
+    try:
+        return float(value), None
+    except (TypeError, ValueError):
+        return None, _json_error(f"{name} must be a number.", status=400)
+
+
+def _parse_int_param(value, name, default, minimum, maximum):
+    if value in (None, ""):
+        return default, None
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        return None, _json_error(f"{name} must be an integer.", status=400)
+    return min(max(parsed, minimum), maximum), None
+
+
+@require_http_methods(["GET"])
+def api_bootstrap(request):
+    """
+    アプリ起動時にまとめて必要なデータを返す。
+    GET /api/bootstrap/?lat=..&lon=..&radius_km=5&limit=20&offset=0
+
+    利用者・ランク・獲得バッジは認証1回分のクエリで取得し、
+    お知らせ・店舗一覧・カタログの版は利用者に依存しないためキャッシュから返す。
+    位置を渡したときの近くの店舗は地図の索引（get_store_clusters().nearby()）で探す。
+    """
+    user, error = _get_user_from_access_token(request)
+    if error:
+        return error
+
+    lat = lon = None
+    if request.GET.get("lat") is not None and request.GET.get("lon") is not None:
+        lat, error = _parse_float_param(request.GET.get("lat"), "lat")
+        if error:
+            return error
+        lon, error = _parse_float_param(request.GET.get("lon"), "lon")
+        if error:
+            return error
+    radius_km = 5.0
+    if request.GET.get("radius_km") not in (None, ""):
+        radius_km, error = _parse_float_param(request.GET.get("radius_km"), "radius_km")
+        if error:
+            return error
+        radius_km = min(max(radius_km, 0.1), 50.0)
+    limit, error = _parse_int_param(request.GET.get("limit"), "limit", 20, 1, 100)
+    if error:
+        return error
+    offset, error = _parse_int_param(request.GET.get("offset"), "offset", 0, 0, 10000)
+    if error:
+        return error
+
+    _batch_memo(request, ("rank", user.user_id), lambda: ensure_user_rank(user))
+    user_badges = list(
+        UserBadge.objects.select_related("badge").filter(user=user).order_by("-awarded_at")
+    )
+
+    # 並びは店舗 ID だけで決め、公開データはこのページの分だけ店舗ごとの要約キャッシュから埋める
+    if lat is not None:
+        nearby = get_store_clusters().nearby(lat, lon, radius_km)
+        count = len(nearby)
+        page = nearby[offset:offset + limit]
+        distances = {store_id: distance_km for distance_km, store_id in page}
+        results = [
+            {**summary, "distance": round(distances[summary["id"]], 3)}
+            for summary in _cached_store_summaries([store_id for _, store_id in page])
+        ]
+    else:
+        store_ids = _cached_public_store_ids()
+        count = len(store_ids)
+        results = _cached_store_summaries(store_ids[offset:offset + limit])
+
+    return JsonResponse(
+        {
+            "user": _serialize_user(user),
+            "badges": [serialize_badge(entry.badge, awarded_at=entry.awarded_at) for entry in user_badges],
+            "pending_badges": sum(1 for entry in user_badges if entry.notified_at is None),
+            "notices": _cached_user_notices(),
+            "stores": {
+                "results": results,
+                "count": count,
+                "limit": limit,
+                "offset": offset,
+                "radius_km": radius_km if lat is not None else None,
+            },
+            "versions": _catalog_versions(),
+            "server_time": timezone.now().isoformat(),
+        }
+    )
+
+
+BATCH_MAX_REQUESTS = 10
+# 読み取り専用で、サブリクエストとして呼んでよいビュー（URL名）
+BATCH_ALLOWED_VIEWS = {
+    "api_me",
+    "api_bootstrap",
+    "api_user_badges",
+    "api_user_coupon_history",
+    "api_store_coupon_history",
+    "public_store_list",
+    "public_store_clusters",
+    "public_store_feed",
+    "public_store_detail",
+    "public_coupon_list",
+    "public_challenge_list",
+    "public_challenge_nearby",
+    "api_recommendations",
+    "public_stamp_setting",
+    "public_notice_list",
+    "public_sync",
+}
+
+
+def _build_batch_subrequest(request, path, query_string):
+    environ = {
+        key: value
+        for key, value in request.META.items()
+        if key not in {"CONTENT_LENGTH", "CONTENT_TYPE", "PATH_INFO", "QUERY_STRING"}
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query_string,
+            "wsgi.input": io.BytesIO(b""),
+        }
+    )
+    sub_request = WSGIRequest(environ)
+    # 認証結果とバッチ内メモを親リクエストと共有する
+    sub_request._access_token_auth = getattr(request, "_access_token_auth", None)
+    sub_request.batch_memo = request.batch_memo
+    return sub_request
+
+
+def _run_batch_item(request, item):
+    if not isinstance(item, dict):
+        return 400, {"detail": "Each request must be an object."}
+    raw_path = item.get("path")
+    if not isinstance(raw_path, str) or not raw_path.startswith("/api/"):
+        return 400, {"detail": "path must start with /api/."}
+    parts = urllib.parse.urlsplit(raw_path)
+    query = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    extra = item.get("query") or {}
+    if not isinstance(extra, dict):
+        return 400, {"detail": "query must be an object."}
+    for key, value in extra.items():
+        values = value if isinstance(value, list) else [value]
+        query.extend((key, "" if v is None else str(v)) for v in values)
+
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return 404, {"detail": "Not found."}
+    if match.url_name not in BATCH_ALLOWED_VIEWS:
+        return 403, {"detail": "This endpoint is not available in batch requests."}
+
+    sub_request = _build_batch_subrequest(request, parts.path, urllib.parse.urlencode(query))
+    # 1件の例外でバッチ全体を失敗させず、通常のリクエストと同じステータスをその項目に返す
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Http404:
+        return 404, {"detail": "Not found."}
+    except PermissionDenied:
+        return 403, {"detail": "Permission denied."}
+    except Exception:
+        # 通常の 500 と同じく django.request のロガーに記録する
+        logging.getLogger("django.request").exception("Internal Server Error in batch item: %s", parts.path)
+        return 500, {"detail": "Internal server error."}
+    if getattr(sub_request, "_access_token_auth", None) is not None:
+        request._access_token_auth = sub_request._access_token_auth
+    try:
+        body = json.loads(response.content.decode("utf-8")) if response.content else None
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        body = None
+    return response.status_code, body
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_batch(request):
+    """
+    読み取りAPIをまとめて実行する。
+    POST /api/batch/
+    {"requests": [{"id": "me", "path": "/api/me/"}, {"id": "coupons", "path": "/api/coupons/", "query": {"type": "common"}}]}
+
+    各サブリクエストは URL リゾルバ経由で同じプロセス内のビューを呼ぶ。
+    認証（JWT 検証・User 取得）とランク再計算はバッチ全体で1回だけ行う。
+    """
+    data, error = _get_request_data(request)
+    if error:
+        return error
+    items = data.get("requests") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return _json_error("requests must be a non-empty list.", status=400)
+    if len(items) > BATCH_MAX_REQUESTS:
+        return _json_error(f"At most {BATCH_MAX_REQUESTS} requests are allowed.", status=400)
+
+    request.batch_memo = {}
+    results = []
+    for index, item in enumerate(items):
+        status, body = _run_batch_item(request, item)
+        item_id = item.get("id") if isinstance(item, dict) else None
+        results.append({"id": item_id if item_id is not None else index, "status": status, "body": body})
+    return JsonResponse({"responses": results})
+
+
+@require_http_methods(["GET"])
+def public_sync(request):
+    """
+    差分同期API
+    GET /api/sync/?since=<token>&limit=500
+
+    since 以降に追加・更新された店舗・クエスト・クーポンと、削除・非公開化された行の ID（deleted）を返す。
+    初回は since を省略（0）すると全件が返る。応答の token を次回の since に使い、
+    has_more が true の間は続けて取得する。
+    """
+    auth_error = _require_phone_api_key(request)
+    if auth_error:
+        return auth_error
+    since, error = _parse_int_param(request.GET.get("since"), "since", 0, 0, 2**63 - 1)
+    if error:
+        return error
+    limit, error = _parse_int_param(request.GET.get("limit"), "limit", 500, 1, 2000)
+    if error:
+        return error
+
+    changes = list(ChangeLog.objects.filter(change_id__gt=since).order_by("change_id")[: limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    upserts = {"store": [], "challenge": [], "coupon": []}
+    deleted = {"store": set(), "challenge": set(), "coupon": set()}
+    for change in changes:
+        if change.is_deleted:
+            deleted[change.entity].add(change.object_id)
+        else:
+            upserts[change.entity].append(change.object_id)
+
+    stores = list(
+        Store.objects.filter(store_id__in=upserts["store"], status="approved").prefetch_related(
+            "storetag_set__tag"
+        )
+    )
+    challenges = list(
+        Challenge.objects.select_related("store").filter(
+            challenge_id__in=upserts["challenge"],
+            is_banned=False,
+            store__status="approved",
+        )
+    )
+    coupons = list(
+        Coupon.objects.select_related("store")
+        .filter(coupon_id__in=upserts["coupon"], publish_to_shop=True)
+        .filter(Q(store__isnull=True) | Q(store__status="approved"))
+    )
+    # 記録後に非公開になった行も tombstone として返す
+    deleted["store"].update(set(upserts["store"]) - {store.store_id for store in stores})
+    deleted["challenge"].update(set(upserts["challenge"]) - {challenge.challenge_id for challenge in challenges})
+    deleted["coupon"].update(set(upserts["coupon"]) - {coupon.coupon_id for coupon in coupons})
+
+    # 直近の変更は並行トランザクションのコミット順が前後しうるため、token はそこまで進めない
+    # （該当行は次回も返るが、クライアント側では上書きになるだけ）
+    settle_before = timezone.now() - datetime.timedelta(seconds=getattr(settings, "SYNC_SETTLE_SECONDS", 5))
+    token = since
+    for change in changes:
+        if change.changed_at > settle_before:
+            has_more = False
+            break
+        token = change.change_id
+
+    return JsonResponse(
+        {
+            "token": str(token),
+            "has_more": has_more,
+            "stores": [_serialize_public_store(store) for store in stores],
+            "challenges": [_serialize_public_challenge(challenge) for challenge in challenges],
+            "coupons": [_serialize_public_coupon(coupon) for coupon in coupons],
+            "deleted": {
+                "stores": sorted(deleted["store"]),
+                "challenges": sorted(deleted["challenge"]),
+                "coupons": sorted(deleted["coupon"]),
+            },
+        }
+    )
 
 
 def signup_view(request):
@@ -1686,12 +3120,6 @@ def _send_verification_email(request, owner):
         f"{verify_url}\n\n"
         "※本メールに心当たりがない場合は破棄してください。"
     )
-    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None) or getattr(settings, "EMAIL_HOST_USER", None)
-    if not from_email:
-        from_email = "no-reply@ciquest.local"
-
-    try:
-        send_mail(subject, message, from_email, [owner.email], fail_silently=False)
-        return True
-    except Exception:
-        return False
+    # SMTP の遅延・失敗を画面に持ち込まないよう送信キューに積むだけにする
+    enqueue_email(subject, message, [owner.email])
+    return True
@@ -27,4 +27,7 @@ urlpatterns = [
     path('challenges/<int:challenge_id>/edit/', views.edit_challenge, name='edit_challenge'),
     path('challenges/<int:challenge_id>/delete/', views.delete_challenge, name='delete_challenge'),
     path('stats/', views.stats, name='stats'),
+    path('stats/events/', views.stats_events, name='stats_events'),
+    path('analytics/', views.analytics, name='owner_analytics'),
+    path('exports/<str:dataset>/', views.export_history, name='owner_export_history'),
 ]
@@ -2,10 +2,15 @@
 import datetime
 import uuid
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.db import transaction
-from django.db.models import Count, Sum
+from django.db.models import Max
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.utils.safestring import mark_safe
 from ciquest_model.models import (
     Store,
@@ -14,17 +19,20 @@ from ciquest_model.models import (
     Coupon,
     AdminInquiry,
     Notice,
-    UserChallenge,
-    StoreStamp,
-    StoreStampHistory,
-    StoreCouponUsageHistory,
     StoreStampSetting,
     StoreStampReward,
+    StoreDailyStats,
+    StoreStatsTotal,
+    StoreAnalytics,
+    UserEvent,
 )
+from ciquest_model.events import store_channel
+from ciquest_model.events import stream as event_stream
+from ciquest_model.exports import ExportError, export_response
 from ciquest_model.markdown_utils import render_markdown
 from django.contrib.auth import logout
 from django.contrib import messages
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_GET, require_POST
 from .forms import ChallengeForm, CouponForm, StampEventForm, StoreApplicationForm
 
 
@@ -38,6 +46,16 @@ def _get_owner_store(request):
     return Store.objects.filter(owner_id=owner_id).first()
 
 
+def _get_owner_store_ids(request):
+    owner_id = request.session.get("owner_id")
+    user = getattr(request, "user", None)
+    if not owner_id and getattr(user, "is_authenticated", False):
+        owner_id = user.id
+    if not owner_id:
+        return []
+    return list(Store.objects.filter(owner_id=owner_id).values_list("store_id", flat=True))
+
+
 def _generate_unique_qr_code():
     while True:
         code = uuid.uuid4().hex[:10].upper()
@@ -693,36 +711,35 @@ def stats(request):
         messages.error(request, "店舗情報が見つかりません。先に店舗登録を完了させてください。")
         return redirect("owner_dashboard")
 
-    total_attempts = UserChallenge.objects.filter(challenge__store=store).count()
-    cleared_qs = UserChallenge.objects.filter(challenge__store=store, status="cleared")
-    cleared_count = cleared_qs.count()
-    total_participants = cleared_qs.values("user_id").distinct().count()
-    clear_rate = round((cleared_count / total_attempts) * 100, 1) if total_attempts else 0
-
-    total_stamps = (
-        StoreStamp.objects.filter(store=store).aggregate(total=Sum("stamps_count")).get("total") or 0
-    )
-    if total_stamps == 0:
-        total_stamps = StoreStampHistory.objects.filter(store=store).count()
-
-    coupon_usage = StoreCouponUsageHistory.objects.filter(store=store).count()
+    # ライブ更新はこの時点より後のイベントから適用する（集計との二重計上を防ぐ）
+    last_event_id = UserEvent.objects.filter(store=store).aggregate(last=Max("event_id"))["last"] or 0
 
-    ranking_qs = (
-        cleared_qs.values("challenge__title")
-        .annotate(count=Count("pk"))
-        .order_by("-count", "challenge__title")[:5]
+    # 全期間の値は店舗の合計の行（StoreStatsTotal）、グラフは直近 14 日分の日別の行だけを読む。
+    # どちらも元データや日別の行の件数に依存しない
+    total = StoreStatsTotal.objects.filter(store=store).first() or StoreStatsTotal(store=store)
+    total_attempts = total.attempts
+    cleared_count = total.cleared
+    total_participants = total.new_participants
+    clear_rate = round((cleared_count / total_attempts) * 100, 1) if total_attempts else 0
+    total_stamps = total.stamps
+    coupon_usage = total.redemptions
+
+    challenge_counts = {int(challenge_id): count for challenge_id, count in total.challenge_clears.items()}
+    title_counts = {}
+    for challenge_id, title in Challenge.objects.filter(pk__in=challenge_counts).values_list("challenge_id", "title"):
+        title_counts[title] = title_counts.get(title, 0) + challenge_counts[challenge_id]
+    ranking_counts = sorted(
+        ({"challenge__title": title, "count": count} for title, count in title_counts.items() if count),
+        key=lambda item: (-item["count"], item["challenge__title"]),
     )
-    ranking = [f"{item['challenge__title']}（{item['count']}件）" for item in ranking_qs]
+    ranking = [f"{item['challenge__title']}（{item['count']}件）" for item in ranking_counts[:5]]
 
     today = timezone.localdate()
     days = 14
     start_date = today - datetime.timedelta(days=days - 1)
-    history_qs = (
-        StoreStampHistory.objects.filter(store=store, stamp_date__range=(start_date, today))
-        .values("stamp_date")
-        .annotate(count=Count("pk"))
+    history_map = dict(
+        StoreDailyStats.objects.filter(store=store, date__range=(start_date, today)).values_list("date", "stamps")
     )
-    history_map = {item["stamp_date"]: item["count"] for item in history_qs}
     chart_labels = []
     chart_values = []
     for i in range(days):
@@ -735,13 +752,135 @@ def stats(request):
         "clear_rate": clear_rate,
         "total_stamps": total_stamps,
         "coupon_usage": coupon_usage,
+        "total_attempts": total_attempts,
+        "cleared_count": cleared_count,
     }
 
     return render(request, "owner/stats.html", {
         "store": store,
         "overview": overview,
         "ranking": ranking,
+        "ranking_counts": [
+            {"title": item["challenge__title"], "count": item["count"]} for item in ranking_counts
+        ],
         "chart_labels": chart_labels,
         "chart_values": chart_values,
+        "last_event_id": last_event_id,
+        # ライブ更新（SSE）は ASGI のときだけ。WSGI では画面は初回の集計のまま
+        "live_updates": isinstance(request, ASGIRequest),
+    })
+
+
+@require_GET
+async def stats_events(request):
+    """
+    統計画面のライブ更新（SSE）。オーナーの店舗で発生したスタンプ付与・クエストクリア・
+    クーポン利用を配信し、画面側のカウンターを差分で更新させる（集計ビューは初回の1回だけ）。
+    ?store_id= で対象店舗を1つに絞れる。再接続時は Last-Event-ID 以降を再送する。
+    WSGI では接続を閉じるまで何も送られずワーカーを占有するため 503 を返す（EventSource は再接続しない）。
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("Live updates require an ASGI server.", status=503, content_type="text/plain")
+    store_ids = await sync_to_async(_get_owner_store_ids)(request)
+    if not store_ids:
+        return HttpResponseForbidden()
+    requested = request.GET.get("store_id")
+    if requested:
+        if not requested.isdigit() or int(requested) not in store_ids:
+            return HttpResponseForbidden()
+        store_ids = [int(requested)]
+    raw_last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or ""
+    last_event_id = int(raw_last_id) if raw_last_id.isdigit() else None
+
+    response = StreamingHttpResponse(
+        event_stream([store_channel(store_id) for store_id in store_ids], last_event_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_GET
+def export_history(request, dataset):
+    """
+    自店舗の履歴の CSV / JSONL 出力（coupon-usage / stamps / challenges）。
+    ?store_id= で1店舗に絞れる。?format=csv|jsonl&from=YYYY-MM-DD&to=YYYY-MM-DD。
+    """
+    store_ids = _get_owner_store_ids(request)
+    if not store_ids:
+        return HttpResponseForbidden()
+    requested = request.GET.get("store_id")
+    if requested:
+        if not requested.isdigit() or int(requested) not in store_ids:
+            return HttpResponseForbidden()
+        store_ids = [int(requested)]
+    try:
+        return export_response(
+            dataset,
+            request.GET.get("format") or "csv",
+            store_ids=store_ids,
+            params=request.GET,
+            filename_prefix=f"store{requested}" if requested else "stores",
+        )
+    except ExportError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+
+ANALYTICS_WEEKDAYS = ["月", "火", "水", "木", "金", "土", "日"]
+
+
+def _analytics_last_modified(request):
+    store = _get_owner_store(request)
+    if not store:
+        return None
+    return StoreAnalytics.objects.filter(store=store).values_list("computed_at", flat=True).first()
+
+
+@require_GET
+@condition(last_modified_func=_analytics_last_modified)
+def analytics(request):
+    """
+    来店分析（曜日×時間帯ヒートマップ・週次リテンション）。
+    夜間バッチで作った StoreAnalytics を表示するだけなので、Last-Modified とブラウザキャッシュを付ける。
+    """
+    store = _get_owner_store(request)
+    if not store:
+        messages.error(request, "店舗情報が見つかりません。先に店舗登録を完了させてください。")
+        return redirect("owner_dashboard")
+
+    record = StoreAnalytics.objects.filter(store=store).first()
+    heatmap_rows = []
+    cohort_rows = []
+    if record and record.heatmap:
+        peak = max(max(row) for row in record.heatmap) or 1
+        for label, row in zip(ANALYTICS_WEEKDAYS, record.heatmap):
+            heatmap_rows.append({
+                "label": label,
+                # 0〜4 の5段階で色を付ける（来店のない枠は 0）
+                "cells": [{"count": count, "level": -(-count * 4 // peak)} for count in row],
+            })
+    weeks = getattr(settings, "ANALYTICS_COHORT_WEEKS", 12)
+    if record:
+        for cohort in record.cohorts:
+            rates = [round(count * 100 / cohort["size"]) for count in cohort["retained"]]
+            cohort_rows.append({
+                "week": datetime.date.fromisoformat(cohort["week"]),
+                "size": cohort["size"],
+                "rates": rates + [None] * (weeks - 1 - len(rates)),
+            })
+
+    response = render(request, "owner/analytics.html", {
+        "store": store,
+        "record": record,
+        "hours": range(24),
+        "heatmap_rows": heatmap_rows,
+        "cohort_rows": cohort_rows,
+        "cohort_offsets": range(1, weeks),
     })
+    if record:
+        patch_cache_control(response, private=True, max_age=getattr(settings, "OWNER_ANALYTICS_CACHE_SECONDS", 600))
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
 
@@ -4,3 +4,9 @@ export async function fetchUserBadges() {
   const response = await client.get('/api/user-badges/');
   return response.data;
 }
+
+// クリア・スタンプ後にサーバー側で判定された未通知のバッジを取得する（取得後は通知済みになる）
+export async function fetchPendingBadges() {
+  const response = await client.get('/api/user-badges/pending/');
+  return response.data;
+}
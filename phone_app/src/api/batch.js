@@ -0,0 +1,11 @@
+import client from './client';
+
+// 読み取りAPIを1往復でまとめて取得する。戻り値は id ごとの { status, body }。
+export async function fetchBatch(requests) {
+  const response = await client.post('/api/batch/', { requests });
+  const items = Array.isArray(response.data?.responses) ? response.data.responses : [];
+  return items.reduce((acc, item) => {
+    acc[item.id] = { status: item.status, body: item.body };
+    return acc;
+  }, {});
+}
@@ -16,6 +16,7 @@ const publicApiKey = Constants.expoConfig?.extra?.publicApiKey || '';
 let accessToken = '';
 let refreshToken = '';
 let authExpiredHandler = null;
+let tokensRefreshedHandler = null;
 let refreshPromise = null;
 
 const client = axios.create({
@@ -61,6 +62,14 @@ const refreshAccessToken = async () => {
           throw new Error('Failed to refresh access token.');
         }
         accessToken = nextAccess;
+        // The server rotates the refresh token on every use; keep the new one.
+        const nextRefresh = response?.data?.refresh || '';
+        if (nextRefresh) {
+          refreshToken = nextRefresh;
+        }
+        if (typeof tokensRefreshedHandler === 'function') {
+          tokensRefreshedHandler({ access: accessToken, refresh: refreshToken });
+        }
         return nextAccess;
       })
       .finally(() => {
@@ -117,5 +126,9 @@ export function setAuthExpiredHandler(handler) {
   authExpiredHandler = handler;
 }
 
+export function setTokensRefreshedHandler(handler) {
+  tokensRefreshedHandler = handler;
+}
+
 export default client;
 export { baseURL };
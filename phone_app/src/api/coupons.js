@@ -5,6 +5,11 @@ export async function useCoupon(payload) {
   return response.data;
 }
 
+export async function exchangeCoupon(couponId) {
+  const response = await client.post('/api/coupons/exchange/', { coupon_id: couponId });
+  return response.data;
+}
+
 export async function fetchUserCouponHistory() {
   const response = await client.get('/api/user-coupons/history/');
   return Array.isArray(response.data) ? response.data : [];
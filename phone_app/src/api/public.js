@@ -5,6 +5,36 @@ export async function fetchStores(params = {}) {
   return Array.isArray(response.data) ? response.data : [];
 }
 
+// 店舗一覧とタグごとの店舗数（tags / match で絞り込み可）
+export async function fetchStoresWithFacets(params = {}) {
+  const response = await client.get('/api/stores/', { params: { ...params, facets: 1 } });
+  return {
+    results: Array.isArray(response.data?.results) ? response.data.results : [],
+    facets: Array.isArray(response.data?.facets) ? response.data.facets : [],
+  };
+}
+
+// 地図の縮小表示用のクラスタ。bbox は [西経度, 南緯度, 東経度, 北緯度]
+export async function fetchStoreClusters(bbox, zoom) {
+  const response = await client.get('/api/stores/clusters/', { params: { bbox: bbox.join(','), zoom } });
+  return Array.isArray(response.data?.clusters) ? response.data.clusters : [];
+}
+
+// ホームのおすすめ順（サーバー側で地域ごとに並べ済み）。続きは offset を進めて取る
+export async function fetchStoreFeed(lat, lon, params = {}) {
+  const response = await client.get('/api/stores/feed/', { params: { ...params, lat, lon } });
+  return {
+    results: Array.isArray(response.data?.results) ? response.data.results : [],
+    count: response.data?.count ?? 0,
+  };
+}
+
+// 地図タイル（Web メルカトルの z/x/y）内の店舗の要約。CDN・ブラウザのキャッシュが効くよう URL は固定
+export async function fetchStoreTile(z, x, y) {
+  const response = await client.get(`/api/stores/tiles/${z}/${x}/${y}/`);
+  return Array.isArray(response.data?.stores) ? response.data.stores : [];
+}
+
 export async function fetchCoupons(params = {}) {
   const response = await client.get('/api/coupons/', { params });
   return Array.isArray(response.data) ? response.data : [];
@@ -15,6 +45,27 @@ export async function fetchChallenges(params = {}) {
   return Array.isArray(response.data) ? response.data : [];
 }
 
+// 現在地から近い順のクエスト。続きは戻り値の nextCursor を params.cursor に渡して取る
+export async function fetchNearbyChallenges(lat, lon, params = {}) {
+  const response = await client.get('/api/challenges/nearby/', { params: { ...params, lat, lon } });
+  return {
+    results: Array.isArray(response.data?.results) ? response.data.results : [],
+    nextCursor: response.data?.next_cursor ?? null,
+  };
+}
+
+// 利用者の最近の店舗をもとにしたおすすめ店舗（要ログイン）。lat/lon を渡すと radius_km 以内に絞る
+export async function fetchRecommendations(params = {}) {
+  const response = await client.get('/api/recommendations/', { params });
+  return Array.isArray(response.data?.results) ? response.data.results : [];
+}
+
+// 店舗・クエスト・タグの横断検索（サーバー側の全文検索索引を使う）。結果は関連度順
+export async function searchCatalog(q, params = {}) {
+  const response = await client.get('/api/search/', { params: { ...params, q } });
+  return Array.isArray(response.data?.results) ? response.data.results : [];
+}
+
 export async function fetchStampSetting(params = {}) {
   const response = await client.get('/api/stamp-settings/', { params });
   return response.data || null;
@@ -24,3 +75,21 @@ export async function fetchNotices(params = {}) {
   const response = await client.get('/api/notices/', { params });
   return Array.isArray(response.data) ? response.data : [];
 }
+
+// 起動時にまとめて取得する（利用者・バッジ・お知らせ・近くの店舗・カタログの版）
+export async function fetchBootstrap(params = {}) {
+  const response = await client.get('/api/bootstrap/', { params });
+  return response.data || null;
+}
+
+// 店舗・クエスト・クーポン・スタンプ設定（ログイン時は進捗付き）を1回で取得する
+export async function fetchStoreDetail(storeId) {
+  const response = await client.get(`/api/stores/${storeId}/`);
+  return response.data || null;
+}
+
+// 店舗・クエスト・クーポンの差分同期。前回の token を since に渡し、has_more の間は続けて呼ぶ
+export async function fetchSync(since = '0', params = {}) {
+  const response = await client.get('/api/sync/', { params: { ...params, since } });
+  return response.data || null;
+}
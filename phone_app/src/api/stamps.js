@@ -9,3 +9,9 @@ export function isStampCooldownError(error) {
   const message = String(error?.message || '');
   return message.includes('Already stamped within 4 hours');
 }
+
+// オフライン中に記録したクリア・スタンプをまとめて送る（items は scanned_at 付き）
+export async function submitOfflineScans(items) {
+  const response = await client.post('/api/scans/bulk/', { items });
+  return response.data;
+}
@@ -1,6 +1,7 @@
 import React, { createContext, useCallback, useContext, useEffect, useMemo, useState } from 'react';
 import * as SecureStore from 'expo-secure-store';
-import { setAuthExpiredHandler, setAuthTokens } from '../api/client';
+import { setAuthExpiredHandler, setAuthTokens, setTokensRefreshedHandler } from '../api/client';
+import { fetchBootstrap } from '../api/public';
 
 const AuthContext = createContext(null);
 const AUTH_STORAGE_KEY = 'ciquest_auth_v1';
@@ -13,6 +14,7 @@ export function AuthProvider({ children }) {
   const [userCoupons, setUserCoupons] = useState([]);
   const [userCouponHistory, setUserCouponHistory] = useState([]);
   const [storeCouponHistory, setStoreCouponHistory] = useState([]);
+  const [bootstrap, setBootstrap] = useState(null);
 
   const persistAuthState = useCallback(async (nextUser, nextAccess, nextRefresh) => {
     try {
@@ -53,6 +55,7 @@ export function AuthProvider({ children }) {
     setUserCoupons([]);
     setUserCouponHistory([]);
     setStoreCouponHistory([]);
+    setBootstrap(null);
     void persistAuthState(null, '', '');
   }, [persistAuthState]);
 
@@ -117,6 +120,7 @@ export function AuthProvider({ children }) {
       userCoupons,
       userCouponHistory,
       storeCouponHistory,
+      bootstrap,
       login,
       logout,
       updateUser,
@@ -135,6 +139,7 @@ export function AuthProvider({ children }) {
       userCoupons,
       userCouponHistory,
       storeCouponHistory,
+      bootstrap,
       login,
       logout,
       updateUser,
@@ -163,6 +168,18 @@ export function AuthProvider({ children }) {
         setRefreshTokenState(nextRefresh);
         setAuthTokens({ access: nextAccess, refresh: nextRefresh });
         setLoggedIn(Boolean(nextAccess || nextRefresh));
+        if (!nextAccess && !nextRefresh) return;
+        // 起動時の個別取得（me / バッジ / お知らせ）を1回の往復にまとめる
+        try {
+          const data = await fetchBootstrap();
+          if (!mounted || !data) return;
+          setBootstrap(data);
+          if (data.user) {
+            setUser((prev) => ({ ...(prev || {}), ...data.user }));
+          }
+        } catch (err) {
+          // Keep the restored session; screens fall back to their own requests.
+        }
       } catch (err) {
         if (mounted) {
           setLoggedIn(false);
@@ -188,6 +205,19 @@ export function AuthProvider({ children }) {
     };
   }, [logout]);
 
+  useEffect(() => {
+    setTokensRefreshedHandler((tokens) => {
+      const nextAccess = tokens?.access || '';
+      const nextRefresh = tokens?.refresh || '';
+      setAccessTokenState(nextAccess);
+      setRefreshTokenState(nextRefresh);
+      void persistAuthState(user, nextAccess, nextRefresh);
+    });
+    return () => {
+      setTokensRefreshedHandler(null);
+    };
+  }, [user, persistAuthState]);
+
   return <AuthContext.Provider value={value}>{children}</AuthContext.Provider>;
 }
 
@@ -1,8 +1,9 @@
 ﻿import React, { useEffect, useState } from 'react';
 import { Modal, ScrollView, StyleSheet, Text, TouchableOpacity, View } from 'react-native';
 import colors from '../theme/colors';
+import { fetchBatch } from '../api/batch';
 import { fetchCoupons } from '../api/public';
-import { fetchUserCouponHistory, useCoupon } from '../api/coupons';
+import { useCoupon } from '../api/coupons';
 import LockedOverlay from '../components/LockedOverlay';
 import { useAuth } from '../contexts/AuthContext';
 import AeroBackground from '../components/AeroBackground';
@@ -89,7 +90,21 @@ export default function CouponsScreen({ navigation, route }) {
 
     const loadCoupons = async () => {
       try {
-        const data = await fetchCoupons();
+        let data;
+        if (loggedIn) {
+          // 交換可能クーポンと利用履歴を1往復で取得する
+          const results = await fetchBatch([
+            { id: 'coupons', path: '/api/coupons/' },
+            { id: 'history', path: '/api/user-coupons/history/' },
+          ]);
+          if (!active) return;
+          data = Array.isArray(results.coupons?.body) ? results.coupons.body : [];
+          if (results.history?.status === 200 && Array.isArray(results.history.body)) {
+            setUserCouponHistory(results.history.body);
+          }
+        } else {
+          data = await fetchCoupons();
+        }
         if (!active) return;
         const exchangeable = data.map((coupon) => ({
           id: String(coupon.coupon_id ?? coupon.id ?? coupon.title ?? Math.random()),
@@ -112,7 +127,7 @@ export default function CouponsScreen({ navigation, route }) {
     return () => {
       active = false;
     };
-  }, []);
+  }, [loggedIn, setUserCouponHistory]);
 
   useEffect(() => {
     setState((prev) => ({
@@ -122,24 +137,6 @@ export default function CouponsScreen({ navigation, route }) {
     }));
   }, [user?.points, userCoupons]);
 
-  useEffect(() => {
-    let active = true;
-    const loadHistory = async () => {
-      if (!loggedIn) return;
-      try {
-        const history = await fetchUserCouponHistory();
-        if (!active) return;
-        setUserCouponHistory(history);
-      } catch (err) {
-        return;
-      }
-    };
-    loadHistory();
-    return () => {
-      active = false;
-    };
-  }, [loggedIn, setUserCouponHistory]);
-
   useEffect(() => {
     const couponId = route?.params?.couponId;
     const storeQr = (route?.params?.storeQr || '').trim();
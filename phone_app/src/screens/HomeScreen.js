@@ -19,6 +19,8 @@ import { Ionicons } from '@expo/vector-icons';
 import * as Location from 'expo-location';
 import colors from '../theme/colors';
 import { fetchStores } from '../api/public';
+import { fetchPendingBadges } from '../api/badges';
+import { useAuth } from '../contexts/AuthContext';
 import AeroBackground from '../components/AeroBackground';
 import StoreMap from '../components/StoreMap';
 
@@ -85,6 +87,7 @@ const defaultRegion = {
 export default function HomeScreen() {
   const isFocused = useIsFocused();
   const navigation = useNavigation();
+  const { loggedIn } = useAuth();
   const nextUpdateAtRef = useRef(Date.now() + 30000);
   const mapRef = useRef(null);
   const [stores, setStores] = useState([]);
@@ -203,6 +206,21 @@ export default function HomeScreen() {
     }
   }, [isFocused, lastLocation]);
 
+  useEffect(() => {
+    if (!isFocused || !loggedIn) return;
+    let active = true;
+    fetchPendingBadges()
+      .then((badges) => {
+        if (active && Array.isArray(badges) && badges.length > 0) {
+          navigation.navigate('BadgeUnlock', { badges });
+        }
+      })
+      .catch(() => {});
+    return () => {
+      active = false;
+    };
+  }, [isFocused, loggedIn]);
+
   useEffect(() => {
     if (!lastLocation || hasCentered) return;
     mapRef.current?.animateToRegion(
@@ -3,12 +3,14 @@ import { FlatList, StyleSheet, Text, TextInput, TouchableOpacity, View } from 'r
 import { useNavigation } from '@react-navigation/native';
 import { Ionicons } from '@expo/vector-icons';
 import colors from '../theme/colors';
-import { fetchStores } from '../api/public';
+import { fetchStoresWithFacets, searchCatalog } from '../api/public';
 import AeroBackground from '../components/AeroBackground';
 
 const ITEM_NAME_MAX_CHARS = 22;
 const ITEM_DESC_MAX_CHARS = 36;
 const KEYWORD_MAX = 50;
+const SEARCH_DEBOUNCE_MS = 250;
+const SEARCH_LIMIT = 50;
 
 const truncateText = (value, maxChars) => {
   if (!value) return '';
@@ -42,18 +44,23 @@ const tags = ['all', 'カフェ', 'ラーメン', '居酒屋', 'スイーツ'];
 export default function SearchScreen() {
   const navigation = useNavigation();
   const [stores, setStores] = useState([]);
+  // タグ名 -> 店舗数
+  const [tagCounts, setTagCounts] = useState({});
   const [fetchError, setFetchError] = useState('');
   const [keyword, setKeyword] = useState('');
   const [tag, setTag] = useState('all');
   const [sortKey, setSortKey] = useState('relevance');
+  // サーバー検索の結果（store_id -> 順位）。null のときは手元の店舗一覧で絞り込む
+  const [serverHits, setServerHits] = useState(null);
 
   useEffect(() => {
     let active = true;
 
     const loadStores = async () => {
       try {
-        const data = await fetchStores();
+        const { results: data, facets } = await fetchStoresWithFacets();
         if (!active) return;
+        setTagCounts(Object.fromEntries(facets.map((facet) => [facet.name, facet.count])));
         const normalized = data.map((store) => {
           const storeTags = Array.isArray(store.tags) ? store.tags : [];
           const distanceMeters =
@@ -75,6 +82,7 @@ export default function SearchScreen() {
             description: store.description || '',
             distance: distanceMeters,
             tag: storeTags[0] || '',
+            tags: storeTags,
             lat,
             lon,
             address: store.address || store.location || '',
@@ -97,6 +105,35 @@ export default function SearchScreen() {
     };
   }, []);
 
+  useEffect(() => {
+    const trimmed = keyword.trim();
+    if (!trimmed) {
+      setServerHits(null);
+      return undefined;
+    }
+    let active = true;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await searchCatalog(trimmed, { kinds: 'store,challenge', limit: SEARCH_LIMIT });
+        if (!active) return;
+        const hits = new Map();
+        results.forEach((result) => {
+          if (result.store_id != null && !hits.has(result.store_id)) {
+            hits.set(result.store_id, hits.size);
+          }
+        });
+        setServerHits(hits);
+      } catch (error) {
+        // 検索 API が使えないときは手元の一覧での絞り込みに戻す
+        if (active) setServerHits(null);
+      }
+    }, SEARCH_DEBOUNCE_MS);
+    return () => {
+      active = false;
+      clearTimeout(timer);
+    };
+  }, [keyword]);
+
   const filtered = useMemo(() => {
     const normalizedKeyword = normalizeText(keyword.trim());
     const results = stores
@@ -104,6 +141,10 @@ export default function SearchScreen() {
         const normalizedName = normalizeText(store.name);
         const normalizedDesc = normalizeText(store.description);
         const normalizedTag = normalizeText(store.tag);
+        if (normalizedKeyword && serverHits) {
+          const rank = serverHits.get(store.storeId);
+          return { ...store, _score: rank === undefined ? 0 : serverHits.size - rank };
+        }
         const score =
           matchScore(normalizedName, normalizedKeyword, 2) +
           matchScore(normalizedDesc, normalizedKeyword, 1) +
@@ -112,7 +153,7 @@ export default function SearchScreen() {
       })
       .filter((store) => {
         const matchKeyword = !normalizedKeyword || store._score > 0;
-        const matchTag = tag === 'all' || store.tag === tag;
+        const matchTag = tag === 'all' || store.tags.includes(tag);
         return matchKeyword && matchTag;
       });
 
@@ -128,7 +169,7 @@ export default function SearchScreen() {
       return results.sort((a, b) => a.name.localeCompare(b.name, 'ja'));
     }
     return results.sort((a, b) => b._score - a._score);
-  }, [keyword, tag, stores, sortKey]);
+  }, [keyword, tag, stores, sortKey, serverHits]);
 
   return (
     <AeroBackground style={styles.container}>
@@ -152,7 +193,7 @@ export default function SearchScreen() {
             style={[styles.tagChip, tag === t && styles.tagChipActive]}
           >
             <Text style={[styles.tagText, tag === t && styles.tagTextActive]}>
-              {t === 'all' ? 'すべて' : t}
+              {t === 'all' ? 'すべて' : `${t} ${tagCounts[t] || 0}`}
             </Text>
           </TouchableOpacity>
         ))}
@@ -13,7 +13,7 @@ import { Ionicons } from '@expo/vector-icons';
 import { LinearGradient } from 'expo-linear-gradient';
 import { useIsFocused } from '@react-navigation/native';
 import colors from '../theme/colors';
-import { fetchChallenges, fetchStampSetting } from '../api/public';
+import { fetchStoreDetail } from '../api/public';
 import { useChallenges } from '../contexts/ChallengeContext';
 import { useAuth } from '../contexts/AuthContext';
 import AeroBackground from '../components/AeroBackground';
@@ -168,16 +168,19 @@ export default function StoreDetailScreen({ navigation, route }) {
   useEffect(() => {
     let active = true;
 
-    const loadChallenges = async () => {
+    // クエストとスタンプカードは店舗詳細APIの1回の応答から組み立てる
+    const loadDetail = async () => {
       if (!storeId) {
         setChallenges([]);
         setChallengeError('');
+        setStampSetting(null);
+        setStampError('');
         return;
       }
       try {
-        const data = await fetchChallenges({ store_id: storeId });
+        const data = await fetchStoreDetail(storeId);
         if (!active) return;
-        const normalized = data
+        const normalized = (Array.isArray(data?.challenges) ? data.challenges : [])
           .filter((item) => {
             const itemStoreId = item.store_id ?? item.storeId ?? item.store?.id ?? null;
             return String(itemStoreId ?? '') === String(storeId);
@@ -197,39 +200,18 @@ export default function StoreDetailScreen({ navigation, route }) {
           }));
         setChallenges(normalized);
         setChallengeError('');
+        setStampSetting(data?.stamp_setting || null);
+        setStampError('');
       } catch (error) {
         if (!active) return;
         setChallengeError(
           error?.message || 'クエストの取得に失敗しました。'
         );
+        setStampError(error?.message || 'スタンプカードの取得に失敗しました。');
       }
     };
 
-    loadChallenges();
-    return () => {
-      active = false;
-    };
-  }, [storeId]);
-
-  useEffect(() => {
-    let active = true;
-    const loadStampSetting = async () => {
-      if (!storeId) {
-        setStampSetting(null);
-        setStampError('');
-        return;
-      }
-      try {
-        const data = await fetchStampSetting({ store_id: storeId });
-        if (!active) return;
-        setStampSetting(data);
-        setStampError('');
-      } catch (error) {
-        if (!active) return;
-        setStampError(error?.message || 'スタンプカードの取得に失敗しました。');
-      }
-    };
-    loadStampSetting();
+    loadDetail();
     return () => {
       active = false;
     };
@@ -7,4 +7,15 @@ if [ "${SEED_CIQUEST:-0}" != "0" ]; then
   python manage.py seed_ciquest
 fi
 
-gunicorn ciquest_server.wsgi:application --bind 0.0.0.0:$PORT
+# メール送信キューのワーカー（同一コンテナ内で常駐させる）
+if [ "${EMAIL_OUTBOX_WORKER:-1}" != "0" ]; then
+  python manage.py send_email_outbox --loop &
+fi
+
+# バッジ判定などのバックグラウンドタスクのワーカー
+if [ "${BACKGROUND_TASK_WORKER:-1}" != "0" ]; then
+  python manage.py run_worker --loop &
+fi
+
+# SSE（/api/events/・統計画面のライブ更新）は ASGI でないと配信できないため uvicorn のワーカーで動かす
+gunicorn ciquest_server.asgi:application -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:$PORT
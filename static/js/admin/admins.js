@@ -1,5 +1,6 @@
 ﻿const API_BASE = "/operator/api/admins";
 const CSRF_TOKEN = getCsrfToken();
+let currentPage = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
   loadAdmins();
@@ -27,22 +28,26 @@ function statusLabel(status) {
   return "申請中";
 }
 
-async function loadAdmins() {
+async function loadAdmins(page = 1) {
   const container = document.getElementById("adminContainer");
   if (!container) return;
   container.innerHTML = "<p>読み込み中です...</p>";
 
   try {
-    const res = await fetch(`${API_BASE}/`);
-    if (!res.ok) throw new Error();
-    const data = await res.json();
+    const data = await fetchListPage(API_BASE, { page });
+    if (!data.results.length && page > 1) {
+      loadAdmins(page - 1);
+      return;
+    }
+    currentPage = data.page;
+    renderListPager(container, data, loadAdmins);
 
-    if (!data.length) {
+    if (!data.results.length) {
       container.innerHTML = '<p class="admin-empty">運営ユーザーが見つかりません。</p>';
       return;
     }
 
-    container.innerHTML = data
+    container.innerHTML = data.results
       .map((admin) => {
         const createdAt = admin.created_at
           ? new Date(admin.created_at).toLocaleString()
@@ -142,7 +147,7 @@ async function deleteAdmin(id, name) {
       throw new Error(err.detail || "削除に失敗しました");
     }
     alert("削除しました。");
-    loadAdmins();
+    loadAdmins(currentPage);
   } catch (err) {
     alert(`削除に失敗しました。${err.message ? `\n${err.message}` : ""}`);
   }
@@ -1,5 +1,6 @@
 ﻿const API_BASE = "/operator/api/challenges";
 const CSRF_TOKEN = getCsrfToken();
+let currentPage = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
   const searchBtn = document.getElementById("searchBtn");
@@ -29,23 +30,26 @@ function getCsrfToken() {
   return value ? decodeURIComponent(value.split("=")[1]) : "";
 }
 
-async function loadChallenges(keyword = "") {
+async function loadChallenges(keyword = "", page = 1) {
   const container = document.getElementById("challengeList");
   if (!container) return;
   container.innerHTML = "<p>読み込み中です...</p>";
 
   try {
-    const url = `${API_BASE}/?search=${encodeURIComponent(keyword)}`;
-    const res = await fetch(url);
-    if (!res.ok) throw new Error();
-    const data = await res.json();
+    const data = await fetchListPage(API_BASE, { search: keyword, page });
+    if (!data.results.length && page > 1) {
+      loadChallenges(keyword, page - 1);
+      return;
+    }
+    currentPage = data.page;
+    renderListPager(container, data, (next) => loadChallenges(keyword, next));
 
-    if (!data.length) {
+    if (!data.results.length) {
       container.innerHTML = "<p>該当するチャレンジがありません。</p>";
       return;
     }
 
-    container.innerHTML = data
+    container.innerHTML = data.results
       .map(
         (ch) => `
         <div class="challenge-card">
@@ -89,7 +93,7 @@ async function banChallenge(id, keyword) {
       },
     });
     if (!res.ok) throw new Error();
-    loadChallenges(keyword);
+    loadChallenges(keyword, currentPage);
   } catch (err) {
     alert("BANに失敗しました。");
   }
@@ -1,5 +1,7 @@
 ﻿const API_BASE = "/operator/api/coupons";
 const CSRF_TOKEN = getCsrfToken();
+let currentType = "all";
+let currentPage = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
   const filter = document.getElementById("couponFilter");
@@ -29,23 +31,27 @@ function getCsrfToken() {
   return value ? decodeURIComponent(value.split("=")[1]) : "";
 }
 
-async function loadCoupons(type = "all") {
+async function loadCoupons(type = "all", page = 1) {
   const container = document.getElementById("couponContainer");
   if (!container) return;
   container.innerHTML = "<p>読み込み中です...</p>";
 
   try {
-    const query = type && type !== "all" ? `?type=${encodeURIComponent(type)}` : "";
-    const res = await fetch(`${API_BASE}/${query}`);
-    if (!res.ok) throw new Error();
-    const data = await res.json();
+    const data = await fetchListPage(API_BASE, { type: type !== "all" ? type : "", page });
+    if (!data.results.length && page > 1) {
+      loadCoupons(type, page - 1);
+      return;
+    }
+    currentType = type;
+    currentPage = data.page;
+    renderListPager(container, data, (next) => loadCoupons(type, next));
 
-    if (!data.length) {
+    if (!data.results.length) {
       container.innerHTML = "<p>クーポンがありません。</p>";
       return;
     }
 
-    container.innerHTML = data
+    container.innerHTML = data.results
       .map(
         (coupon) => `
         <div class="coupon-card">
@@ -171,7 +177,7 @@ async function deleteCoupon(id) {
       },
     });
     if (!res.ok) throw new Error();
-    loadCoupons();
+    loadCoupons(currentType, currentPage);
   } catch (err) {
     alert("クーポンの削除に失敗しました。");
   }
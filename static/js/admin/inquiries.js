@@ -1,5 +1,6 @@
 ﻿const API_BASE = "/operator/api/inquiries";
 const CSRF_TOKEN = getCsrfToken();
+let currentPage = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
   const tabs = document.querySelectorAll(".tab");
@@ -22,22 +23,26 @@ function getCsrfToken() {
   return value ? decodeURIComponent(value.split("=")[1]) : "";
 }
 
-async function loadInquiries(status) {
+async function loadInquiries(status, page = 1) {
   const container = document.getElementById("inquiryList");
   if (!container) return;
   container.innerHTML = "<p>読み込み中です...</p>";
 
   try {
-    const res = await fetch(`${API_BASE}/?status=${encodeURIComponent(status)}`);
-    if (!res.ok) throw new Error();
-    const data = await res.json();
+    const data = await fetchListPage(API_BASE, { status, page });
+    if (!data.results.length && page > 1) {
+      loadInquiries(status, page - 1);
+      return;
+    }
+    currentPage = data.page;
+    renderListPager(container, data, (next) => loadInquiries(status, next));
 
-    if (!data.length) {
+    if (!data.results.length) {
       container.innerHTML = "<p>該当するお問い合わせはありません。</p>";
       return;
     }
 
-    container.innerHTML = data
+    container.innerHTML = data.results
       .map(
         (item) => `
           <div class="inquiry-card">
@@ -103,7 +108,7 @@ async function updateStatus(id, newStatus) {
     });
     if (!res.ok) throw new Error();
     const active = document.querySelector(".tab.active").dataset.status;
-    loadInquiries(active);
+    loadInquiries(active, currentPage);
   } catch (err) {
     alert("ステータスの更新に失敗しました。");
   }
@@ -0,0 +1,40 @@
+// 運営画面の一覧 API 共通処理: 1ページずつ取得し、一覧の下にページ送りを表示する
+const LIST_PAGE_LIMIT = 50;
+
+async function fetchListPage(base, params = {}) {
+  const url = new URL(`${base}/`, window.location.origin);
+  Object.entries({ limit: LIST_PAGE_LIMIT, ...params }).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== "") {
+      url.searchParams.set(key, value);
+    }
+  });
+  const res = await fetch(url.toString());
+  if (!res.ok) throw new Error();
+  return res.json();
+}
+
+function renderListPager(listContainer, data, onPageChange) {
+  let pager = listContainer.nextElementSibling;
+  if (!pager || !pager.classList.contains("list-pager")) {
+    pager = document.createElement("nav");
+    pager.className = "list-pager";
+    listContainer.after(pager);
+  }
+  if (!data || !data.results || !data.results.length) {
+    pager.innerHTML = "";
+    return;
+  }
+
+  const first = (data.page - 1) * data.limit + 1;
+  const last = first + data.results.length - 1;
+  const total = `${data.total_is_estimate ? "約" : ""}${data.total.toLocaleString()}件`;
+  const pages = data.total_is_estimate ? "" : `（${data.page} / ${Math.max(Math.ceil(data.total / data.limit), 1)}ページ）`;
+  pager.innerHTML = `
+    <button type="button" class="list-pager__btn" data-page="${data.page - 1}" ${data.page > 1 ? "" : "disabled"}>前へ</button>
+    <span class="list-pager__info">${first}〜${last}件目 / 全${total}${pages}</span>
+    <button type="button" class="list-pager__btn" data-page="${data.page + 1}" ${data.has_next ? "" : "disabled"}>次へ</button>
+  `;
+  pager.querySelectorAll(".list-pager__btn").forEach((btn) => {
+    btn.addEventListener("click", () => onPageChange(Number(btn.dataset.page)));
+  });
+}
@@ -1,5 +1,6 @@
 ﻿const API_BASE = "/operator/api/stores";
 const STORES_CSRF_TOKEN = getCsrfToken();
+let currentPage = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
   const tabs = document.querySelectorAll(".tab");
@@ -22,22 +23,26 @@ function getCsrfToken() {
   return value ? decodeURIComponent(value.split("=")[1]) : "";
 }
 
-async function loadStores(status) {
+async function loadStores(status, page = 1) {
   const container = document.getElementById("store-list");
   if (!container) return;
   container.innerHTML = "<p>読み込み中です...</p>";
 
   try {
-    const res = await fetch(`${API_BASE}/?status=${encodeURIComponent(status)}`);
-    if (!res.ok) throw new Error();
-    const data = await res.json();
+    const data = await fetchListPage(API_BASE, { status, page });
+    if (!data.results.length && page > 1) {
+      loadStores(status, page - 1);
+      return;
+    }
+    currentPage = data.page;
+    renderListPager(container, data, (next) => loadStores(status, next));
 
-    if (!data.length) {
+    if (!data.results.length) {
       container.innerHTML = "<p>該当する店舗がありません。</p>";
       return;
     }
 
-    container.innerHTML = data
+    container.innerHTML = data.results
       .map(
         (store) => `
         <div class="store-card">
@@ -107,7 +112,7 @@ async function updateStatus(id, newStatus) {
     });
     if (!res.ok) throw new Error();
     const activeTab = document.querySelector(".tab.active").dataset.status;
-    loadStores(activeTab);
+    loadStores(activeTab, currentPage);
   } catch (err) {
     alert("ステータスの更新に失敗しました。");
   }
@@ -140,7 +145,7 @@ async function requestDelete(id, storeName) {
     });
     if (!res.ok) throw new Error();
     const activeTab = document.querySelector(".tab.active").dataset.status;
-    loadStores(activeTab);
+    loadStores(activeTab, currentPage);
   } catch (err) {
     alert("削除に失敗しました。");
   }
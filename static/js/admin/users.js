@@ -19,6 +19,7 @@ const ID_FIELD_BY_TYPE = {
 const CSRF_TOKEN = getCsrfToken();
 let currentType = "admin";
 let currentKeyword = "";
+let currentPage = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
   bindEvents();
@@ -136,7 +137,7 @@ function renderUserCard(item, type) {
   `;
 }
 
-async function loadUsers() {
+async function loadUsers(page = 1) {
   const container = document.getElementById("userList");
   if (!container) return;
   container.innerHTML = "<p>読み込み中です...</p>";
@@ -147,22 +148,21 @@ async function loadUsers() {
     return;
   }
 
-  const url = new URL(`${base}/`, window.location.origin);
-  if (currentKeyword) {
-    url.searchParams.set("search", currentKeyword);
-  }
-
   try {
-    const res = await fetch(url.toString());
-    if (!res.ok) throw new Error();
-    const data = await res.json();
+    const data = await fetchListPage(base, { search: currentKeyword, page });
+    if (!data.results.length && page > 1) {
+      loadUsers(page - 1);
+      return;
+    }
+    currentPage = data.page;
+    renderListPager(container, data, loadUsers);
 
-    if (!Array.isArray(data) || data.length === 0) {
+    if (data.results.length === 0) {
       container.innerHTML = `<p class="user-empty">${TYPE_LABEL[currentType]}が見つかりません。</p>`;
       return;
     }
 
-    container.innerHTML = data.map((item) => renderUserCard(item, currentType)).join("");
+    container.innerHTML = data.results.map((item) => renderUserCard(item, currentType)).join("");
 
     container.querySelectorAll(".delete-btn").forEach((btn) => {
       btn.addEventListener("click", (event) => {
@@ -190,7 +190,7 @@ async function deleteUser(id, name, type) {
       const err = await res.json().catch(() => ({}));
       throw new Error(err.detail || "削除に失敗しました。");
     }
-    loadUsers();
+    loadUsers(currentPage);
   } catch (err) {
     alert(err.message || "ユーザーの削除に失敗しました。");
   }
@@ -28,7 +28,7 @@ document.addEventListener("DOMContentLoaded", () => {
   }
 
   const ctx = chartCanvas.getContext("2d");
-  new Chart(ctx, {
+  const chart = new Chart(ctx, {
     type: "line",
     data: {
       labels,
@@ -48,8 +48,139 @@ document.addEventListener("DOMContentLoaded", () => {
       },
     },
   });
+
+  connectLiveFeed(chart);
 });
 
+// --- ライブ更新（SSE）: 初回表示後はイベントの差分だけでカウンターを更新する ---
+// サーバーが ASGI で動いていないときは data-events-url が出力されず、接続しない
+function connectLiveFeed(chart) {
+  const root = document.getElementById("statsRoot");
+  if (!root || !root.dataset.eventsUrl || typeof EventSource === "undefined") {
+    return;
+  }
+  const storeId = Number(root.dataset.storeId);
+  const participantsEl = document.getElementById("totalParticipants");
+  const clearRateEl = document.getElementById("clearRate");
+  const stampsEl = document.getElementById("totalStamps");
+  const couponUsageEl = document.getElementById("couponUsage");
+
+  const state = {
+    participants: Number(participantsEl?.dataset.value || 0),
+    attempts: Number(clearRateEl?.dataset.attempts || 0),
+    cleared: Number(clearRateEl?.dataset.cleared || 0),
+    stamps: Number(stampsEl?.dataset.value || 0),
+    couponUsage: Number(couponUsageEl?.dataset.value || 0),
+  };
+  let rankingCounts = [];
+  const rankingDataElement = document.getElementById("stats-ranking-counts");
+  if (rankingDataElement) {
+    try {
+      rankingCounts = JSON.parse(rankingDataElement.textContent || "[]");
+    } catch (error) {
+      rankingCounts = [];
+    }
+  }
+
+  const source = new EventSource(root.dataset.eventsUrl);
+  const handle = (type, callback) => {
+    source.addEventListener(type, (event) => {
+      let data;
+      try {
+        data = JSON.parse(event.data);
+      } catch (error) {
+        return;
+      }
+      if (Number(data.store_id) !== storeId) {
+        return;
+      }
+      callback(data);
+    });
+  };
+
+  handle("stamp_scanned", (data) => {
+    state.stamps += 1;
+    setStat(stampsEl, state.stamps);
+    bumpChart(chart, data.stamp_date);
+  });
+  handle("challenge_cleared", (data) => {
+    state.attempts += Number(data.attempts_delta || 0);
+    state.cleared += Number(data.cleared_delta || 0);
+    if (data.new_participant) {
+      state.participants += 1;
+      setStat(participantsEl, state.participants);
+    }
+    const rate = state.attempts ? Math.round((state.cleared / state.attempts) * 1000) / 10 : 0;
+    setStat(clearRateEl, rate);
+    if (Number(data.cleared_delta || 0) > 0) {
+      rankingCounts = bumpRanking(rankingCounts, data.challenge_title);
+    }
+  });
+  handle("coupon_redeemed", () => {
+    state.couponUsage += 1;
+    setStat(couponUsageEl, state.couponUsage);
+  });
+}
+
+function setStat(element, value) {
+  if (!element) {
+    return;
+  }
+  const suffix = element.dataset.suffix || "";
+  element.dataset.value = value;
+  element.textContent = `${new Intl.NumberFormat("ja-JP").format(value)}${suffix}`;
+}
+
+function bumpChart(chart, stampDate) {
+  if (!stampDate) {
+    return;
+  }
+  const [, month, day] = stampDate.split("-");
+  const label = `${month}/${day}`;
+  const labels = chart.data.labels;
+  const values = chart.data.datasets[0].data;
+  const index = labels.lastIndexOf(label);
+  const now = new Date();
+  const todayLabel = `${String(now.getMonth() + 1).padStart(2, "0")}/${String(now.getDate()).padStart(2, "0")}`;
+  if (index >= 0) {
+    values[index] += 1;
+  } else if (label === todayLabel) {
+    // 日付が変わった場合は最古の日を落として14日分を保つ（表示範囲より古いオフライン分は反映しない）
+    labels.push(label);
+    values.push(1);
+    if (labels.length > 14) {
+      labels.shift();
+      values.shift();
+    }
+  }
+  chart.update();
+}
+
+function bumpRanking(rankingCounts, title) {
+  const counts = rankingCounts.slice();
+  const entry = counts.find((item) => item.title === title);
+  if (entry) {
+    entry.count += 1;
+  } else {
+    counts.push({ title, count: 1 });
+  }
+  counts.sort((a, b) => b.count - a.count || (a.title < b.title ? -1 : a.title > b.title ? 1 : 0));
+
+  const list = document.getElementById("challengeRanking");
+  if (list) {
+    list.replaceChildren(
+      ...counts.slice(0, 5).map((item) => {
+        const li = document.createElement("li");
+        li.textContent = `${item.title}（${item.count}件）`;
+        return li;
+      })
+    );
+    list.hidden = false;
+    document.getElementById("challengeRankingEmpty")?.remove();
+  }
+  return counts;
+}
+
 function animateNumber(element) {
   const target = Number(element.dataset.value || 0);
   const suffix = element.dataset.suffix || "";